@@ -1,12 +1,12 @@
 from django.contrib import admin
 from .models import (
-    Supplier, Ingredient, StockMovement, 
+    Supplier, Ingredient, StockMovement, StockCheckpoint, StockLot, StockAlert,
     PurchaseOrder, PurchaseOrderItem, Recipe, RecipeIngredient
 )
 
 @admin.register(Supplier)
 class SupplierAdmin(admin.ModelAdmin):
-    list_display = ['name', 'contact_person', 'email', 'phone', 'is_active']
+    list_display = ['name', 'contact_person', 'email', 'phone', 'lead_time_days', 'is_active']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'contact_person', 'email']
     ordering = ['name']
@@ -19,16 +19,26 @@ class IngredientAdmin(admin.ModelAdmin):
     ]
     list_filter = ['unit', 'is_active', 'supplier']
     search_fields = ['name', 'description']
-    readonly_fields = ['total_value', 'is_low_stock']
+    readonly_fields = [
+        'expiry_date', 'total_value', 'is_low_stock', 'daily_usage_forecast',
+        'safety_stock', 'reorder_point', 'forecast_updated_at'
+    ]
     ordering = ['name']
     
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'description', 'unit')
         }),
+        ('Unit Conversion', {
+            'fields': ('density', 'piece_weight'),
+            'classes': ('collapse',)
+        }),
         ('Stock Information', {
             'fields': ('current_stock', 'minimum_stock', 'unit_cost', 'total_value', 'is_low_stock')
         }),
+        ('Forecast', {
+            'fields': ('daily_usage_forecast', 'safety_stock', 'reorder_point', 'forecast_updated_at')
+        }),
         ('Supplier Information', {
             'fields': ('supplier', 'location', 'expiry_date')
         }),
@@ -49,6 +59,40 @@ class StockMovementAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
 
+@admin.register(StockLot)
+class StockLotAdmin(admin.ModelAdmin):
+    list_display = [
+        'ingredient', 'lot_number', 'quantity_received', 'quantity_remaining',
+        'expiry_date', 'received_at'
+    ]
+    list_filter = ['expiry_date', 'received_at']
+    search_fields = ['ingredient__name', 'lot_number', 'purchase_order_item__purchase_order__po_number']
+    readonly_fields = ['purchase_order_item', 'quantity_received', 'received_at']
+    date_hierarchy = 'expiry_date'
+    ordering = ['expiry_date', 'received_at']
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = [
+        'ingredient', 'alert_type', 'is_active', 'current_stock', 'threshold',
+        'expiry_date', 'raised_at', 'cleared_at'
+    ]
+    list_filter = ['alert_type', 'is_active']
+    search_fields = ['ingredient__name']
+    readonly_fields = [
+        'ingredient', 'alert_type', 'is_active', 'current_stock', 'threshold',
+        'expiry_date', 'raised_at', 'cleared_at'
+    ]
+    ordering = ['-raised_at']
+
+@admin.register(StockCheckpoint)
+class StockCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['ingredient', 'stock', 'unit_cost', 'taken_at']
+    list_filter = ['taken_at']
+    search_fields = ['ingredient__name']
+    date_hierarchy = 'taken_at'
+    ordering = ['-taken_at']
+
 @admin.register(PurchaseOrder)
 class PurchaseOrderAdmin(admin.ModelAdmin):
     list_display = [
@@ -89,7 +133,7 @@ class PurchaseOrderItemAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ['name', 'servings', 'is_active', 'created_at']
+    list_display = ['name', 'cake', 'servings', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'description']
     ordering = ['name']
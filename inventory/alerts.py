@@ -0,0 +1,141 @@
+"""
+Low-stock and expiry alerts.
+
+Alert state lives in StockAlert, one row per ingredient and alert type;
+the rows with is_active=True are the active alert set that dashboards
+read instead of scanning ingredients. The ledger calls ``evaluate`` with
+only the ingredients a movement batch touched, inside its transaction, so
+the set is always in step with stock. Threshold edits re-evaluate the
+edited ingredient (see ``inventory.signals``), and the nightly
+``evaluate_alerts`` command catches expiry alerts that become due simply
+because time passes.
+
+Thresholds have hysteresis so stock hovering around the minimum does not
+flap: a low-stock alert is raised at or below minimum_stock but only
+clears once stock is back above it by LOW_STOCK_CLEAR_MARGIN; an expiry
+alert is raised EXPIRY_ALERT_DAYS before the earliest lot expiry and
+clears once that is more than EXPIRY_CLEAR_DAYS away.
+
+Subscribers connect to ``stock_alert_raised``, which is sent once per
+crossing (when an alert goes from cleared to active) after the
+transaction commits.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Ingredient, StockAlert
+
+LOW_STOCK_CLEAR_MARGIN = Decimal('0.10')
+EXPIRY_ALERT_DAYS = 7
+EXPIRY_CLEAR_DAYS = 10
+
+# Sent with alerts=[StockAlert, ...] for newly raised alerts
+stock_alert_raised = Signal()
+
+
+def _low_stock(active, stock, minimum):
+    if stock <= minimum:
+        return True
+    return active and stock <= minimum * (1 + LOW_STOCK_CLEAR_MARGIN)
+
+
+def _expiring(active, expiry_date, today):
+    if expiry_date is None:
+        return False
+    days_left = (expiry_date - today).days
+    if days_left <= EXPIRY_ALERT_DAYS:
+        return True
+    return active and days_left <= EXPIRY_CLEAR_DAYS
+
+
+def evaluate(states, today=None):
+    """
+    Update the alert set for the given ingredients.
+
+    `states` maps ingredient id -> {stock, minimum_stock, expiry_date}.
+    Costs one read plus at most one INSERT and one UPDATE. Returns the
+    alerts that were raised by this evaluation.
+    """
+    if not states:
+        return []
+    today = today or timezone.now().date()
+    now = timezone.now()
+
+    existing = {
+        (alert.ingredient_id, alert.alert_type): alert
+        for alert in StockAlert.objects.filter(ingredient_id__in=list(states))
+    }
+
+    created, changed, raised = [], [], []
+    for ingredient_id, state in states.items():
+        checks = [
+            (StockAlert.LOW_STOCK, lambda active: _low_stock(active, state['stock'], state['minimum_stock'])),
+            (StockAlert.EXPIRY, lambda active: _expiring(active, state['expiry_date'], today)),
+        ]
+        for alert_type, should_alert in checks:
+            alert = existing.get((ingredient_id, alert_type))
+            active = alert is not None and alert.is_active
+            if should_alert(active) == active:
+                continue
+
+            if active:
+                alert.is_active = False
+                alert.cleared_at = now
+                changed.append(alert)
+                continue
+
+            if alert is None:
+                alert = StockAlert(ingredient_id=ingredient_id, alert_type=alert_type)
+                created.append(alert)
+            else:
+                changed.append(alert)
+            alert.is_active = True
+            alert.current_stock = state['stock']
+            alert.threshold = state['minimum_stock'] if alert_type == StockAlert.LOW_STOCK else None
+            alert.expiry_date = state['expiry_date'] if alert_type == StockAlert.EXPIRY else None
+            alert.raised_at = now
+            alert.cleared_at = None
+            raised.append(alert)
+
+    if created:
+        StockAlert.objects.bulk_create(created)
+    if changed:
+        StockAlert.objects.bulk_update(
+            changed, ['is_active', 'current_stock', 'threshold', 'expiry_date', 'raised_at', 'cleared_at']
+        )
+    if raised:
+        transaction.on_commit(lambda: stock_alert_raised.send(sender=StockAlert, alerts=raised))
+    return raised
+
+
+def evaluate_ingredients(ingredient_ids=None, today=None):
+    """Re-evaluate alerts from stored stock for some (or all active) ingredients"""
+    ingredients = Ingredient.objects.all()
+    if ingredient_ids is None:
+        ingredients = ingredients.filter(is_active=True)
+    else:
+        ingredients = ingredients.filter(id__in=ingredient_ids)
+    states = {
+        row['id']: {
+            'stock': row['current_stock'],
+            'minimum_stock': row['minimum_stock'],
+            'expiry_date': row['expiry_date'],
+        }
+        for row in ingredients.values('id', 'current_stock', 'minimum_stock', 'expiry_date')
+    }
+    return evaluate(states, today)
+
+
+def active_alerts(alert_type=None):
+    alerts = StockAlert.objects.filter(is_active=True)
+    if alert_type:
+        alerts = alerts.filter(alert_type=alert_type)
+    return alerts
+
+
+def low_stock_ingredient_ids():
+    """Subquery of ingredient ids with an active low-stock alert"""
+    return active_alerts(StockAlert.LOW_STOCK).values('ingredient_id')
@@ -0,0 +1,135 @@
+"""
+Ingredient consumption analysis.
+
+The whole analysis comes from two grouped queries: every ingredient
+LEFT-joined to its outbound movements in the current window, and outbound
+totals per ingredient for the previous window of the same length. Results
+are cached per period and day under the stock cache version, so posting any
+movement through the ledger invalidates them. Other workers only see the
+new version through the shared cache; on a per-process cache results are
+kept for at most a minute instead.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from sweetbite_backend.caching import cache_timeout
+
+from .ledger import stock_cache_version
+from .models import Ingredient, StockMovement
+
+CONSUMPTION_TYPES = ['out', 'waste']
+PERIOD_DAYS = {'today': 0, 'week': 7, 'month': 30}
+CONSUMPTION_CACHE_SECONDS = 15 * 60
+LOW_USAGE_SHARE = 0.05
+
+
+def period_range(period, end_date=None):
+    """(start_date, end_date) for today/week/month; unknown periods fall back to a week"""
+    end_date = end_date or timezone.now().date()
+    return end_date - timedelta(days=PERIOD_DAYS.get(period, 7)), end_date
+
+
+def _percentage(value, total):
+    return round(value / total * 100, 1) if total > 0 else 0
+
+
+def _build(period, start_date, end_date):
+    window = Q(
+        movements__movement_type__in=CONSUMPTION_TYPES,
+        movements__created_at__date__range=[start_date, end_date]
+    )
+    rows = list(
+        Ingredient.objects.annotate(
+            consumed=Sum('movements__quantity', filter=window),
+            wasted=Sum('movements__quantity', filter=window & Q(movements__movement_type='waste')),
+            movement_count=Count('movements', filter=window),
+        ).filter(
+            Q(is_active=True) | Q(movement_count__gt=0)
+        ).values('id', 'name', 'unit', 'current_stock', 'is_active', 'consumed', 'wasted', 'movement_count')
+    )
+
+    # Previous window of the same length, ending the day before this one
+    length = (end_date - start_date).days + 1
+    previous = {
+        row['ingredient_id']: float(row['total'])
+        for row in StockMovement.objects.filter(
+            movement_type__in=CONSUMPTION_TYPES,
+            created_at__date__range=[start_date - timedelta(days=length), start_date - timedelta(days=1)]
+        ).values('ingredient_id').annotate(total=Sum('quantity')).order_by()
+    }
+
+    for row in rows:
+        row['consumed'] = float(row['consumed'] or 0)
+        row['wasted'] = float(row['wasted'] or 0)
+    total_consumption = sum(row['consumed'] for row in rows)
+
+    consumed = sorted((row for row in rows if row['movement_count']), key=lambda row: row['consumed'], reverse=True)
+    ingredients_data = []
+    for row in consumed[:10]:  # Top 10 ingredients
+        previous_consumption = previous.get(row['id'], 0)
+        trend = 0
+        if previous_consumption > 0:
+            trend = (row['consumed'] - previous_consumption) / previous_consumption * 100
+        ingredients_data.append({
+            'name': row['name'],
+            'unit': row['unit'],
+            'current_stock': float(row['current_stock']),
+            'consumed': row['consumed'],
+            'percentage': _percentage(row['consumed'], total_consumption),
+            'trend': round(trend, 1),
+            'movement_count': row['movement_count']
+        })
+
+    wasted = sorted((row for row in rows if row['wasted'] > 0), key=lambda row: row['wasted'], reverse=True)
+    wastage_items = [
+        {
+            'name': row['name'],
+            'wasted': row['wasted'],
+            'percentage': _percentage(row['wasted'], total_consumption)
+        }
+        for row in wasted[:5]
+    ]
+
+    # Low usage items: active ingredients below 5% of total consumption
+    low_usage = sorted(
+        (row for row in rows if row['is_active'] and row['consumed'] < total_consumption * LOW_USAGE_SHARE),
+        key=lambda row: row['consumed']
+    )
+    low_usage_items = [
+        {
+            'name': row['name'],
+            'consumed': row['consumed'],
+            'percentage': _percentage(row['consumed'], total_consumption)
+        }
+        for row in low_usage[:5]
+    ]
+
+    return {
+        'period': {
+            'type': period,
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'summary': {
+            'total_consumption': total_consumption,
+            'total_ingredients': len(ingredients_data),
+            'total_movements': sum(row['movement_count'] for row in rows)
+        },
+        'ingredients': ingredients_data,
+        'wastage': wastage_items,
+        'low_usage': low_usage_items
+    }
+
+
+def consumption_analysis(period='week'):
+    """Consumption, wastage and low-usage breakdown for the period, served from cache when fresh"""
+    start_date, end_date = period_range(period)
+    key = f'inventory:consumption:{period}:{end_date.isoformat()}:{stock_cache_version()}'
+    data = cache.get(key)
+    if data is None:
+        data = _build(period, start_date, end_date)
+        cache.set(key, data, cache_timeout(CONSUMPTION_CACHE_SECONDS))
+    return data
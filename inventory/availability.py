@@ -0,0 +1,136 @@
+"""
+Bulk recipe availability.
+
+All active recipes and the stock they use are loaded in two queries and laid
+out as a recipe x ingredient matrix of per-serving requirements (converted to
+each ingredient's stock unit). Availability, maximum producible servings and
+shortages for every recipe then come out of a few NumPy operations. Units
+are converted for all lines at once with ``units.conversion_factors``.
+"""
+import numpy as np
+
+from .models import Recipe, RecipeIngredient
+from .units import conversion_factors
+
+
+def load_recipe_matrix(recipe_ids=None):
+    """
+    Build the requirement matrix.
+
+    Covers every active recipe, or exactly `recipe_ids` whether active or
+    not. Returns a dict with `recipes` (list of id/name rows), `ingredients`
+    (list of id/name/unit rows), `requirements` (recipes x ingredients,
+    per-serving quantity in the ingredient's unit), `stock` (per ingredient)
+    and `unit_errors` (recipe index -> ingredient names whose recipe unit
+    cannot be converted).
+    """
+    # Recipes asked for by id are included even when inactive
+    if recipe_ids is None:
+        recipes = Recipe.objects.filter(is_active=True)
+        lines = RecipeIngredient.objects.filter(recipe__is_active=True)
+    else:
+        recipes = Recipe.objects.filter(id__in=recipe_ids)
+        lines = RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+    recipes = recipes.order_by('name')
+
+    recipes = list(recipes.values('id', 'name'))
+    lines = list(lines.values(
+        'recipe_id', 'quantity', 'unit', 'ingredient_id', 'ingredient__name',
+        'ingredient__unit', 'ingredient__current_stock', 'ingredient__density',
+        'ingredient__piece_weight'
+    ))
+
+    recipe_index = {recipe['id']: index for index, recipe in enumerate(recipes)}
+    ingredient_index = {}
+    ingredients = []
+    stock = []
+    for line in lines:
+        if line['ingredient_id'] not in ingredient_index:
+            ingredient_index[line['ingredient_id']] = len(ingredients)
+            ingredients.append({
+                'id': line['ingredient_id'],
+                'name': line['ingredient__name'],
+                'unit': line['ingredient__unit'],
+            })
+            stock.append(float(line['ingredient__current_stock']))
+
+    factors = conversion_factors(
+        [line['unit'] for line in lines],
+        [line['ingredient__unit'] for line in lines],
+        [line['ingredient__density'] for line in lines],
+        [line['ingredient__piece_weight'] for line in lines]
+    )
+    rows = np.array([recipe_index[line['recipe_id']] for line in lines], dtype=int)
+    columns = np.array([ingredient_index[line['ingredient_id']] for line in lines], dtype=int)
+    quantities = np.array([float(line['quantity']) for line in lines])
+
+    convertible = ~np.isnan(factors)
+    requirements = np.zeros((len(recipes), len(ingredients)))
+    np.add.at(requirements, (rows[convertible], columns[convertible]), quantities[convertible] * factors[convertible])
+
+    unit_errors = {}
+    for position in np.flatnonzero(~convertible):
+        unit_errors.setdefault(int(rows[position]), []).append(lines[position]['ingredient__name'])
+
+    return {
+        'recipes': recipes,
+        'ingredients': ingredients,
+        'requirements': requirements,
+        'stock': np.maximum(np.array(stock, dtype=float), 0.0),
+        'unit_errors': unit_errors,
+    }
+
+
+def max_producible(requirements, stock):
+    """Maximum whole servings per recipe (inf for recipes that need nothing) and the limiting column"""
+    if requirements.shape[1] == 0:
+        return np.full(requirements.shape[0], np.inf), np.full(requirements.shape[0], -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.where(requirements > 0, stock[np.newaxis, :] / requirements, np.inf)
+    limiting = ratios.argmin(axis=1)
+    servings = np.floor(ratios.min(axis=1))
+    limiting[np.isinf(servings)] = -1
+    return servings, limiting
+
+
+def recipe_availability(servings=1, recipe_ids=None):
+    """Availability of every active recipe (or of `recipe_ids`, active or not) for `servings` servings"""
+    matrix = load_recipe_matrix(recipe_ids)
+    requirements = matrix['requirements']
+    stock = matrix['stock']
+    ingredients = matrix['ingredients']
+
+    max_servings, limiting = max_producible(requirements, stock)
+    required = requirements * servings
+    shortages = np.clip(required - stock[np.newaxis, :], 0, None)
+
+    results = []
+    for row, recipe in enumerate(matrix['recipes']):
+        unit_errors = matrix['unit_errors'].get(row, [])
+        short_columns = np.flatnonzero(shortages[row] > 0)
+        if unit_errors:
+            # Cannot tell how much of these is needed, so never report the recipe as makeable
+            recipe_max, limiting_name = 0, unit_errors[0]
+        elif np.isinf(max_servings[row]):
+            recipe_max, limiting_name = None, None
+        else:
+            recipe_max, limiting_name = int(max_servings[row]), ingredients[limiting[row]]['name']
+        results.append({
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'available': not unit_errors and short_columns.size == 0,
+            'max_servings': recipe_max,
+            'limiting_ingredient': limiting_name,
+            'unavailable_ingredients': [
+                {
+                    'ingredient': ingredients[column]['name'],
+                    'unit': ingredients[column]['unit'],
+                    'required': round(float(required[row, column]), 3),
+                    'available': round(float(stock[column]), 3),
+                    'shortage': round(float(shortages[row, column]), 3),
+                }
+                for column in short_columns
+            ],
+            'unit_errors': unit_errors,
+        })
+    return results
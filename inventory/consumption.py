@@ -0,0 +1,90 @@
+"""
+Recipe-driven stock consumption.
+
+Sold cakes are exploded through cake -> Recipe -> RecipeIngredient into
+ingredient quantities, aggregated per ingredient, and posted as `out`
+movements in one batched ledger write.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+
+from .ledger import apply_movements
+from .models import RecipeIngredient
+from .units import conversion_factors
+
+
+def load_bill_of_materials(cake_ids):
+    """
+    Ingredient quantities needed for one of each cake, in the ingredient's stock unit.
+
+    Returns (bill, ingredients, unit_errors): `bill` maps cake id ->
+    {ingredient id: quantity per cake}, `ingredients` maps ingredient id ->
+    name/unit/current_stock, and `unit_errors` lists recipe lines whose unit
+    cannot be converted.
+    """
+    lines = list(RecipeIngredient.objects.filter(
+        recipe__cake_id__in=list(cake_ids),
+        recipe__is_active=True
+    ).values(
+        'recipe__cake_id', 'recipe__servings', 'quantity', 'unit',
+        'ingredient_id', 'ingredient__name', 'ingredient__unit', 'ingredient__current_stock',
+        'ingredient__density', 'ingredient__piece_weight'
+    ))
+    factors = conversion_factors(
+        [line['unit'] for line in lines],
+        [line['ingredient__unit'] for line in lines],
+        [line['ingredient__density'] for line in lines],
+        [line['ingredient__piece_weight'] for line in lines]
+    )
+
+    bill = {}
+    ingredients = {}
+    unit_errors = []
+    for line, factor in zip(lines, factors):
+        ingredients.setdefault(line['ingredient_id'], {
+            'id': line['ingredient_id'],
+            'name': line['ingredient__name'],
+            'unit': line['ingredient__unit'],
+            'current_stock': float(line['ingredient__current_stock']),
+        })
+        per_cake = bill.setdefault(line['recipe__cake_id'], {})
+        if np.isnan(factor):
+            unit_errors.append({'cake_id': line['recipe__cake_id'], 'ingredient': line['ingredient__name']})
+            continue
+        per_cake[line['ingredient_id']] = per_cake.get(line['ingredient_id'], 0.0) + (
+            float(line['quantity']) * line['recipe__servings'] * float(factor)
+        )
+    return bill, ingredients, unit_errors
+
+
+def deduct_for_cakes(cake_quantities, reference=None, notes=None, created_by=None):
+    """
+    Post recipe-derived `out` movements for sold cakes.
+
+    `cake_quantities` maps cake id -> number of cakes. Lines are aggregated per
+    ingredient and applied in a single ledger batch. Cakes without a recipe
+    are skipped. Returns the created movements.
+    """
+    bill, _, _ = load_bill_of_materials(cake_quantities)
+
+    totals = defaultdict(float)
+    for cake_id, quantity in cake_quantities.items():
+        for ingredient_id, per_cake in bill.get(cake_id, {}).items():
+            totals[ingredient_id] += per_cake * quantity
+
+    return apply_movements(
+        [
+            {
+                'ingredient_id': ingredient_id,
+                'movement_type': 'out',
+                'quantity': Decimal(str(round(quantity, 3))),
+                'reference': reference,
+                'notes': notes,
+            }
+            for ingredient_id, quantity in sorted(totals.items())
+            if quantity > 0
+        ],
+        created_by=created_by
+    )
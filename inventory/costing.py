@@ -0,0 +1,114 @@
+"""
+Recipe costing.
+
+Ingredient cost of every recipe from its lines and the ingredients' current
+unit costs. Recipe quantities are per serving and are converted to the
+ingredient's stock unit (the unit ``unit_cost`` is quoted in) in one
+vectorized pass, so costing all recipes takes two queries.
+
+``cached_recipe_costs`` memoizes the result per recipe. Entries are
+dropped by ``invalidate_recipe_costs`` (wired up in ``inventory.signals``)
+when a recipe or its lines change, and, through the ingredient -> recipe
+reverse lookup, when an ingredient's cost or conversion properties change.
+The day-long timeout relies on those deletes reaching every worker through
+the shared cache; on a per-process cache entries expire within a minute.
+"""
+import numpy as np
+from django.core.cache import cache
+
+from sweetbite_backend.caching import cache_timeout
+
+from .models import Recipe, RecipeIngredient
+from .units import conversion_factors
+
+
+def recipe_costs(recipe_ids=None):
+    """
+    Cost per serving and per cake for active recipes (or `recipe_ids`).
+
+    Returns {recipe id: {id, name, cake_id, servings, cost_per_serving,
+    cost_per_cake, unit_errors}}. Lines whose unit cannot be converted are
+    left out of the cost and listed in `unit_errors`.
+    """
+    recipes = Recipe.objects.filter(is_active=True)
+    lines = RecipeIngredient.objects.filter(recipe__is_active=True)
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+        lines = lines.filter(recipe_id__in=recipe_ids)
+
+    recipes = list(recipes.order_by('name').values('id', 'name', 'cake_id', 'servings'))
+    lines = list(lines.values(
+        'recipe_id', 'quantity', 'unit', 'ingredient__name', 'ingredient__unit',
+        'ingredient__unit_cost', 'ingredient__density', 'ingredient__piece_weight'
+    ))
+
+    recipe_index = {recipe['id']: index for index, recipe in enumerate(recipes)}
+    factors = conversion_factors(
+        [line['unit'] for line in lines],
+        [line['ingredient__unit'] for line in lines],
+        [line['ingredient__density'] for line in lines],
+        [line['ingredient__piece_weight'] for line in lines]
+    )
+    rows = np.array([recipe_index[line['recipe_id']] for line in lines], dtype=int)
+    line_costs = np.array([
+        float(line['quantity']) * float(line['ingredient__unit_cost']) for line in lines
+    ]) * factors
+
+    convertible = ~np.isnan(line_costs)
+    per_serving = np.bincount(rows[convertible], weights=line_costs[convertible], minlength=len(recipes))
+
+    costs = {}
+    for row, recipe in enumerate(recipes):
+        costs[recipe['id']] = {
+            **recipe,
+            'cost_per_serving': round(float(per_serving[row]), 2),
+            'cost_per_cake': round(float(per_serving[row]) * recipe['servings'], 2),
+            'unit_errors': [],
+        }
+    for position in np.flatnonzero(~convertible):
+        costs[recipes[rows[position]]['id']]['unit_errors'].append(lines[position]['ingredient__name'])
+    return costs
+
+
+RECIPE_COST_CACHE_SECONDS = 24 * 60 * 60
+
+
+def _cost_key(recipe_id):
+    return f'inventory:recipe-cost:{recipe_id}'
+
+
+def cached_recipe_costs(recipe_ids):
+    """recipe_costs for `recipe_ids`, computing only the ones not already memoized"""
+    recipe_ids = list(recipe_ids)
+    cached = cache.get_many([_cost_key(recipe_id) for recipe_id in recipe_ids])
+    costs = {recipe_id: cached[_cost_key(recipe_id)] for recipe_id in recipe_ids if _cost_key(recipe_id) in cached}
+
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in costs]
+    if missing:
+        computed = recipe_costs(missing)
+        cache.set_many(
+            {_cost_key(recipe_id): cost for recipe_id, cost in computed.items()},
+            cache_timeout(RECIPE_COST_CACHE_SECONDS)
+        )
+        costs.update(computed)
+    return costs
+
+
+def cake_costs(cake_ids):
+    """{cake id: ingredient cost of one cake} for cakes with an active recipe"""
+    recipes = dict(
+        Recipe.objects.filter(cake_id__in=list(cake_ids), is_active=True).values_list('id', 'cake_id')
+    )
+    costs = cached_recipe_costs(recipes)
+    return {recipes[recipe_id]: cost['cost_per_cake'] for recipe_id, cost in costs.items()}
+
+
+def invalidate_recipe_costs(recipe_ids=(), ingredient_ids=()):
+    """Forget memoized costs for these recipes and every recipe using these ingredients"""
+    recipe_ids = set(recipe_ids)
+    if ingredient_ids:
+        recipe_ids.update(
+            RecipeIngredient.objects.filter(ingredient_id__in=list(ingredient_ids)).values_list('recipe_id', flat=True)
+        )
+    if recipe_ids:
+        cache.delete_many([_cost_key(recipe_id) for recipe_id in recipe_ids])
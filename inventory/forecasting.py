@@ -0,0 +1,144 @@
+"""
+Ingredient demand forecasting and reorder points.
+
+Daily consumption (out + waste movements) for every ingredient is loaded
+in one grouped query and laid out as an ingredients x days matrix. Simple
+exponential smoothing then runs across all ingredients at once, one NumPy
+step per day, tracking the one-step-ahead forecast error alongside the
+level. From the forecast daily usage and the supplier's lead time:
+
+    safety stock  = z * error std dev * sqrt(lead time)
+    reorder point = daily usage * lead time + safety stock
+
+Days before an ingredient was created are masked out so new ingredients
+are not dragged towards zero.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Ingredient, StockMovement
+
+CONSUMPTION_TYPES = ['out', 'waste']
+HISTORY_DAYS = 90
+SMOOTHING_ALPHA = 0.3
+SERVICE_LEVEL_Z = 1.65  # ~95% cycle service level
+INITIAL_WINDOW_DAYS = 7
+DEFAULT_LEAD_TIME_DAYS = 7  # Ingredients without a supplier
+
+
+def load_consumption_matrix(history_days=HISTORY_DAYS, end_date=None):
+    """
+    Returns (ingredients, days, usage, observed): ingredient rows with lead
+    time, the list of dates, the ingredients x days consumption matrix and a
+    boolean mask of the days each ingredient existed.
+    """
+    end_date = end_date or timezone.now().date()
+    start_date = end_date - timedelta(days=history_days - 1)
+    days = [start_date + timedelta(days=offset) for offset in range(history_days)]
+
+    ingredients = list(
+        Ingredient.objects.filter(is_active=True).annotate(
+            lead_time=Coalesce('supplier__lead_time_days', DEFAULT_LEAD_TIME_DAYS)
+        ).order_by('id').values('id', 'name', 'unit', 'created_at', 'lead_time')
+    )
+    row_index = {ingredient['id']: row for row, ingredient in enumerate(ingredients)}
+
+    usage = np.zeros((len(ingredients), history_days))
+    for movement in StockMovement.objects.filter(
+        ingredient_id__in=list(row_index),
+        movement_type__in=CONSUMPTION_TYPES,
+        created_at__date__range=[start_date, end_date]
+    ).annotate(day=TruncDate('created_at')).values('ingredient_id', 'day').annotate(
+        quantity=Sum('quantity')
+    ).order_by():
+        usage[row_index[movement['ingredient_id']], (movement['day'] - start_date).days] = float(movement['quantity'])
+
+    first_day = np.array([
+        max((timezone.localtime(ingredient['created_at']).date() - start_date).days, 0)
+        for ingredient in ingredients
+    ], dtype=int).reshape(-1, 1)
+    observed = np.arange(history_days)[np.newaxis, :] >= first_day
+
+    return ingredients, days, usage, observed
+
+
+def exponential_smoothing(usage, observed, alpha=SMOOTHING_ALPHA):
+    """
+    Vectorized simple exponential smoothing.
+
+    Returns (level, error_std): the forecast daily usage and the standard
+    deviation of one-step-ahead forecast errors per ingredient.
+    """
+    count, history_days = usage.shape
+    if count == 0:
+        return np.zeros(0), np.zeros(0)
+
+    # Seed each level with the mean of its first observed week
+    seed_mask = observed & (np.cumsum(observed, axis=1) <= INITIAL_WINDOW_DAYS)
+    seed_days = np.maximum(seed_mask.sum(axis=1), 1)
+    level = (usage * seed_mask).sum(axis=1) / seed_days
+
+    squared_error = np.zeros(count)
+    error_days = np.zeros(count)
+    for day in range(history_days):
+        active = observed[:, day]
+        error = usage[:, day] - level
+        squared_error += np.where(active, error ** 2, 0.0)
+        error_days += active
+        level = np.where(active, level + alpha * error, level)
+
+    error_std = np.sqrt(squared_error / np.maximum(error_days, 1))
+    return level, error_std
+
+
+def reorder_levels(level, error_std, lead_time, z=SERVICE_LEVEL_Z):
+    """(safety_stock, reorder_point) per ingredient for the given lead times in days"""
+    safety_stock = z * error_std * np.sqrt(lead_time)
+    reorder_point = level * lead_time + safety_stock
+    return safety_stock, reorder_point
+
+
+def forecast_demand(history_days=HISTORY_DAYS, alpha=SMOOTHING_ALPHA):
+    """Forecast usage and reorder levels for every active ingredient, without saving"""
+    ingredients, days, usage, observed = load_consumption_matrix(history_days)
+    level, error_std = exponential_smoothing(usage, observed, alpha)
+    lead_time = np.array([ingredient['lead_time'] for ingredient in ingredients], dtype=float)
+    safety_stock, reorder_point = reorder_levels(level, error_std, lead_time)
+
+    return [
+        {
+            **ingredient,
+            'daily_usage_forecast': round(float(level[row]), 3),
+            'safety_stock': round(float(safety_stock[row]), 3),
+            'reorder_point': round(float(reorder_point[row]), 3),
+        }
+        for row, ingredient in enumerate(ingredients)
+    ]
+
+
+def refresh_reorder_points(history_days=HISTORY_DAYS, alpha=SMOOTHING_ALPHA):
+    """Recompute and store forecasts for all active ingredients in one bulk update. Returns the forecasts."""
+    forecasts = forecast_demand(history_days, alpha)
+    now = timezone.now()
+    with transaction.atomic():
+        Ingredient.objects.bulk_update(
+            [
+                Ingredient(
+                    id=forecast['id'],
+                    daily_usage_forecast=Decimal(str(forecast['daily_usage_forecast'])),
+                    safety_stock=Decimal(str(forecast['safety_stock'])),
+                    reorder_point=Decimal(str(forecast['reorder_point'])),
+                    forecast_updated_at=now,
+                )
+                for forecast in forecasts
+            ],
+            ['daily_usage_forecast', 'safety_stock', 'reorder_point', 'forecast_updated_at'],
+            batch_size=500
+        )
+    return forecasts
@@ -0,0 +1,155 @@
+"""
+Point-in-time stock reconstruction.
+
+``take_checkpoints`` records every ingredient's stock and unit cost (run
+nightly by the ``checkpoint_stock`` command). Stock at any moment is then
+the nearest checkpoint at or before it plus the ledger movements recorded
+after that checkpoint, so only a checkpoint interval of movements is ever
+replayed. Ingredients with no checkpoint yet fall back to the ledger
+itself: the ``previous_stock`` of their first movement after the moment,
+or their current stock if nothing has moved since.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .ledger import _apply
+from .models import Ingredient, StockCheckpoint, StockMovement
+
+
+def take_checkpoints(ingredient_ids=None):
+    """Checkpoint current stock for all (or the given) ingredients. Returns checkpoints created."""
+    ingredients = Ingredient.objects.all()
+    if ingredient_ids is not None:
+        ingredients = ingredients.filter(id__in=ingredient_ids)
+
+    with transaction.atomic():
+        # Same locks as the ledger, so no movement can fall between the read and taken_at
+        rows = list(
+            ingredients.select_for_update().order_by('id').values('id', 'current_stock', 'unit_cost')
+        )
+        taken_at = timezone.now()
+        StockCheckpoint.objects.bulk_create([
+            StockCheckpoint(
+                ingredient_id=row['id'],
+                stock=row['current_stock'],
+                unit_cost=row['unit_cost'],
+                taken_at=taken_at,
+            )
+            for row in rows
+        ])
+    return len(rows)
+
+
+def _replay(states, moment_from, moment_to, before_movement=None):
+    """Apply movements after each state's `since` up to `moment_to` (inclusive), in ledger order"""
+    if not states:
+        return
+    movements = StockMovement.objects.filter(
+        ingredient_id__in=list(states),
+        created_at__gt=moment_from,
+        created_at__lte=moment_to
+    ).order_by('created_at', 'id').values('ingredient_id', 'movement_type', 'quantity', 'created_at')
+    for movement in movements.iterator():
+        state = states[movement['ingredient_id']]
+        if state['since'] is not None and movement['created_at'] <= state['since']:
+            continue
+        if before_movement:
+            before_movement(movement)
+        state['stock'] = _apply(movement['movement_type'], state['stock'], movement['quantity'])
+
+
+def stock_at(moment, ingredient_ids=None):
+    """
+    Stock and inventory value of each ingredient that existed at `moment`.
+
+    Two queries: checkpoint/fallback anchors for every ingredient, then the
+    movements between the oldest checkpoint used and `moment`.
+    """
+    checkpoint = StockCheckpoint.objects.filter(
+        ingredient=OuterRef('pk'), taken_at__lte=moment
+    ).order_by('-taken_at')
+    first_after = StockMovement.objects.filter(
+        ingredient=OuterRef('pk'), created_at__gt=moment
+    ).order_by('created_at', 'id')
+
+    ingredients = Ingredient.objects.filter(created_at__lte=moment)
+    if ingredient_ids is not None:
+        ingredients = ingredients.filter(id__in=ingredient_ids)
+    rows = ingredients.annotate(
+        checkpoint_stock=Subquery(checkpoint.values('stock')[:1]),
+        checkpoint_cost=Subquery(checkpoint.values('unit_cost')[:1]),
+        checkpoint_at=Subquery(checkpoint.values('taken_at')[:1]),
+        stock_after=Subquery(first_after.values('previous_stock')[:1]),
+    ).order_by('name').values(
+        'id', 'name', 'unit', 'current_stock', 'unit_cost',
+        'checkpoint_stock', 'checkpoint_cost', 'checkpoint_at', 'stock_after'
+    )
+
+    states = {}
+    replayed = {}
+    for row in rows:
+        if row['checkpoint_at'] is not None:
+            state = {'stock': row['checkpoint_stock'], 'unit_cost': row['checkpoint_cost'], 'since': row['checkpoint_at']}
+            replayed[row['id']] = state
+        else:
+            stock = row['stock_after'] if row['stock_after'] is not None else row['current_stock']
+            state = {'stock': stock, 'unit_cost': row['unit_cost'], 'since': None}
+        state.update(id=row['id'], name=row['name'], unit=row['unit'])
+        states[row['id']] = state
+
+    if replayed:
+        _replay(replayed, min(state['since'] for state in replayed.values()), moment)
+
+    for state in states.values():
+        state['value'] = state['stock'] * state['unit_cost']
+    return states
+
+
+def end_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.max))
+
+
+def stock_series(start_date, end_date, ingredient_ids=None):
+    """
+    Closing stock per day for ingredients that existed at the start of the
+    range: the opening position from ``stock_at`` plus one pass over the
+    movements inside the range.
+    """
+    opening = end_of_day(start_date - timedelta(days=1))
+    states = stock_at(opening, ingredient_ids)
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+    # Stock of every ingredient at the close of each day, filled forward
+    series = {ingredient_id: [] for ingredient_id in states}
+    cursor = {'day': 0}
+
+    def close_days_before(day):
+        while cursor['day'] < len(days) and days[cursor['day']] < day:
+            for ingredient_id, state in states.items():
+                series[ingredient_id].append(state['stock'])
+            cursor['day'] += 1
+
+    for state in states.values():
+        state['since'] = None
+    _replay(
+        states, opening, end_of_day(end_date),
+        before_movement=lambda movement: close_days_before(timezone.localtime(movement['created_at']).date())
+    )
+    close_days_before(end_date + timedelta(days=1))
+
+    return {
+        'dates': days,
+        'ingredients': [
+            {
+                'id': state['id'],
+                'name': state['name'],
+                'unit': state['unit'],
+                'stock': series[state['id']],
+                'value': [stock * state['unit_cost'] for stock in series[state['id']]],
+            }
+            for state in states.values()
+        ]
+    }
@@ -0,0 +1,366 @@
+"""
+Streaming catalog import: suppliers, ingredients, recipes and opening stock.
+
+Rows are read lazily from CSV (header row) or JSON Lines (one object per
+line) and handled in chunks of CHUNK_SIZE, each in its own transaction, so
+memory stays flat however long the file is. Values are cleaned with the
+model fields' own validation; foreign keys are resolved by name through
+lookup maps loaded once per import, and rows that fail are reported by row
+number instead of aborting the import. A JSON line that does not parse to
+an object is reported the same way, with its line number in the message.
+
+Names are the natural keys. Suppliers, ingredients and recipe headers are
+upserted with one ``bulk_create(update_conflicts=True)`` per chunk; only
+the columns present in the file are overwritten on existing rows. Recipe
+files have one row per line (``recipe``, ``ingredient``, ``quantity``,
+``unit``) and replace each imported recipe's lines. Opening stock goes
+through the ledger as stock-in movements, so lots, alerts and history stay
+consistent; importing the same stock file twice adds the stock twice.
+
+Bulk writes skip model signals, so cost caches and alerts are refreshed
+here explicitly after each chunk.
+"""
+import csv
+import json
+from decimal import Decimal
+from itertools import islice
+
+from cakes.models import Cake
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .alerts import evaluate_ingredients
+from .costing import invalidate_recipe_costs
+from .ledger import apply_movements, bump_stock_cache_version
+from .models import Ingredient, Recipe, RecipeIngredient, StockLot, Supplier
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+IMPORT_KINDS = ['suppliers', 'ingredients', 'recipes', 'stock']
+FORMATS = ['csv', 'jsonl']
+
+SUPPLIER_COLUMNS = [
+    'contact_person', 'email', 'phone', 'address', 'website', 'notes', 'lead_time_days', 'is_active'
+]
+INGREDIENT_COLUMNS = [
+    'description', 'unit', 'minimum_stock', 'unit_cost', 'density', 'piece_weight', 'location', 'is_active'
+]
+RECIPE_COLUMNS = ['description', 'servings', 'instructions', 'is_active']
+RECIPE_LINE_COLUMNS = ['quantity', 'unit', 'notes']
+STOCK_LOT_COLUMNS = ['unit_cost', 'expiry_date', 'lot_number']
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+
+class UnreadableRow(dict):
+    """Stands in for a line that could not be parsed; imported as a row error"""
+
+    def __init__(self, message):
+        super().__init__()
+        self.message = message
+
+
+def read_rows(stream, format='csv'):
+    """Yield rows as dicts from an open text stream"""
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+    elif format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line, parse_float=Decimal)
+            except ValueError as exc:
+                yield UnreadableRow(f"Invalid JSON on line {line_number}: {exc}")
+                continue
+            if not isinstance(row, dict):
+                yield UnreadableRow(f"Line {line_number} is not a JSON object")
+                continue
+            yield row
+    else:
+        raise ValueError(f"Unknown import format: {format}")
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text(row, column):
+    value = row.get(column)
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _clean(model, row, columns, errors):
+    """Values for the `columns` present in `row`, validated by the model fields"""
+    values = {}
+    for column in columns:
+        if column not in row:
+            continue
+        field = model._meta.get_field(column)
+        raw = row[column]
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in ('', None):
+            if field.null:
+                values[column] = None
+            elif field.has_default():
+                values[column] = field.get_default()
+            elif field.blank:
+                values[column] = ''
+            else:
+                errors[column] = 'This field is required.'
+            continue
+        if field.get_internal_type() == 'BooleanField' and isinstance(raw, str):
+            if raw.lower() in TRUE_VALUES:
+                raw = True
+            elif raw.lower() in FALSE_VALUES:
+                raw = False
+        try:
+            values[column] = field.clean(raw, None)
+        except ValidationError as exc:
+            errors[column] = ' '.join(exc.messages)
+    return values
+
+
+def _upsert(model, objects, update_fields):
+    """Insert `objects`, updating `update_fields` on rows whose name already exists"""
+    if not update_fields:
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        return
+    options = {'update_conflicts': True, 'update_fields': update_fields}
+    # MySQL upserts on any unique key and does not take a conflict target
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['name']
+    model.objects.bulk_create(objects, **options)
+
+
+class CatalogImport:
+    """Runs one import and collects its report"""
+
+    def __init__(self, kind, chunk_size=CHUNK_SIZE, dry_run=False, created_by=None):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        self.kind = kind
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.created_by = created_by
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, rows):
+        handle_chunk = getattr(self, f'_import_{self.kind}')
+        self._load_lookups()
+        numbered = enumerate(rows, start=1)
+        for chunk in _chunks(numbered, self.chunk_size):
+            errors_before = self.error_count
+            readable = []
+            for number, row in chunk:
+                if isinstance(row, UnreadableRow):
+                    self._error(number, {'line': row.message})
+                else:
+                    readable.append((number, row))
+            if readable:
+                handle_chunk(readable)
+            self.rows += len(chunk)
+            self.imported += len(chunk) - (self.error_count - errors_before)
+        return self.report()
+
+    def report(self):
+        return {
+            'kind': self.kind,
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            'imported': self.imported,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+    def _error(self, number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'errors': errors})
+
+    def _load_lookups(self):
+        if self.kind == 'ingredients':
+            self.suppliers = dict(Supplier.objects.values_list('name', 'id'))
+            self.ingredient_names = set(Ingredient.objects.values_list('name', flat=True))
+        if self.kind in ('recipes', 'stock'):
+            self.ingredients = {
+                name: (ingredient_id, unit)
+                for name, ingredient_id, unit in Ingredient.objects.values_list('name', 'id', 'unit')
+            }
+        if self.kind == 'recipes':
+            self.cakes = dict(Cake.objects.values_list('name', 'id'))
+            self.cake_recipes = dict(Recipe.objects.filter(cake__isnull=False).values_list('cake_id', 'name'))
+            self.replaced_recipes = set()
+
+    def _named_rows(self, chunk, model, columns, resolve=None):
+        # Clean a chunk of name-keyed rows; the last row wins for repeated names
+        by_name = {}
+        present = set()
+        for number, row in chunk:
+            errors = {}
+            name = _text(row, 'name')
+            if not name:
+                errors['name'] = 'This field is required.'
+            values = _clean(model, row, columns, errors)
+            if resolve:
+                resolve(row, values, errors)
+            if errors:
+                self._error(number, errors)
+                continue
+            present.update(values)
+            by_name[name] = values
+        return by_name, sorted(present)
+
+    def _import_suppliers(self, chunk):
+        suppliers, columns = self._named_rows(chunk, Supplier, SUPPLIER_COLUMNS)
+        if suppliers and not self.dry_run:
+            with transaction.atomic():
+                _upsert(Supplier, [Supplier(name=name, **values) for name, values in suppliers.items()], columns)
+
+    def _check_ingredient(self, row, values, errors):
+        if 'unit' not in values and 'unit' not in errors and _text(row, 'name') not in self.ingredient_names:
+            errors['unit'] = 'This field is required for new ingredients.'
+        if 'supplier' not in row:
+            return
+        name = _text(row, 'supplier')
+        if not name:
+            values['supplier_id'] = None
+        elif name in self.suppliers:
+            values['supplier_id'] = self.suppliers[name]
+        else:
+            errors['supplier'] = f"Unknown supplier: {name}"
+
+    def _import_ingredients(self, chunk):
+        ingredients, columns = self._named_rows(chunk, Ingredient, INGREDIENT_COLUMNS, self._check_ingredient)
+        self.ingredient_names.update(ingredients)
+        if ingredients and not self.dry_run:
+            now = timezone.now()
+            with transaction.atomic():
+                _upsert(
+                    Ingredient,
+                    [Ingredient(name=name, updated_at=now, **values) for name, values in ingredients.items()],
+                    columns + ['updated_at']
+                )
+                ingredient_ids = list(
+                    Ingredient.objects.filter(name__in=list(ingredients)).values_list('id', flat=True)
+                )
+                evaluate_ingredients(ingredient_ids)
+                transaction.on_commit(bump_stock_cache_version)
+            invalidate_recipe_costs(ingredient_ids=ingredient_ids)
+
+    def _import_recipes(self, chunk):
+        headers = {}
+        header_columns = set()
+        lines = []
+        for number, row in chunk:
+            errors = {}
+            recipe_name = _text(row, 'recipe')
+            if not recipe_name:
+                errors['recipe'] = 'This field is required.'
+            header = _clean(Recipe, row, RECIPE_COLUMNS, errors)
+
+            cake_name = _text(row, 'cake')
+            if cake_name:
+                cake_id = self.cakes.get(cake_name)
+                if cake_id is None:
+                    errors['cake'] = f"Unknown cake: {cake_name}"
+                elif self.cake_recipes.get(cake_id, recipe_name) != recipe_name:
+                    errors['cake'] = f"{cake_name} already has recipe {self.cake_recipes[cake_id]}"
+                else:
+                    header['cake_id'] = cake_id
+
+            line = None
+            ingredient_name = _text(row, 'ingredient')
+            if ingredient_name:
+                ingredient = self.ingredients.get(ingredient_name)
+                if ingredient is None:
+                    errors['ingredient'] = f"Unknown ingredient: {ingredient_name}"
+                else:
+                    line = _clean(RecipeIngredient, row, RECIPE_LINE_COLUMNS, errors)
+                    line['ingredient_id'] = ingredient[0]
+                    # Lines default to the ingredient's stock unit
+                    line['unit'] = line.get('unit') or ingredient[1]
+                    if line.get('quantity') is None:
+                        errors['quantity'] = 'This field is required.'
+
+            if errors:
+                self._error(number, errors)
+                continue
+            if 'cake_id' in header:
+                self.cake_recipes[header['cake_id']] = recipe_name
+            headers.setdefault(recipe_name, {}).update(header)
+            header_columns.update(header)
+            if line is not None:
+                lines.append((recipe_name, line))
+
+        if headers and not self.dry_run:
+            now = timezone.now()
+            with transaction.atomic():
+                _upsert(
+                    Recipe,
+                    [Recipe(name=name, updated_at=now, **values) for name, values in headers.items()],
+                    sorted(header_columns) + ['updated_at']
+                )
+                recipe_ids = dict(Recipe.objects.filter(name__in=list(headers)).values_list('name', 'id'))
+                # A recipe's lines may span chunks; clear them only the first time it is seen
+                fresh = [recipe_ids[name] for name in headers if recipe_ids[name] not in self.replaced_recipes]
+                RecipeIngredient.objects.filter(recipe_id__in=fresh).delete()
+                self.replaced_recipes.update(fresh)
+                RecipeIngredient.objects.bulk_create([
+                    RecipeIngredient(recipe_id=recipe_ids[name], **line) for name, line in lines
+                ])
+            invalidate_recipe_costs(recipe_ids=recipe_ids.values())
+
+    def _import_stock(self, chunk):
+        movements = []
+        for number, row in chunk:
+            errors = {}
+            ingredient_name = _text(row, 'ingredient')
+            ingredient = self.ingredients.get(ingredient_name)
+            if ingredient is None:
+                errors['ingredient'] = f"Unknown ingredient: {ingredient_name}" if ingredient_name else 'This field is required.'
+            values = _clean(StockLot, row, STOCK_LOT_COLUMNS, errors)
+            quantity = _clean(StockLot, {'quantity_received': row.get('quantity')}, ['quantity_received'], errors)
+            if 'quantity_received' in errors:
+                errors['quantity'] = errors.pop('quantity_received')
+            elif quantity['quantity_received'] is None or quantity['quantity_received'] <= 0:
+                errors['quantity'] = 'Must be greater than zero.'
+            if values.get('unit_cost') is None:
+                # The ledger falls back to the ingredient's unit cost
+                values.pop('unit_cost', None)
+            if errors:
+                self._error(number, errors)
+                continue
+            movements.append({
+                'ingredient_id': ingredient[0],
+                'movement_type': 'in',
+                'reference': 'OPENING',
+                'notes': 'Opening stock import',
+                'quantity': quantity.get('quantity_received'),
+                **values,
+            })
+        if movements and not self.dry_run:
+            apply_movements(movements, created_by=self.created_by)
+
+
+def import_catalog(kind, rows, chunk_size=CHUNK_SIZE, dry_run=False, created_by=None):
+    """
+    Import an iterable of row dicts of the given kind.
+
+    Returns {kind, dry_run, rows, imported, error_count, errors}, where
+    `errors` lists up to MAX_REPORTED_ERRORS {row, errors} entries.
+    """
+    return CatalogImport(kind, chunk_size, dry_run, created_by).run(rows)
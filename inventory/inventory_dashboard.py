@@ -2,12 +2,92 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.core.cache import cache
 from django.db.models import Sum, Count, Q, F
-from django.utils import timezone
-from datetime import datetime, timedelta
+from sweetbite_backend.caching import cache_timeout
 
+from .alerts import low_stock_ingredient_ids
+from .ledger import stock_cache_version
+from .lots import expiring_lots
 from .models import Ingredient, Supplier, StockMovement
-from .serializers import IngredientSerializer, SupplierSerializer, StockMovementSerializer
+from .serializers import SupplierSerializer, StockMovementSerializer
+
+
+# Cached under the stock cache version; capped on a per-process cache, which never sees another worker's bump
+DASHBOARD_CACHE_SECONDS = 5 * 60
+
+
+def build_dashboard_data():
+    """
+    Assemble the dashboard payload in five queries, independent of the
+    number of ingredients or suppliers. Cached under the stock cache
+    version, so the snapshot is rebuilt after any stock movement.
+    """
+    # Low stock comes from the active alert set
+    low_stock = Q(id__in=low_stock_ingredient_ids())
+
+    overview = Ingredient.objects.aggregate(
+        total_ingredients=Count('id'),
+        low_stock_count=Count('id', filter=low_stock),
+        total_value=Sum(F('current_stock') * F('unit_cost'))
+    )
+    overview['total_value'] = overview['total_value'] or 0
+
+    low_stock_items = Ingredient.objects.filter(low_stock).values(
+        'id', 'name', 'current_stock', 'minimum_stock', 'unit', 'unit_cost'
+    )
+    # Expiring stock from the lot expiry index
+    expiring_items = [
+        {
+            'id': item['ingredient_id'],
+            'name': item['name'],
+            'expiry_date': item['earliest_expiry'],
+            'current_stock': item['current_stock'],
+            'expiring_quantity': item['expiring_quantity'],
+            'unit': item['unit'],
+        }
+        for item in expiring_lots(30)
+    ]
+    overview['expiring_soon_count'] = len(expiring_items)
+
+    recent_movements = StockMovement.objects.select_related(
+        'ingredient__supplier', 'created_by'
+    ).order_by('-created_at')[:10]
+
+    # One grouped query serves both the supplier list and its statistics
+    suppliers = list(Supplier.objects.annotate(
+        total_ingredients=Count('ingredients'),
+        low_stock_count=Count('ingredients', filter=Q(
+            ingredients__id__in=low_stock_ingredient_ids()
+        )),
+        total_value=Sum(F('ingredients__current_stock') * F('ingredients__unit_cost'))
+    ))
+    supplier_stats = [
+        {
+            'id': supplier.id,
+            'name': supplier.name,
+            'contact_person': supplier.contact_person,
+            'email': supplier.email,
+            'phone': supplier.phone,
+            'total_ingredients': supplier.total_ingredients,
+            'low_stock_count': supplier.low_stock_count,
+            'total_value': supplier.total_value or 0
+        }
+        for supplier in suppliers
+    ]
+
+    return {
+        'overview': overview,
+        'ingredients': {
+            'low_stock_items': list(low_stock_items),
+            'expiring_items': expiring_items,
+            'recent_movements': list(StockMovementSerializer(recent_movements, many=True).data)
+        },
+        'suppliers': {
+            'list': list(SupplierSerializer(suppliers, many=True).data),
+            'stats': supplier_stats
+        }
+    }
 
 
 @api_view(['GET'])
@@ -26,81 +106,12 @@ def inventory_dashboard_stats(request):
         )
     
     try:
-        # Get all ingredients
-        all_ingredients = Ingredient.objects.all()
-        
-        # Calculate basic statistics
-        total_ingredients = all_ingredients.count()
-        low_stock_count = all_ingredients.filter(
-            current_stock__lte=F('minimum_stock')
-        ).count()
-        
-        # Calculate total inventory value
-        total_value = all_ingredients.aggregate(
-            total=Sum(F('current_stock') * F('unit_cost'))
-        )['total'] or 0
-        
-        # Get low stock items
-        low_stock_items = all_ingredients.filter(
-            current_stock__lte=F('minimum_stock')
-        ).values('id', 'name', 'current_stock', 'minimum_stock', 'unit', 'unit_cost')
-        
-        # Get expiring items (next 30 days)
-        thirty_days_from_now = timezone.now().date() + timedelta(days=30)
-        expiring_items = all_ingredients.filter(
-            expiry_date__lte=thirty_days_from_now,
-            expiry_date__gte=timezone.now().date()
-        ).values('id', 'name', 'expiry_date', 'current_stock', 'unit')
-        
-        # Get suppliers
-        suppliers = Supplier.objects.all()
-        
-        # Get recent stock movements
-        recent_movements = StockMovement.objects.filter(
-            ingredient__in=all_ingredients
-        ).order_by('-created_at')[:10]
-        
-        # Calculate supplier statistics
-        supplier_stats = []
-        for supplier in suppliers:
-            supplier_ingredients = all_ingredients.filter(supplier=supplier)
-            supplier_low_stock = supplier_ingredients.filter(
-                current_stock__lte=F('minimum_stock')
-            ).count()
-            supplier_value = supplier_ingredients.aggregate(
-                total=Sum(F('current_stock') * F('unit_cost'))
-            )['total'] or 0
-            
-            supplier_stats.append({
-                'id': supplier.id,
-                'name': supplier.name,
-                'contact_person': supplier.contact_person,
-                'email': supplier.email,
-                'phone': supplier.phone,
-                'total_ingredients': supplier_ingredients.count(),
-                'low_stock_count': supplier_low_stock,
-                'total_value': supplier_value
-            })
-        
-        # Prepare response data
-        dashboard_data = {
-            'overview': {
-                'total_ingredients': total_ingredients,
-                'low_stock_count': low_stock_count,
-                'total_value': total_value,
-                'expiring_soon_count': expiring_items.count()
-            },
-            'ingredients': {
-                'low_stock_items': list(low_stock_items),
-                'expiring_items': list(expiring_items),
-                'recent_movements': StockMovementSerializer(recent_movements, many=True).data
-            },
-            'suppliers': {
-                'list': SupplierSerializer(suppliers, many=True).data,
-                'stats': supplier_stats
-            }
-        }
-        
+        key = f'inventory:dashboard:{stock_cache_version()}'
+        dashboard_data = cache.get(key)
+        if dashboard_data is None:
+            dashboard_data = build_dashboard_data()
+            cache.set(key, dashboard_data, cache_timeout(DASHBOARD_CACHE_SECONDS))
+
         return Response(dashboard_data, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -0,0 +1,185 @@
+"""
+Stock ledger: the only place that changes Ingredient.current_stock once
+an ingredient exists. Opening stock given when an ingredient is created is
+written with its first lot (``IngredientCreateSerializer``); after that the
+API, imports and management commands all move stock through here.
+
+Movements are applied inside a transaction with the affected ingredient rows
+locked (select_for_update, in id order to avoid deadlocks), so concurrent
+movements on the same ingredient cannot lose updates and every StockMovement
+records the stock it actually saw. A batch touching any number of
+ingredients costs a fixed number of queries: one locking read, one UPDATE
+and one INSERT, plus up to three for stock lots (see ``inventory.lots``):
+stock coming in opens a lot, stock going out draws lots down FEFO; and up
+to three to re-evaluate low-stock and expiry alerts for just the touched
+ingredients (see ``inventory.alerts``).
+
+Reports derived from stock (consumption analysis, dashboard snapshots) are
+cached under ``stock_cache_version()``, which is bumped once each batch
+commits so every cached result built on older stock is ignored.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, When, Value, DateField, DecimalField
+from django.utils import timezone
+
+from .alerts import evaluate as evaluate_alerts
+from .lots import LotBook
+from .models import Ingredient, StockMovement
+
+STOCK_FIELD = DecimalField(max_digits=10, decimal_places=3)
+STOCK_CACHE_VERSION_KEY = 'inventory:stock-version'
+
+
+def stock_cache_version():
+    """Current version of stock-derived cached data"""
+    version = cache.get(STOCK_CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(STOCK_CACHE_VERSION_KEY, 1, None)
+        version = cache.get(STOCK_CACHE_VERSION_KEY, 1)
+    return version
+
+
+def bump_stock_cache_version():
+    try:
+        cache.incr(STOCK_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(STOCK_CACHE_VERSION_KEY, 2, None)
+
+
+def _apply(movement_type, stock, quantity):
+    if movement_type == 'in':
+        return stock + quantity
+    if movement_type in ('out', 'waste'):
+        return stock - quantity
+    if movement_type == 'adjustment':
+        return quantity
+    raise ValueError(f"Unknown movement type: {movement_type}")
+
+
+def apply_movements(movements, created_by=None):
+    """
+    Apply a batch of stock movements atomically.
+
+    Each movement is a dict with `ingredient_id`, `movement_type` and
+    `quantity`, and optionally `unit_cost` (defaults to the ingredient's
+    current unit cost), `reference` and `notes`. Several movements may target
+    the same ingredient; they are applied in the given order. Stock-in
+    movements may also carry `expiry_date`, `lot_number` and
+    `purchase_order_item_id` for the lot they open.
+
+    Returns the created StockMovement objects in input order.
+    """
+    movements = list(movements)
+    if not movements:
+        return []
+
+    ingredient_ids = sorted({movement['ingredient_id'] for movement in movements})
+
+    with transaction.atomic():
+        locked = {
+            row['id']: row
+            for row in Ingredient.objects.select_for_update().filter(
+                id__in=ingredient_ids
+            ).order_by('id').values('id', 'current_stock', 'minimum_stock', 'unit_cost')
+        }
+        missing = set(ingredient_ids) - set(locked)
+        if missing:
+            raise Ingredient.DoesNotExist(f"Ingredients not found: {sorted(missing)}")
+
+        stock = {ingredient_id: row['current_stock'] for ingredient_id, row in locked.items()}
+        lots = LotBook(ingredient_ids)
+        now = timezone.now()
+        created = []
+        for movement in movements:
+            ingredient_id = movement['ingredient_id']
+            quantity = Decimal(movement['quantity'])
+            unit_cost = movement.get('unit_cost')
+            if unit_cost is None:
+                unit_cost = locked[ingredient_id]['unit_cost']
+            unit_cost = Decimal(unit_cost)
+
+            previous_stock = stock[ingredient_id]
+            new_stock = _apply(movement['movement_type'], previous_stock, quantity)
+            stock[ingredient_id] = new_stock
+
+            # Adjustments open or draw down lots by the difference they make
+            change = new_stock - previous_stock
+            if change > 0:
+                lots.receive(
+                    ingredient_id, change, unit_cost,
+                    expiry_date=movement.get('expiry_date'),
+                    lot_number=movement.get('lot_number'),
+                    purchase_order_item_id=movement.get('purchase_order_item_id'),
+                    received_at=now,
+                )
+            elif change < 0:
+                lots.consume(ingredient_id, -change)
+
+            created.append(StockMovement(
+                ingredient_id=ingredient_id,
+                movement_type=movement['movement_type'],
+                quantity=quantity,
+                previous_stock=previous_stock,
+                new_stock=new_stock,
+                unit_cost=unit_cost,
+                total_value=quantity * unit_cost,
+                reference=movement.get('reference'),
+                notes=movement.get('notes'),
+                created_by=created_by,
+            ))
+
+        # Rows are locked, so writing the computed absolute values is safe
+        Ingredient.objects.filter(id__in=ingredient_ids).update(
+            current_stock=Case(
+                *[When(id=ingredient_id, then=Value(value)) for ingredient_id, value in stock.items()],
+                output_field=STOCK_FIELD
+            ),
+            expiry_date=Case(
+                *[When(id=ingredient_id, then=Value(lots.next_expiry(ingredient_id))) for ingredient_id in stock],
+                output_field=DateField()
+            ),
+            updated_at=now
+        )
+        lots.save()
+
+        evaluate_alerts({
+            ingredient_id: {
+                'stock': value,
+                'minimum_stock': locked[ingredient_id]['minimum_stock'],
+                'expiry_date': lots.next_expiry(ingredient_id),
+            }
+            for ingredient_id, value in stock.items()
+        })
+
+        if len(created) == 1:
+            # save() gives us the primary key on every backend
+            created[0].save()
+        else:
+            StockMovement.objects.bulk_create(created)
+
+        transaction.on_commit(bump_stock_cache_version)
+
+    return created
+
+
+def apply_movement(ingredient, movement_type, quantity, unit_cost=None, reference=None, notes=None, created_by=None):
+    """Apply a single stock movement; see apply_movements"""
+    movement = apply_movements(
+        [{
+            'ingredient_id': getattr(ingredient, 'pk', ingredient),
+            'movement_type': movement_type,
+            'quantity': quantity,
+            'unit_cost': unit_cost,
+            'reference': reference,
+            'notes': notes,
+        }],
+        created_by=created_by
+    )[0]
+    if isinstance(ingredient, Ingredient):
+        # Keep the caller's instance in step with the database
+        ingredient.current_stock = movement.new_stock
+        movement.ingredient = ingredient
+    return movement
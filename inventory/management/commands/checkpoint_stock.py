@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory.history import take_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Record a stock checkpoint for every ingredient (run nightly)'
+
+    def handle(self, *args, **options):
+        created = take_checkpoints()
+        self.stdout.write(self.style.SUCCESS(f'Checkpointed stock for {created} ingredients'))
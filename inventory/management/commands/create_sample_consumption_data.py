@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from inventory.ledger import apply_movement
 from inventory.models import Ingredient, StockMovement
 from decimal import Decimal
 import random
@@ -43,7 +44,6 @@ class Command(BaseCommand):
                 name=ing_data['name'],
                 defaults={
                     'unit': ing_data['unit'],
-                    'current_stock': Decimal(str(ing_data['current_stock'])),
                     'unit_cost': Decimal(str(ing_data['unit_cost'])),
                     'minimum_stock': Decimal(str(ing_data['current_stock'] * 0.2)),  # 20% of current stock
                     'is_active': True
@@ -51,6 +51,14 @@ class Command(BaseCommand):
             )
             ingredients.append(ingredient)
             if created:
+                # Opening stock goes through the ledger so it gets a lot
+                apply_movement(
+                    ingredient=ingredient,
+                    movement_type='in',
+                    quantity=Decimal(str(ing_data['current_stock'])),
+                    reference='OPENING',
+                    notes='Opening stock'
+                )
                 self.stdout.write(f'Created ingredient: {ingredient.name}')
 
         # Get admin user for created_by
@@ -85,32 +93,23 @@ class Command(BaseCommand):
             else:  # in
                 quantity = Decimal(str(random.uniform(1.0, 10.0)))
             
-            # Calculate stock changes
-            previous_stock = ingredient.current_stock
-            if movement_type == 'in':
-                new_stock = previous_stock + quantity
-            else:
-                new_stock = max(Decimal('0'), previous_stock - quantity)
+            # Stock never goes below zero
+            if movement_type != 'in':
+                quantity = min(quantity, ingredient.current_stock)
+                if quantity <= 0:
+                    continue
             
-            total_value = quantity * ingredient.unit_cost
-            
-            movement = StockMovement.objects.create(
+            # The ledger updates stock, lots and alerts; apply_movement keeps `ingredient` in step
+            movement = apply_movement(
                 ingredient=ingredient,
                 movement_type=movement_type,
                 quantity=quantity,
-                previous_stock=previous_stock,
-                new_stock=new_stock,
-                unit_cost=ingredient.unit_cost,
-                total_value=total_value,
                 reference=f"Sample-{i+1:03d}",
                 notes=f"Sample {movement_type} movement",
-                created_by=admin_user,
-                created_at=movement_date
+                created_by=admin_user
             )
-            
-            # Update ingredient current stock
-            ingredient.current_stock = new_stock
-            ingredient.save()
+            # created_at is set on insert, so the sample date is applied afterwards
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=movement_date)
             
             movements_created += 1
 
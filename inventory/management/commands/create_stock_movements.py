@@ -1,9 +1,11 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from inventory.ledger import apply_movement
 from inventory.models import Ingredient, StockMovement
 from decimal import Decimal
 import random
-from datetime import datetime, timedelta
+from datetime import timedelta
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -63,7 +65,7 @@ class Command(BaseCommand):
 
         # Create sample movements
         movement_types = ['in', 'out', 'adjustment', 'waste']
-        base_date = datetime.now() - timedelta(days=days_back)
+        base_date = timezone.now() - timedelta(days=days_back)
 
         movements_created = 0
 
@@ -77,44 +79,27 @@ class Command(BaseCommand):
             # Random unit cost between 1 and 20
             unit_cost = Decimal(str(round(random.uniform(1, 20), 2)))
 
-            # Calculate previous and new stock
-            previous_stock = ingredient.current_stock
+            # Stock never goes below zero
+            if movement_type in ('out', 'waste'):
+                quantity = min(quantity, ingredient.current_stock)
+                if quantity <= 0:
+                    continue
 
-            if movement_type == 'in':
-                new_stock = previous_stock + quantity
-            elif movement_type == 'out':
-                new_stock = max(Decimal('0'), previous_stock - quantity)
-            elif movement_type == 'adjustment':
-                new_stock = quantity
-            elif movement_type == 'waste':
-                new_stock = max(Decimal('0'), previous_stock - quantity)
-
-            # Update ingredient stock
-            ingredient.current_stock = new_stock
-            ingredient.save()
-
-            # Calculate total value
-            total_value = quantity * unit_cost
-
-            # Random date within the specified days back
-            random_days = random.randint(0, days_back)
-            created_at = base_date + timedelta(days=random_days)
-
-            # Create the movement
-            movement = StockMovement.objects.create(
+            # The ledger keeps stock, lots and alerts in step with the movement
+            movement = apply_movement(
                 ingredient=ingredient,
                 movement_type=movement_type,
                 quantity=quantity,
-                previous_stock=previous_stock,
-                new_stock=new_stock,
                 unit_cost=unit_cost,
-                total_value=total_value,
                 reference=f"REF-{random.randint(1000, 9999)}",
                 notes=f"Sample {movement_type} movement",
-                created_by=user,
-                created_at=created_at
+                created_by=user
             )
 
+            # Random date within the specified days back (created_at is set on insert)
+            random_days = random.randint(0, days_back)
+            StockMovement.objects.filter(pk=movement.pk).update(created_at=base_date + timedelta(days=random_days))
+
             movements_created += 1
 
             if movements_created % 10 == 0:
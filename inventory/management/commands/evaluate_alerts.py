@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from inventory.alerts import active_alerts, evaluate_ingredients
+
+
+class Command(BaseCommand):
+    help = 'Re-evaluate low-stock and expiry alerts for every active ingredient (run nightly)'
+
+    def handle(self, *args, **options):
+        raised = evaluate_ingredients()
+        self.stdout.write(self.style.SUCCESS(
+            f'Raised {len(raised)} new alerts; {active_alerts().count()} active'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from inventory.forecasting import HISTORY_DAYS, SMOOTHING_ALPHA, forecast_demand, refresh_reorder_points
+
+
+class Command(BaseCommand):
+    help = 'Forecast ingredient usage and refresh safety stock and reorder points (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--history-days',
+            type=int,
+            default=HISTORY_DAYS,
+            help=f'Days of consumption history to fit (default: {HISTORY_DAYS})'
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=SMOOTHING_ALPHA,
+            help=f'Smoothing factor between 0 and 1 (default: {SMOOTHING_ALPHA})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the forecasts without saving them'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            forecasts = forecast_demand(options['history_days'], options['alpha'])
+        else:
+            forecasts = refresh_reorder_points(options['history_days'], options['alpha'])
+
+        for forecast in forecasts:
+            if forecast['daily_usage_forecast'] > 0:
+                self.stdout.write(
+                    f"  {forecast['name']}: {forecast['daily_usage_forecast']} {forecast['unit']}/day, "
+                    f"safety stock {forecast['safety_stock']}, reorder at {forecast['reorder_point']}"
+                )
+
+        verb = 'Forecast' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(forecasts)} ingredients'))
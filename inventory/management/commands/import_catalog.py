@@ -0,0 +1,70 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importing import CHUNK_SIZE, FORMATS, IMPORT_KINDS, import_catalog, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Import suppliers, ingredients, recipes or opening stock from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=IMPORT_KINDS, help='What the file contains')
+        parser.add_argument('path', help='CSV file with a header row, or JSON Lines file')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Rows written per transaction (default: {CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded on opening stock movements'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and report errors without saving anything'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if os.path.splitext(path)[1] in ('.jsonl', '.ndjson') else 'csv')
+
+        created_by = None
+        if options['user']:
+            created_by = get_user_model().objects.filter(username=options['user']).first()
+            if created_by is None:
+                raise CommandError(f"User not found: {options['user']}")
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as stream:
+                report = import_catalog(
+                    options['kind'],
+                    read_rows(stream, file_format),
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                    created_by=created_by
+                )
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            details = '; '.join(f'{field}: {message}' for field, message in error['errors'].items())
+            self.stdout.write(self.style.WARNING(f"  Row {error['row']}: {details}"))
+        if report['error_count'] > len(report['errors']):
+            self.stdout.write(self.style.WARNING(
+                f"  ... and {report['error_count'] - len(report['errors'])} more"
+            ))
+
+        verb = 'Validated' if report['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['imported']} of {report['rows']} {report['kind']} rows "
+            f"({report['error_count']} with errors)"
+        ))
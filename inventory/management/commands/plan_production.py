@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.planning import DEFAULT_PLAN_DAYS, production_requirements
+
+
+class Command(BaseCommand):
+    help = 'Show ingredient requirements for open orders and the resulting shortages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='First delivery date, YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=DEFAULT_PLAN_DAYS,
+            help=f'Number of days to plan (default: {DEFAULT_PLAN_DAYS})'
+        )
+
+    def handle(self, *args, **options):
+        if options['start']:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date()
+        else:
+            start_date = timezone.now().date()
+        end_date = start_date + timedelta(days=options['days'] - 1)
+
+        plan = production_requirements(start_date, end_date)
+
+        self.stdout.write(f'Production plan {start_date} to {end_date}')
+        for day in plan['days']:
+            if not day['requirements']:
+                continue
+            self.stdout.write(f"\n{day['date']}")
+            for requirement in day['requirements']:
+                self.stdout.write(
+                    f"  {requirement['name']}: {requirement['quantity']} {requirement['unit']}"
+                )
+
+        shortages = [item for item in plan['ingredients'] if item['net_shortage'] > 0]
+        if shortages:
+            self.stdout.write(self.style.WARNING('\nShortages after stock and pending purchase orders:'))
+            for item in shortages:
+                self.stdout.write(self.style.WARNING(
+                    f"  {item['name']}: short {item['net_shortage']} {item['unit']} "
+                    f"(first short on {item['first_short_date']})"
+                ))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nNo shortages for this period'))
+
+        for cake in plan['unmapped_cakes']:
+            self.stdout.write(self.style.ERROR(f"Cake '{cake['name']}' has no recipe linked"))
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cakes', '__first__'),
+        ('inventory', '0005_remove_ingredient_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cake',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recipe', to='cakes.cake'),
+        ),
+    ]
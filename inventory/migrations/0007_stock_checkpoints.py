@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_recipe_cake'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('taken_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'stock_checkpoints',
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['ingredient', 'created_at'], name='stock_movement_ingr_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockcheckpoint',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='inventory.ingredient'),
+        ),
+        migrations.AddIndex(
+            model_name='stockcheckpoint',
+            index=models.Index(fields=['ingredient', 'taken_at'], name='stock_checkpoint_ingr_time_idx'),
+        ),
+    ]
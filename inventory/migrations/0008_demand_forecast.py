@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='daily_usage_forecast',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='forecast_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='reorder_point',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='safety_stock',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='supplier',
+            name='lead_time_days',
+            field=models.PositiveIntegerField(default=7),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_demand_forecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='density',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='piece_weight',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True),
+        ),
+    ]
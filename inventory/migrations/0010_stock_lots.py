@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_opening_lots(apps, schema_editor):
+    # Existing stock becomes one lot per ingredient carrying its current expiry date
+    Ingredient = apps.get_model('inventory', 'Ingredient')
+    StockLot = apps.get_model('inventory', 'StockLot')
+    now = django.utils.timezone.now()
+    StockLot.objects.bulk_create(
+        [
+            StockLot(
+                ingredient_id=ingredient.id,
+                lot_number='OPENING',
+                quantity_received=ingredient.current_stock,
+                quantity_remaining=ingredient.current_stock,
+                unit_cost=ingredient.unit_cost,
+                expiry_date=ingredient.expiry_date,
+                received_at=now,
+            )
+            for ingredient in Ingredient.objects.filter(current_stock__gt=0).iterator()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_ingredient_conversion_overrides'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('quantity_received', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('quantity_remaining', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('received_at', models.DateTimeField()),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='inventory.ingredient')),
+                ('purchase_order_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lots', to='inventory.purchaseorderitem')),
+            ],
+            options={
+                'db_table': 'stock_lots',
+                'ordering': ['expiry_date', 'received_at'],
+                'indexes': [models.Index(fields=['expiry_date', 'ingredient'], name='stock_lot_expiry_idx'), models.Index(fields=['ingredient', 'expiry_date', 'received_at'], name='stock_lot_fefo_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_lots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def raise_initial_alerts(apps, schema_editor):
+    # Seed the active set with ingredients already at or below their minimum
+    Ingredient = apps.get_model('inventory', 'Ingredient')
+    StockAlert = apps.get_model('inventory', 'StockAlert')
+    now = django.utils.timezone.now()
+    StockAlert.objects.bulk_create(
+        [
+            StockAlert(
+                ingredient_id=row['id'],
+                alert_type='low_stock',
+                is_active=True,
+                current_stock=row['current_stock'],
+                threshold=row['minimum_stock'],
+                raised_at=now,
+            )
+            for row in Ingredient.objects.filter(
+                current_stock__lte=models.F('minimum_stock')
+            ).values('id', 'current_stock', 'minimum_stock').iterator()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_stock_lots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(choices=[('low_stock', 'Low Stock'), ('expiry', 'Expiring Soon')], max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+                ('current_stock', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('threshold', models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('raised_at', models.DateTimeField()),
+                ('cleared_at', models.DateTimeField(blank=True, null=True)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='inventory.ingredient')),
+            ],
+            options={
+                'db_table': 'stock_alerts',
+                'ordering': ['-raised_at'],
+                'indexes': [models.Index(fields=['is_active', 'alert_type'], name='stock_alert_active_idx')],
+                'unique_together': {('ingredient', 'alert_type')},
+            },
+        ),
+        migrations.RunPython(raise_initial_alerts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:19
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicates(apps, schema_editor):
+    # Names become unique import keys; keep the oldest row's name and tag the rest with their id
+    for model_name in ['Supplier', 'Ingredient', 'Recipe']:
+        model = apps.get_model('inventory', model_name)
+        duplicated = model.objects.values('name').annotate(rows=Count('id')).filter(rows__gt=1).values_list('name', flat=True)
+        for row in model.objects.filter(name__in=list(duplicated)).order_by('name', 'id'):
+            if model.objects.filter(name=row.name, id__lt=row.id).exists():
+                model.objects.filter(id=row.id).update(name=f"{row.name[:190]} (#{row.id})")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='supplier',
+            name='name',
+            field=models.CharField(max_length=200, unique=True),
+        ),
+    ]
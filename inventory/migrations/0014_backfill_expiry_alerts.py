@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.db import migrations
+import django.utils.timezone
+
+# inventory.alerts.EXPIRY_ALERT_DAYS when this migration was written
+EXPIRY_ALERT_DAYS = 7
+
+
+def raise_expiry_alerts(apps, schema_editor):
+    # 0011 seeded only low-stock alerts; expiry alerts otherwise wait for the next movement
+    Ingredient = apps.get_model('inventory', 'Ingredient')
+    StockAlert = apps.get_model('inventory', 'StockAlert')
+    now = django.utils.timezone.now()
+    StockAlert.objects.bulk_create(
+        [
+            StockAlert(
+                ingredient_id=row['id'],
+                alert_type='expiry',
+                is_active=True,
+                current_stock=row['current_stock'],
+                expiry_date=row['expiry_date'],
+                raised_at=now,
+            )
+            for row in Ingredient.objects.filter(
+                is_active=True,
+                expiry_date__lte=now.date() + timedelta(days=EXPIRY_ALERT_DAYS)
+            ).exclude(
+                alerts__alert_type='expiry'
+            ).values('id', 'current_stock', 'expiry_date').iterator()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_purchase_order_partially_received'),
+    ]
+
+    operations = [
+        migrations.RunPython(raise_expiry_alerts, migrations.RunPython.noop),
+    ]
@@ -5,13 +5,14 @@ User = get_user_model()
 
 
 class Supplier(models.Model):
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, unique=True)  # Natural key for imports
     contact_person = models.CharField(max_length=100, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     website = models.URLField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
+    lead_time_days = models.PositiveIntegerField(default=7)  # Days from order to delivery
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -32,15 +33,23 @@ class Ingredient(models.Model):
         ('boxes', 'Boxes'),
     ]
     
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, unique=True)
     description = models.TextField(blank=True, null=True)
     unit = models.CharField(max_length=10, choices=UNIT_CHOICES)
     current_stock = models.DecimalField(max_digits=10, decimal_places=3, default=0)
     minimum_stock = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    # Maintained nightly by inventory.forecasting from recent consumption
+    daily_usage_forecast = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    safety_stock = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    reorder_point = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    forecast_updated_at = models.DateTimeField(blank=True, null=True)
     unit_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Optional conversion overrides, see inventory.units
+    density = models.DecimalField(max_digits=8, decimal_places=4, blank=True, null=True)  # Grams per ml
+    piece_weight = models.DecimalField(max_digits=10, decimal_places=3, blank=True, null=True)  # Grams per piece
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True, related_name='ingredients')
     location = models.CharField(max_length=100, blank=True, null=True)
-    expiry_date = models.DateField(blank=True, null=True)
+    expiry_date = models.DateField(blank=True, null=True)  # Earliest expiry among open lots, kept by the ledger
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -82,15 +91,94 @@ class StockMovement(models.Model):
     class Meta:
         db_table = 'stock_movements'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['ingredient', 'created_at'], name='stock_movement_ingr_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.ingredient.name} - {self.movement_type} ({self.quantity})"
 
+class StockCheckpoint(models.Model):
+    """Stock level and unit cost of an ingredient at a point in time, used to replay the ledger from"""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='checkpoints')
+    stock = models.DecimalField(max_digits=10, decimal_places=3)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    taken_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'stock_checkpoints'
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['ingredient', 'taken_at'], name='stock_checkpoint_ingr_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ingredient.name} @ {self.taken_at:%Y-%m-%d %H:%M} ({self.stock})"
+
+class StockAlert(models.Model):
+    """
+    Materialized alert state per ingredient and alert type, maintained by
+    inventory.alerts. Rows with is_active=True are the active alert set.
+    """
+    LOW_STOCK = 'low_stock'
+    EXPIRY = 'expiry'
+    ALERT_TYPES = [
+        (LOW_STOCK, 'Low Stock'),
+        (EXPIRY, 'Expiring Soon'),
+    ]
+    
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='alerts')
+    alert_type = models.CharField(max_length=20, choices=ALERT_TYPES)
+    is_active = models.BooleanField(default=True)
+    current_stock = models.DecimalField(max_digits=10, decimal_places=3)  # Stock when raised
+    threshold = models.DecimalField(max_digits=10, decimal_places=3, blank=True, null=True)
+    expiry_date = models.DateField(blank=True, null=True)
+    raised_at = models.DateTimeField()
+    cleared_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'stock_alerts'
+        ordering = ['-raised_at']
+        unique_together = ['ingredient', 'alert_type']
+        indexes = [
+            models.Index(fields=['is_active', 'alert_type'], name='stock_alert_active_idx'),
+        ]
+    
+    def __str__(self):
+        state = 'active' if self.is_active else 'cleared'
+        return f"{self.ingredient.name} - {self.get_alert_type_display()} ({state})"
+
+class StockLot(models.Model):
+    """A received batch of an ingredient with its own expiry, consumed FEFO by the ledger"""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='lots')
+    purchase_order_item = models.ForeignKey(
+        'PurchaseOrderItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='lots'
+    )
+    lot_number = models.CharField(max_length=50, blank=True, null=True)
+    quantity_received = models.DecimalField(max_digits=10, decimal_places=3)
+    quantity_remaining = models.DecimalField(max_digits=10, decimal_places=3)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2)
+    expiry_date = models.DateField(blank=True, null=True)
+    received_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'stock_lots'
+        ordering = ['expiry_date', 'received_at']
+        indexes = [
+            # Expiry index: "what expires between two dates" is one range scan
+            models.Index(fields=['expiry_date', 'ingredient'], name='stock_lot_expiry_idx'),
+            models.Index(fields=['ingredient', 'expiry_date', 'received_at'], name='stock_lot_fefo_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ingredient.name} lot {self.lot_number or self.pk} ({self.quantity_remaining})"
+
 class PurchaseOrder(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
         ('sent', 'Sent to Supplier'),
         ('confirmed', 'Confirmed by Supplier'),
+        ('partially_received', 'Partially Received'),
         ('received', 'Received'),
         ('cancelled', 'Cancelled'),
     ]
@@ -152,9 +240,10 @@ class PurchaseOrderItem(models.Model):
         super().save(*args, **kwargs)
 
 class Recipe(models.Model):
-    name = models.CharField(max_length=200)
+    name = models.CharField(max_length=200, unique=True)
     description = models.TextField(blank=True, null=True)
-    servings = models.PositiveIntegerField(default=1)
+    cake = models.OneToOneField('cakes.Cake', on_delete=models.SET_NULL, null=True, blank=True, related_name='recipe')
+    servings = models.PositiveIntegerField(default=1)  # Servings in one cake made from this recipe
     instructions = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,112 @@
+"""
+Production requirements planning.
+
+Open orders (confirmed/preparing) for a delivery-date range are exploded
+through cake -> Recipe -> RecipeIngredient into ingredient demand per day:
+a (days x cakes) order matrix times a (cakes x ingredients) bill of
+materials. Demand is then netted against current stock and quantities still
+due on pending purchase orders. Three queries in total, whatever the range.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import F, Sum
+
+from orders.models import OrderItem
+from .consumption import load_bill_of_materials
+from .models import PurchaseOrderItem
+
+OPEN_ORDER_STATUSES = ['confirmed', 'preparing']
+DEFAULT_PLAN_DAYS = 7  # Days planned when no end date is given, counting the start day
+PENDING_PO_STATUSES = ['draft', 'sent', 'confirmed', 'partially_received']
+
+
+def production_requirements(start_date, end_date):
+    """Ingredient requirements per day for open orders delivered between `start_date` and `end_date`"""
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    day_index = {day: index for index, day in enumerate(days)}
+
+    ordered = list(
+        OrderItem.objects.filter(
+            order__order_status__in=OPEN_ORDER_STATUSES,
+            order__delivery_date__range=[start_date, end_date]
+        ).values('order__delivery_date', 'cake_id', 'cake__name').annotate(
+            quantity=Sum('quantity')
+        ).order_by()
+    )
+    cake_ids = sorted({row['cake_id'] for row in ordered})
+    cake_index = {cake_id: index for index, cake_id in enumerate(cake_ids)}
+
+    bill_by_cake, ingredient_rows, unit_errors = load_bill_of_materials(cake_ids)
+    ingredients = list(ingredient_rows.values())
+    ingredient_index = {ingredient['id']: index for index, ingredient in enumerate(ingredients)}
+
+    # Bill of materials matrix: quantity of each ingredient per cake, in stock units
+    bill = np.zeros((len(cake_ids), len(ingredients)))
+    for cake_id, per_cake in bill_by_cake.items():
+        for ingredient_id, quantity in per_cake.items():
+            bill[cake_index[cake_id], ingredient_index[ingredient_id]] = quantity
+
+    orders = np.zeros((len(days), len(cake_ids)))
+    unmapped = {}
+    for row in ordered:
+        orders[day_index[row['order__delivery_date']], cake_index[row['cake_id']]] += row['quantity']
+        if row['cake_id'] not in bill_by_cake:
+            unmapped[row['cake_id']] = row['cake__name']
+
+    demand = orders @ bill  # days x ingredients
+
+    on_order = np.zeros(len(ingredients))
+    for row in PurchaseOrderItem.objects.filter(
+        purchase_order__status__in=PENDING_PO_STATUSES,
+        ingredient_id__in=list(ingredient_index)
+    ).values('ingredient_id').annotate(
+        outstanding=Sum(F('quantity') - F('received_quantity'))
+    ).order_by():
+        on_order[ingredient_index[row['ingredient_id']]] = max(float(row['outstanding'] or 0), 0.0)
+
+    stock = np.array([ingredient['current_stock'] for ingredient in ingredients])
+    # Running balance after each day's production, before any PO arrives
+    balance = stock[np.newaxis, :] - np.cumsum(demand, axis=0)
+    total_demand = demand.sum(axis=0)
+    net_shortage = np.clip(total_demand - stock - on_order, 0, None)
+
+    ingredient_summary = []
+    for column, ingredient in enumerate(ingredients):
+        short_days = np.flatnonzero(balance[:, column] < 0)
+        ingredient_summary.append({
+            **ingredient,
+            'required': round(float(total_demand[column]), 3),
+            'on_order': round(float(on_order[column]), 3),
+            'projected_balance': round(float(stock[column] + on_order[column] - total_demand[column]), 3),
+            'net_shortage': round(float(net_shortage[column]), 3),
+            'first_short_date': days[short_days[0]] if short_days.size else None,
+        })
+    ingredient_summary.sort(key=lambda item: item['net_shortage'], reverse=True)
+
+    daily = []
+    for row, day in enumerate(days):
+        columns = np.flatnonzero(demand[row] > 0)
+        daily.append({
+            'date': day,
+            'requirements': [
+                {
+                    'ingredient_id': ingredients[column]['id'],
+                    'name': ingredients[column]['name'],
+                    'unit': ingredients[column]['unit'],
+                    'quantity': round(float(demand[row, column]), 3),
+                }
+                for column in columns
+            ]
+        })
+
+    return {
+        'period': {
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'days': daily,
+        'ingredients': ingredient_summary,
+        'unmapped_cakes': [{'id': cake_id, 'name': name} for cake_id, name in unmapped.items()],
+        'unit_errors': unit_errors
+    }
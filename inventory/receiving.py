@@ -0,0 +1,98 @@
+"""
+Purchase order receipts.
+
+A receipt locks the purchase order, loads all of its items in one query,
+adds the delivered quantities, posts the stock-in movements (each opening
+a stock lot) as one ledger batch and closes the PO once everything has
+arrived (marking it partially received until then), all in a single
+transaction. The query count does not depend on the number of lines.
+"""
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .ledger import apply_movements
+from .models import PurchaseOrder, PurchaseOrderItem
+
+CLOSED_PO_STATUSES = ['received', 'cancelled']
+
+
+def receive_purchase_order(purchase_order_id, received_items, received_by=None):
+    """
+    Record a delivery against a purchase order.
+
+    `received_items` is a list of {item_id, received_quantity} where the
+    quantity is what arrived in this delivery; partial deliveries add up
+    over several receipts. Entries may add `expiry_date` (YYYY-MM-DD) and
+    `lot_number` for the stock lot the delivery opens. Raises ValueError for closed orders, unknown
+    items or invalid quantities, in which case nothing is applied.
+    """
+    with transaction.atomic():
+        purchase_order = PurchaseOrder.objects.select_for_update().get(pk=purchase_order_id)
+        if purchase_order.status in CLOSED_PO_STATUSES:
+            raise ValueError(f"Purchase order is already {purchase_order.status}")
+
+        items = {item.id: item for item in purchase_order.items.all()}
+        deliveries = []
+        for entry in received_items:
+            item = items.get(entry.get('item_id'))
+            if item is None:
+                raise ValueError(f"Item {entry.get('item_id')} is not on this purchase order")
+            try:
+                quantity = Decimal(str(entry.get('received_quantity')))
+            except InvalidOperation:
+                raise ValueError(f"Invalid received quantity for item {item.id}")
+            # NaN would raise on comparison and Infinity overflow the column
+            if not quantity.is_finite() or quantity < 0:
+                raise ValueError(f"Invalid received quantity for item {item.id}")
+            expiry_date = entry.get('expiry_date')
+            if expiry_date:
+                try:
+                    expiry_date = datetime.strptime(expiry_date, '%Y-%m-%d').date()
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid expiry date for item {item.id}, use YYYY-MM-DD")
+            if quantity:
+                deliveries.append((item, quantity, expiry_date or None, entry.get('lot_number')))
+
+        changed = {}
+        for item, quantity, _, _ in deliveries:
+            item.received_quantity += quantity
+            changed[item.id] = item
+        if changed:
+            PurchaseOrderItem.objects.bulk_update(list(changed.values()), ['received_quantity'])
+
+        # Each delivered line opens its own stock lot with its expiry date
+        movements = apply_movements(
+            [
+                {
+                    'ingredient_id': item.ingredient_id,
+                    'movement_type': 'in',
+                    'quantity': quantity,
+                    'unit_cost': item.unit_cost,
+                    'reference': f"PO #{purchase_order.po_number}",
+                    'notes': 'Received from purchase order',
+                    'expiry_date': expiry_date,
+                    'lot_number': lot_number,
+                    'purchase_order_item_id': item.id,
+                }
+                for item, quantity, expiry_date, lot_number in deliveries
+            ],
+            created_by=received_by
+        )
+
+        all_received = all(item.received_quantity >= item.quantity for item in items.values())
+        if all_received:
+            purchase_order.status = 'received'
+            purchase_order.delivery_date = timezone.now().date()
+            purchase_order.save(update_fields=['status', 'delivery_date', 'updated_at'])
+        elif any(item.received_quantity > 0 for item in items.values()) and purchase_order.status != 'partially_received':
+            purchase_order.status = 'partially_received'
+            purchase_order.save(update_fields=['status', 'updated_at'])
+
+    return {
+        'purchase_order': purchase_order,
+        'movements': movements,
+        'all_received': all_received,
+    }
@@ -0,0 +1,159 @@
+"""
+Replenishment: draft purchase orders from reorder points.
+
+Every active ingredient whose stock position (current stock plus quantity
+still due on pending purchase orders) is at or below its reorder level
+(the forecast reorder point, or minimum stock if that is higher) is
+ordered from its supplier. Quantities follow one of two policies:
+
+* ``cover_days``: bring the position up to forecast usage over the lead
+  time plus N days of cover, plus safety stock.
+* ``eoq``: the economic order quantity sqrt(2 * annual demand * order cost
+  / annual holding cost per unit), falling back to cover days when there
+  is no usage or cost to work with.
+
+Either way at least the gap back up to the reorder level is ordered.
+``replenishment_plan`` only reads (two queries); ``create_draft_orders``
+writes the plan as one draft PO per supplier with all items inserted by a
+single bulk_create, in one transaction.
+"""
+import math
+from datetime import timedelta
+from decimal import Decimal, ROUND_CEILING
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Ingredient, PurchaseOrder, PurchaseOrderItem
+from .planning import PENDING_PO_STATUSES
+
+ORDER_POLICIES = ['cover_days', 'eoq']
+DEFAULT_COVER_DAYS = 14
+ORDER_COST = 25.0  # Fixed cost of placing one order
+HOLDING_COST_RATE = 0.25  # Yearly holding cost as a share of unit cost
+COUNT_UNITS = ['pcs', 'packs', 'boxes']
+
+
+def _order_quantity(item, lead_time, policy, cover_days):
+    usage = item['daily_usage_forecast']
+    position = item['current_stock'] + item['on_order']
+    gap = item['reorder_level'] - position
+
+    quantity = None
+    if policy == 'eoq' and usage > 0 and item['unit_cost'] > 0:
+        quantity = math.sqrt(2 * usage * 365 * ORDER_COST / (item['unit_cost'] * HOLDING_COST_RATE))
+    if quantity is None:
+        quantity = usage * (lead_time + cover_days) + item['safety_stock'] - position
+    quantity = max(quantity, gap)
+
+    step = Decimal('1') if item['unit'] in COUNT_UNITS else Decimal('0.001')
+    return Decimal(str(quantity)).quantize(step, rounding=ROUND_CEILING)
+
+
+def replenishment_plan(policy='cover_days', cover_days=DEFAULT_COVER_DAYS):
+    """Suggested draft orders per supplier for every ingredient at or below its reorder level"""
+    if policy not in ORDER_POLICIES:
+        raise ValueError(f"Unknown order policy: {policy}")
+
+    candidates = list(
+        Ingredient.objects.filter(is_active=True).annotate(
+            reorder_level=Greatest('reorder_point', 'minimum_stock')
+        ).values(
+            'id', 'name', 'unit', 'current_stock', 'unit_cost', 'reorder_level',
+            'daily_usage_forecast', 'safety_stock', 'supplier_id', 'supplier__name',
+            'supplier__lead_time_days', 'supplier__is_active'
+        ).order_by('name')
+    )
+    on_order = {
+        row['ingredient_id']: row['outstanding']
+        for row in PurchaseOrderItem.objects.filter(
+            purchase_order__status__in=PENDING_PO_STATUSES
+        ).values('ingredient_id').annotate(
+            outstanding=Sum(F('quantity') - F('received_quantity'))
+        ).order_by()
+    }
+
+    today = timezone.now().date()
+    suppliers = {}
+    unassigned = []
+    for row in candidates:
+        item = {
+            'ingredient_id': row['id'],
+            'name': row['name'],
+            'unit': row['unit'],
+            'current_stock': float(row['current_stock']),
+            'on_order': max(float(on_order.get(row['id']) or 0), 0.0),
+            'reorder_level': float(row['reorder_level']),
+            'daily_usage_forecast': float(row['daily_usage_forecast']),
+            'safety_stock': float(row['safety_stock']),
+            'unit_cost': float(row['unit_cost']),
+        }
+        if item['current_stock'] + item['on_order'] > item['reorder_level']:
+            continue
+        if row['supplier_id'] is None or not row['supplier__is_active']:
+            unassigned.append(item)
+            continue
+
+        lead_time = row['supplier__lead_time_days']
+        quantity = _order_quantity(item, lead_time, policy, cover_days)
+        if quantity <= 0:
+            continue
+        item['quantity'] = quantity
+        item['unit_cost'] = row['unit_cost']
+        item['total_cost'] = (quantity * row['unit_cost']).quantize(Decimal('0.01'))
+
+        supplier = suppliers.setdefault(row['supplier_id'], {
+            'supplier_id': row['supplier_id'],
+            'supplier_name': row['supplier__name'],
+            'lead_time_days': lead_time,
+            'expected_delivery': today + timedelta(days=lead_time),
+            'subtotal': Decimal('0'),
+            'items': [],
+        })
+        supplier['items'].append(item)
+        supplier['subtotal'] += item['total_cost']
+
+    return {
+        'policy': policy,
+        'cover_days': cover_days,
+        'orders': sorted(suppliers.values(), key=lambda order: order['supplier_name']),
+        'unassigned': unassigned,
+    }
+
+
+def create_draft_orders(plan, created_by=None):
+    """Create one draft PurchaseOrder per supplier in `plan`. Returns the purchase orders."""
+    today = timezone.now().date()
+    purchase_orders = []
+    items = []
+    with transaction.atomic():
+        for order in plan['orders']:
+            purchase_order = PurchaseOrder(
+                supplier_id=order['supplier_id'],
+                status='draft',
+                order_date=today,
+                expected_delivery=order['expected_delivery'],
+                subtotal=order['subtotal'],
+                tax=Decimal('0'),
+                total_amount=order['subtotal'],
+                notes=f"Generated from reorder points ({plan['policy']})",
+                created_by=created_by,
+            )
+            # save() assigns the PO number
+            purchase_order.save()
+            purchase_orders.append(purchase_order)
+            items.extend(
+                PurchaseOrderItem(
+                    purchase_order=purchase_order,
+                    ingredient_id=item['ingredient_id'],
+                    quantity=item['quantity'],
+                    unit_cost=item['unit_cost'],
+                    total_cost=item['total_cost'],
+                    received_quantity=0,
+                )
+                for item in order['items']
+            )
+        PurchaseOrderItem.objects.bulk_create(items)
+    return purchase_orders
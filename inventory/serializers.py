@@ -1,16 +1,18 @@
+from django.utils import timezone
 from rest_framework import serializers
 from .models import (
-    Supplier, Ingredient, StockMovement, 
+    Supplier, Ingredient, StockMovement, StockLot, StockAlert,
     PurchaseOrder, PurchaseOrderItem, Recipe, RecipeIngredient
 )
 from users.serializers import UserSerializer
+from .ledger import apply_movement
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = [
             'id', 'name', 'contact_person', 'email', 'phone', 'address', 
-            'website', 'notes', 'is_active', 'created_at'
+            'website', 'notes', 'lead_time_days', 'is_active', 'created_at'
         ]
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -20,21 +22,57 @@ class IngredientSerializer(serializers.ModelSerializer):
         model = Ingredient
         fields = [
             'id', 'name', 'description', 'unit', 'current_stock',
-            'minimum_stock', 'unit_cost', 'supplier', 'location', 'expiry_date',
-            'is_active', 'created_at', 'updated_at', 'total_value', 'is_low_stock'
+            'minimum_stock', 'unit_cost', 'density', 'piece_weight', 'supplier',
+            'location', 'expiry_date', 'is_active', 'created_at', 'updated_at',
+            'total_value', 'is_low_stock', 'daily_usage_forecast', 'safety_stock',
+            'reorder_point', 'forecast_updated_at'
+        ]
+        # Stock changes only through the ledger, e.g. an 'adjustment' stock movement,
+        # so lots and current_stock stay in step
+        read_only_fields = [
+            'current_stock', 'expiry_date', 'total_value', 'is_low_stock', 'daily_usage_forecast',
+            'safety_stock', 'reorder_point', 'forecast_updated_at'
         ]
-        read_only_fields = ['total_value', 'is_low_stock']
 
 class IngredientCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = [
             'name', 'description', 'unit', 'current_stock',
-            'minimum_stock', 'unit_cost', 'supplier', 'location', 'expiry_date'
+            'minimum_stock', 'unit_cost', 'density', 'piece_weight', 'supplier',
+            'location', 'expiry_date'
         ]
         extra_kwargs = {
             'supplier': {'required': False, 'allow_null': True}
         }
+    
+    def create(self, validated_data):
+        ingredient = super().create(validated_data)
+        
+        # Opening stock becomes the ingredient's first lot, expiring on the given date
+        if ingredient.current_stock > 0:
+            StockLot.objects.create(
+                ingredient=ingredient,
+                lot_number='OPENING',
+                quantity_received=ingredient.current_stock,
+                quantity_remaining=ingredient.current_stock,
+                unit_cost=ingredient.unit_cost,
+                expiry_date=ingredient.expiry_date,
+                received_at=timezone.now()
+            )
+        
+        return ingredient
+
+class StockAlertSerializer(serializers.ModelSerializer):
+    ingredient_name = serializers.CharField(source='ingredient.name', read_only=True)
+    unit = serializers.CharField(source='ingredient.unit', read_only=True)
+    
+    class Meta:
+        model = StockAlert
+        fields = [
+            'id', 'ingredient', 'ingredient_name', 'unit', 'alert_type', 'is_active',
+            'current_stock', 'threshold', 'expiry_date', 'raised_at', 'cleared_at'
+        ]
 
 class StockMovementSerializer(serializers.ModelSerializer):
     ingredient = IngredientSerializer(read_only=True)
@@ -55,36 +93,17 @@ class StockMovementCreateSerializer(serializers.ModelSerializer):
         fields = ['ingredient', 'movement_type', 'quantity', 'unit_cost', 'reference', 'notes']
     
     def create(self, validated_data):
-        ingredient = validated_data['ingredient']
-        quantity = validated_data['quantity']
-        movement_type = validated_data['movement_type']
-        
-        # Calculate stock changes
-        previous_stock = ingredient.current_stock
-        
-        if movement_type == 'in':
-            new_stock = previous_stock + quantity
-        elif movement_type == 'out':
-            new_stock = previous_stock - quantity
-        elif movement_type == 'adjustment':
-            new_stock = quantity
-        elif movement_type == 'waste':
-            new_stock = previous_stock - quantity
+        created_by = validated_data.pop('created_by', None) or self.context['request'].user
         
-        # Update ingredient stock
-        ingredient.current_stock = new_stock
-        ingredient.save()
-        
-        # Calculate total value
-        total_value = quantity * validated_data['unit_cost']
-        
-        return StockMovement.objects.create(
-            ingredient=ingredient,
-            previous_stock=previous_stock,
-            new_stock=new_stock,
-            total_value=total_value,
-            created_by=self.context['request'].user,
-            **validated_data
+        # Stock is updated atomically by the ledger (row lock, no lost updates)
+        return apply_movement(
+            ingredient=validated_data['ingredient'],
+            movement_type=validated_data['movement_type'],
+            quantity=validated_data['quantity'],
+            unit_cost=validated_data['unit_cost'],
+            reference=validated_data.get('reference'),
+            notes=validated_data.get('notes'),
+            created_by=created_by
         )
 
 class PurchaseOrderItemSerializer(serializers.ModelSerializer):
@@ -182,7 +201,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = [
-            'id', 'name', 'description', 'servings', 'instructions',
+            'id', 'name', 'description', 'cake', 'servings', 'instructions',
             'is_active', 'created_at', 'updated_at', 'ingredients'
         ]
 
@@ -191,7 +210,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Recipe
-        fields = ['name', 'description', 'servings', 'instructions', 'ingredients']
+        fields = ['name', 'description', 'cake', 'servings', 'instructions', 'ingredients']
     
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients', [])
@@ -201,3 +220,19 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             RecipeIngredient.objects.create(recipe=recipe, **ingredient_data)
         
         return recipe
+
+
+class ServingsSerializer(serializers.Serializer):
+    servings = serializers.IntegerField(min_value=1, default=1)
+
+class ExpiringSoonSerializer(IngredientSerializer):
+    """An ingredient with the stock lots expiring in the requested window"""
+    expiring_quantity = serializers.DecimalField(max_digits=10, decimal_places=3, read_only=True)
+    earliest_expiry = serializers.DateField(read_only=True)
+    expiring_lots = serializers.ListField(read_only=True)
+    
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['expiring_quantity', 'earliest_expiry', 'expiring_lots']
+
+class ExpiryWindowSerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=0, default=30)
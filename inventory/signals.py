@@ -0,0 +1,90 @@
+"""
+Model signal handlers: recipe cost invalidation, alert re-evaluation on
+threshold edits, and the default alert subscriber, which queues its email
+on the Celery worker so SMTP never holds up the request that moved stock.
+
+Only changes made through save()/delete() are seen here; code that
+changes these fields with queryset.update() must call
+``costing.invalidate_recipe_costs`` / ``alerts.evaluate_ingredients``
+itself. Stock movements go through the ledger, which evaluates alerts on
+its own.
+"""
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .alerts import evaluate_ingredients, stock_alert_raised
+from .costing import invalidate_recipe_costs
+from .models import Ingredient, Recipe, RecipeIngredient, StockAlert
+
+logger = logging.getLogger(__name__)
+
+COSTING_FIELDS = ['unit', 'unit_cost', 'density', 'piece_weight']
+ALERT_FIELDS = ['current_stock', 'minimum_stock', 'expiry_date']
+
+
+@receiver(pre_save, sender=Ingredient)
+def track_ingredient_changes(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._costing_changed = False
+        instance._alerts_changed = True
+        return
+    previous = Ingredient.objects.filter(pk=instance.pk).values(*COSTING_FIELDS, *ALERT_FIELDS).first()
+    if previous is None:
+        instance._costing_changed = False
+        instance._alerts_changed = True
+        return
+    instance._costing_changed = any(previous[field] != getattr(instance, field) for field in COSTING_FIELDS)
+    instance._alerts_changed = any(previous[field] != getattr(instance, field) for field in ALERT_FIELDS)
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_on_ingredient_change(sender, instance, created, **kwargs):
+    if getattr(instance, '_costing_changed', False):
+        invalidate_recipe_costs(ingredient_ids=[instance.pk])
+    if getattr(instance, '_alerts_changed', False):
+        evaluate_ingredients([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_on_recipe_change(sender, instance, **kwargs):
+    invalidate_recipe_costs(recipe_ids=[instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_on_recipe_line_change(sender, instance, **kwargs):
+    invalidate_recipe_costs(recipe_ids=[instance.recipe_id])
+
+
+@receiver(stock_alert_raised)
+def email_inventory_managers(sender, alerts, **kwargs):
+    """One email per evaluation listing the newly raised alerts"""
+    recipients = list(
+        get_user_model().objects.filter(
+            user_type__in=['admin', 'inventory_manager'], is_active=True
+        ).exclude(email='').values_list('email', flat=True)
+    )
+    if not recipients:
+        return
+
+    names = dict(
+        Ingredient.objects.filter(id__in=[alert.ingredient_id for alert in alerts]).values_list('id', 'name')
+    )
+    lines = []
+    for alert in alerts:
+        if alert.alert_type == StockAlert.LOW_STOCK:
+            lines.append(f"- {names.get(alert.ingredient_id)}: low stock ({alert.current_stock}, minimum {alert.threshold})")
+        else:
+            lines.append(f"- {names.get(alert.ingredient_id)}: expiring on {alert.expiry_date}")
+
+    try:
+        # Imported here so only processes that raise alerts load the Celery client
+        from .tasks import send_alert_email
+        send_alert_email.delay(f"SweetBite inventory: {len(alerts)} new alert(s)", "\n".join(lines), recipients)
+    except Exception:
+        # The alerts are stored either way; a broker outage only loses the email
+        logger.exception('Could not queue the stock alert email')
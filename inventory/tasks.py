@@ -0,0 +1,10 @@
+"""Background tasks of the inventory app (run by the Celery worker)"""
+from django.conf import settings
+from django.core.mail import send_mail
+
+from sweetbite_backend.celery import app
+
+
+@app.task(ignore_result=True)
+def send_alert_email(subject, body, recipients):
+    send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, recipients, fail_silently=True)
@@ -1,3 +1,151 @@
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .importing import import_catalog, read_rows
+from .ledger import apply_movements
+from .receiving import receive_purchase_order
+from .models import Ingredient, PurchaseOrder, PurchaseOrderItem, Recipe, RecipeIngredient, StockLot, Supplier
+from .views import IngredientViewSet, RecipeViewSet
+
+User = get_user_model()
+
+
+class RecipeAvailabilityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='manager', password='secret', user_type='inventory_manager')
+        flour = Ingredient.objects.create(
+            name='Flour', unit='g', current_stock=Decimal('1000'), minimum_stock=Decimal('0'), unit_cost=Decimal('0.01')
+        )
+        self.recipe = Recipe.objects.create(name='Sponge', servings=1, is_active=False)
+        RecipeIngredient.objects.create(recipe=self.recipe, ingredient=flour, quantity=Decimal('300'), unit='g')
+        self.factory = APIRequestFactory()
+
+    def _check(self, data):
+        request = self.factory.post(f'/api/inventory/recipes/{self.recipe.id}/check_availability/', data, format='json')
+        force_authenticate(request, user=self.user)
+        return RecipeViewSet.as_view({'post': 'check_availability'})(request, pk=self.recipe.id)
+
+    def _bulk(self, params):
+        request = self.factory.get('/api/inventory/recipes/availability/', params)
+        force_authenticate(request, user=self.user)
+        return RecipeViewSet.as_view({'get': 'availability'})(request)
+
+    def test_inactive_recipe_can_be_checked(self):
+        response = self._check({'servings': 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['available'])
+        self.assertEqual(response.data['max_servings'], 3)
+
+    def test_invalid_servings_are_rejected(self):
+        for servings in ['abc', 0, -2]:
+            self.assertEqual(self._check({'servings': servings}).status_code, 400)
+            self.assertEqual(self._bulk({'servings': servings}).status_code, 400)
+
+
+class JsonLinesImportTests(TestCase):
+    def test_malformed_line_is_reported_as_row_error(self):
+        stream = io.StringIO('{"name": "Mill Co"}\n\n{"name": "Broken"\n[1, 2]\n{"name": "Dairy Ltd"}\n')
+
+        report = import_catalog('suppliers', read_rows(stream, 'jsonl'))
+
+        self.assertEqual((report['rows'], report['imported'], report['error_count']), (4, 2, 2))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3])
+        self.assertIn('line 3', report['errors'][0]['errors']['line'])
+        self.assertIn('Line 4', report['errors'][1]['errors']['line'])
+        self.assertEqual(set(Supplier.objects.values_list('name', flat=True)), {'Mill Co', 'Dairy Ltd'})
+
+
+class IngredientStockTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='manager', password='secret', user_type='inventory_manager')
+        self.flour = Ingredient.objects.create(name='Flour', unit='g', unit_cost=Decimal('0.01'))
+        apply_movements([{
+            'ingredient_id': self.flour.id, 'movement_type': 'in', 'quantity': Decimal('500'),
+            'expiry_date': timezone.now().date() + timedelta(days=5),
+        }])
+        self.factory = APIRequestFactory()
+
+    def test_stock_cannot_be_edited_directly(self):
+        request = self.factory.patch(f'/api/inventory/ingredients/{self.flour.id}/', {'current_stock': '900'}, format='json')
+        force_authenticate(request, user=self.user)
+        response = IngredientViewSet.as_view({'patch': 'partial_update'})(request, pk=self.flour.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.current_stock, Decimal('500'))
+        self.assertEqual(StockLot.objects.get().quantity_remaining, Decimal('500'))
+
+    def _expiring(self, params):
+        request = self.factory.get('/api/inventory/ingredients/expiring_soon/', params)
+        force_authenticate(request, user=self.user)
+        return IngredientViewSet.as_view({'get': 'expiring_soon'})(request)
+
+    def test_expiring_soon_lists_ingredients_with_their_lots(self):
+        response = self._expiring({'days': 7})
+
+        self.assertEqual(response.status_code, 200)
+        [row] = response.data
+        self.assertEqual((row['id'], row['name'], row['unit']), (self.flour.id, 'Flour', 'g'))
+        self.assertEqual(Decimal(row['expiring_quantity']), Decimal('500'))
+        self.assertEqual(len(row['expiring_lots']), 1)
+        self.assertEqual(self._expiring({'days': 3}).data, [])
+
+    def test_expiring_soon_rejects_invalid_days(self):
+        for days in ['abc', -1]:
+            self.assertEqual(self._expiring({'days': days}).status_code, 400)
+
+
+class PurchaseOrderReceivingTests(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(name='Mill Co')
+        self.purchase_order = PurchaseOrder.objects.create(supplier=supplier, status='sent', order_date=timezone.now().date())
+        self.items = [
+            PurchaseOrderItem.objects.create(
+                purchase_order=self.purchase_order, ingredient=Ingredient.objects.create(name=name, unit='g'),
+                quantity=Decimal('100'), unit_cost=Decimal('0.01')
+            )
+            for name in ['Flour', 'Sugar']
+        ]
+
+    def _receive(self, *quantities):
+        return receive_purchase_order(self.purchase_order.id, [
+            {'item_id': item.id, 'received_quantity': quantity} for item, quantity in zip(self.items, quantities)
+        ])
+
+    def test_partial_receipt_marks_the_order(self):
+        self.assertEqual(self._receive('100', '40')['purchase_order'].status, 'partially_received')
+        self.assertEqual(self._receive('0', '60')['purchase_order'].status, 'received')
+
+    def test_non_finite_quantities_are_rejected(self):
+        for quantity in ['NaN', 'Infinity', '-Infinity', 'abc']:
+            with self.assertRaises(ValueError):
+                self._receive(quantity)
+        self.assertEqual(PurchaseOrder.objects.get().status, 'sent')
+
+
+class ProductionPlanTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def _plan(self, user_type, params=None):
+        request = self.factory.get('/api/inventory/recipes/production_plan/', params or {})
+        force_authenticate(request, user=User.objects.get_or_create(username=user_type, user_type=user_type)[0])
+        return RecipeViewSet.as_view({'get': 'production_plan'})(request)
+
+    def test_default_window_is_seven_days(self):
+        response = self._plan('inventory_manager')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['days']), 7)
 
-# Create your tests here.
+    def test_invalid_dates_are_rejected(self):
+        for params in [{'start_date': '2026-13-01', 'end_date': '2026-13-05'}, {'start_date': '2026-03-05', 'end_date': '2026-03-01'}]:
+            self.assertEqual(self._plan('inventory_manager', params).status_code, 400)
+        self.assertEqual(self._plan('customer', {'start_date': 'x', 'end_date': 'y'}).status_code, 403)
@@ -0,0 +1,121 @@
+"""
+Unit conversion between the units in Ingredient.UNIT_CHOICES.
+
+Mass and volume units convert within their dimension through a factor
+table computed once at import. Conversions across dimensions go through
+grams using the ingredient's own properties: ``density`` (g per ml) links
+volume and mass, ``piece_weight`` (g per piece) links pieces to mass, and
+both together link pieces to volume. Packs and boxes only convert to
+themselves.
+
+``conversion_factor`` converts one pair; ``conversion_factors`` converts
+whole arrays of recipe lines at once with NumPy and marks incompatible
+pairs with NaN.
+"""
+import math
+
+import numpy as np
+
+# unit -> (dimension, factor to the dimension's base unit)
+UNIT_DIMENSIONS = {
+    'g': ('mass', 1.0),
+    'kg': ('mass', 1000.0),
+    'ml': ('volume', 1.0),
+    'l': ('volume', 1000.0),
+    'pcs': ('pcs', 1.0),
+    'packs': ('packs', 1.0),
+    'boxes': ('boxes', 1.0),
+}
+
+UNITS = list(UNIT_DIMENSIONS)
+UNIT_INDEX = {unit: index for index, unit in enumerate(UNITS)}
+_BASE_FACTOR = np.array([UNIT_DIMENSIONS[unit][1] for unit in UNITS])
+_DIMENSION = np.array([UNIT_DIMENSIONS[unit][0] for unit in UNITS])
+
+
+def _build_factor_table():
+    # FACTOR_TABLE[from, to]: multiplier within a dimension, NaN across dimensions
+    same_dimension = _DIMENSION[:, np.newaxis] == _DIMENSION[np.newaxis, :]
+    ratios = _BASE_FACTOR[:, np.newaxis] / _BASE_FACTOR[np.newaxis, :]
+    return np.where(same_dimension, ratios, np.nan)
+
+
+FACTOR_TABLE = _build_factor_table()
+
+
+def grams_per_unit(unit, density=None, piece_weight=None):
+    """Grams in one `unit` of an ingredient, or None if its properties do not allow it"""
+    dimension, factor = UNIT_DIMENSIONS.get(unit, (None, None))
+    if dimension == 'mass':
+        return factor
+    if dimension == 'volume' and density:
+        return factor * float(density)
+    if dimension == 'pcs' and piece_weight:
+        return float(piece_weight)
+    return None
+
+
+def conversion_factor(from_unit, to_unit, density=None, piece_weight=None):
+    """Multiplier turning a quantity in `from_unit` into `to_unit`, or None if incompatible"""
+    if from_unit == to_unit:
+        return 1.0
+    if from_unit in UNIT_INDEX and to_unit in UNIT_INDEX:
+        factor = FACTOR_TABLE[UNIT_INDEX[from_unit], UNIT_INDEX[to_unit]]
+        if not math.isnan(factor):
+            return float(factor)
+    source = grams_per_unit(from_unit, density, piece_weight)
+    target = grams_per_unit(to_unit, density, piece_weight)
+    if source is None or target is None:
+        return None
+    return source / target
+
+
+def _as_float_array(values, size):
+    if values is None:
+        return np.full(size, np.nan)
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=float)
+
+
+def _grams(indices, densities, piece_weights):
+    # Grams per unit for each position; NaN where unknown or not convertible
+    known = indices >= 0
+    safe = np.where(known, indices, 0)
+    dimension = _DIMENSION[safe]
+    multiplier = np.select(
+        [dimension == 'mass', dimension == 'volume', dimension == 'pcs'],
+        [np.ones(len(indices)), densities, piece_weights],
+        default=np.nan
+    )
+    with np.errstate(invalid='ignore'):
+        grams = _BASE_FACTOR[safe] * multiplier
+    grams[~known | (grams <= 0)] = np.nan
+    return grams
+
+
+def conversion_factors(from_units, to_units, densities=None, piece_weights=None):
+    """
+    Vectorized conversion_factor over parallel sequences.
+
+    `densities` and `piece_weights` hold the per-ingredient overrides for
+    each position (None where not set). Returns a float array with NaN for
+    incompatible pairs.
+    """
+    size = len(from_units)
+    source = np.array([UNIT_INDEX.get(unit, -1) for unit in from_units], dtype=int)
+    target = np.array([UNIT_INDEX.get(unit, -1) for unit in to_units], dtype=int)
+    known = (source >= 0) & (target >= 0)
+
+    factors = np.full(size, np.nan)
+    factors[known] = FACTOR_TABLE[source[known], target[known]]
+
+    missing = np.isnan(factors)
+    if missing.any():
+        densities = _as_float_array(densities, size)
+        piece_weights = _as_float_array(piece_weights, size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bridged = _grams(source, densities, piece_weights) / _grams(target, densities, piece_weights)
+        factors = np.where(missing, bridged, factors)
+
+    # Identical unit names always convert, even ones outside the table
+    factors[np.array([a == b for a, b in zip(from_units, to_units)], dtype=bool)] = 1.0
+    return factors
@@ -1,6 +1,7 @@
 from django.shortcuts import render
 from django.db import models
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import datetime, timedelta
 
 from rest_framework import viewsets, status, permissions
@@ -11,13 +12,24 @@ from django.db.models import Q, Sum, Count, Avg
 
 from .models import (
     Supplier, Ingredient, StockMovement, 
-    PurchaseOrder, PurchaseOrderItem, Recipe, RecipeIngredient
+    PurchaseOrder, Recipe, RecipeIngredient
 )
 from .serializers import (
     SupplierSerializer, IngredientSerializer, IngredientCreateSerializer,
-    StockMovementSerializer, StockMovementCreateSerializer, PurchaseOrderSerializer,
-    PurchaseOrderCreateSerializer, RecipeSerializer, RecipeCreateSerializer
+    StockMovementSerializer, StockMovementCreateSerializer, StockAlertSerializer, PurchaseOrderSerializer,
+    PurchaseOrderCreateSerializer, RecipeSerializer, RecipeCreateSerializer, ServingsSerializer,
+    ExpiringSoonSerializer, ExpiryWindowSerializer
 )
+from sweetbite_backend.db_router import use_replica
+from .alerts import active_alerts, low_stock_ingredient_ids
+from .availability import recipe_availability
+from .costing import cached_recipe_costs
+from .planning import DEFAULT_PLAN_DAYS, PENDING_PO_STATUSES, production_requirements
+from .analytics import consumption_analysis
+from .lots import expiring_lots
+from .history import end_of_day, stock_at, stock_series
+from .receiving import receive_purchase_order
+from .replenishment import DEFAULT_COVER_DAYS, create_draft_orders, replenishment_plan
 
 class SupplierViewSet(viewsets.ModelViewSet):
     queryset = Supplier.objects.all().order_by('name')
@@ -41,7 +53,7 @@ class IngredientFilter(filters.FilterSet):
     
     def filter_low_stock(self, queryset, name, value):
         if value:
-            return queryset.filter(current_stock__lte=models.F('minimum_stock'))
+            return queryset.filter(id__in=low_stock_ingredient_ids())
         return queryset
 
 class IngredientViewSet(viewsets.ModelViewSet):
@@ -64,21 +76,35 @@ class IngredientViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
         ingredients = self.get_queryset().filter(
-            current_stock__lte=models.F('minimum_stock')
+            id__in=low_stock_ingredient_ids()
         )
         serializer = self.get_serializer(ingredients, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def alerts(self, request):
+        # Active low-stock and expiry alerts, optionally ?type=low_stock|expiry
+        if not (request.user.is_admin or request.user.is_inventory_manager):
+            return Response([])
+        alerts = active_alerts(request.query_params.get('type')).select_related('ingredient')
+        return Response(StockAlertSerializer(alerts, many=True).data)
+    
     @action(detail=False, methods=['get'])
     def expiring_soon(self, request):
-        # Ingredients expiring in the next 30 days
-        thirty_days_from_now = timezone.now().date() + timedelta(days=30)
-        ingredients = self.get_queryset().filter(
-            expiry_date__lte=thirty_days_from_now,
-            expiry_date__gte=timezone.now().date()
-        )
-        serializer = self.get_serializer(ingredients, many=True)
-        return Response(serializer.data)
+        # Ingredients with stock lots expiring in the next N days (default 30), with those lots
+        if not (request.user.is_admin or request.user.is_inventory_manager):
+            return Response([])
+        serializer = ExpiryWindowSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        
+        expiring = expiring_lots(serializer.validated_data['days'])
+        ingredients = self.get_queryset().select_related('supplier').in_bulk([entry['ingredient_id'] for entry in expiring])
+        for entry in expiring:
+            ingredient = ingredients[entry['ingredient_id']]
+            ingredient.expiring_quantity = entry['expiring_quantity']
+            ingredient.earliest_expiry = entry['earliest_expiry']
+            ingredient.expiring_lots = entry['lots']
+        return Response(ExpiringSoonSerializer([ingredients[entry['ingredient_id']] for entry in expiring], many=True).data)
     
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
@@ -86,7 +112,7 @@ class IngredientViewSet(viewsets.ModelViewSet):
         
         total_ingredients = ingredients.count()
         low_stock_count = ingredients.filter(
-            current_stock__lte=models.F('minimum_stock')
+            id__in=low_stock_ingredient_ids()
         ).count()
         total_value = ingredients.aggregate(
             total=Sum(models.F('current_stock') * models.F('unit_cost'))
@@ -107,6 +133,7 @@ class IngredientViewSet(viewsets.ModelViewSet):
         return Response(stats)
     
     @action(detail=False, methods=['get'])
+    @use_replica
     def cost_analysis_report(self, request):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
@@ -143,7 +170,7 @@ class IngredientViewSet(viewsets.ModelViewSet):
         
         # Low stock high value items
         low_stock_high_value = ingredients.filter(
-            current_stock__lte=models.F('minimum_stock')
+            id__in=low_stock_ingredient_ids()
         ).order_by('-unit_cost')[:10]
         
         # Movement costs
@@ -166,7 +193,7 @@ class IngredientViewSet(viewsets.ModelViewSet):
                 'total_movement_value': total_movement_value,
                 'total_ingredients': ingredients.count(),
                 'low_stock_count': ingredients.filter(
-                    current_stock__lte=models.F('minimum_stock')
+                    id__in=low_stock_ingredient_ids()
                 ).count()
             },
             'cost_by_supplier': cost_by_supplier,
@@ -178,120 +205,90 @@ class IngredientViewSet(viewsets.ModelViewSet):
         return Response(report)
     
     @action(detail=False, methods=['get'])
+    @use_replica
     def consumption_analysis(self, request):
         """Get ingredient consumption analysis for the visual graph"""
         period = request.query_params.get('period', 'week')  # today, week, month
-        
-        # Calculate date range based on period
-        end_date = timezone.now().date()
-        if period == 'today':
-            start_date = end_date
-        elif period == 'week':
-            start_date = end_date - timedelta(days=7)
-        elif period == 'month':
-            start_date = end_date - timedelta(days=30)
-        else:
-            start_date = end_date - timedelta(days=7)
-        
-        # Get stock movements (outbound) for consumption analysis
-        movements = StockMovement.objects.filter(
-            movement_type__in=['out', 'waste'],
-            created_at__date__range=[start_date, end_date]
-        )
-        
-        # Calculate consumption by ingredient
-        consumption_data = movements.values(
-            'ingredient__name',
-            'ingredient__unit',
-            'ingredient__current_stock'
-        ).annotate(
-            total_consumed=Sum('quantity'),
-            movement_count=Count('id')
-        ).order_by('-total_consumed')
-        
-        # Calculate total consumption for percentage calculation
-        total_consumption = sum(float(item['total_consumed']) for item in consumption_data)
-        
-        # Prepare data for frontend
-        ingredients_data = []
-        for item in consumption_data[:10]:  # Top 10 ingredients
-            percentage = (float(item['total_consumed']) / total_consumption * 100) if total_consumption > 0 else 0
-            
-            # Calculate trend (simplified - compare with previous period)
-            prev_start = start_date - (end_date - start_date)
-            prev_movements = StockMovement.objects.filter(
-                ingredient__name=item['ingredient__name'],
-                movement_type__in=['out', 'waste'],
-                created_at__date__range=[prev_start, start_date]
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            current_consumption = float(item['total_consumed'])
-            trend = 0
-            if prev_movements > 0:
-                trend = ((current_consumption - float(prev_movements)) / float(prev_movements)) * 100
-            
-            ingredients_data.append({
-                'name': item['ingredient__name'],
-                'unit': item['ingredient__unit'],
-                'current_stock': float(item['ingredient__current_stock']),
-                'consumed': current_consumption,
-                'percentage': round(percentage, 1),
-                'trend': round(trend, 1),
-                'movement_count': item['movement_count']
-            })
-        
-        # Calculate wastage analysis
-        wastage_movements = StockMovement.objects.filter(
-            movement_type='waste',
-            created_at__date__range=[start_date, end_date]
-        )
-        
-        wastage_data = wastage_movements.values('ingredient__name').annotate(
-            total_wasted=Sum('quantity')
-        ).order_by('-total_wasted')
-        
-        wastage_items = []
-        for item in wastage_data[:5]:
-            wastage_items.append({
-                'name': item['ingredient__name'],
-                'wasted': float(item['total_wasted']),
-                'percentage': round((float(item['total_wasted']) / total_consumption * 100), 1) if total_consumption > 0 else 0
-            })
-        
-        # Low usage items (ingredients with minimal consumption)
-        all_ingredients = Ingredient.objects.filter(is_active=True)
-        low_usage_items = []
-        
-        for ingredient in all_ingredients:
-            ingredient_consumption = movements.filter(
-                ingredient=ingredient
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            if float(ingredient_consumption) < (total_consumption * 0.05):  # Less than 5% of total consumption
-                low_usage_items.append({
-                    'name': ingredient.name,
-                    'consumed': float(ingredient_consumption),
-                    'percentage': round((float(ingredient_consumption) / total_consumption * 100), 1) if total_consumption > 0 else 0
-                })
-        
-        # Sort by consumption and take top 5
-        low_usage_items = sorted(low_usage_items, key=lambda x: x['consumed'])[:5]
-        
+        return Response(consumption_analysis(period))
+
+    def _ingredient_ids_param(self, request):
+        ingredient_ids = request.query_params.get('ingredient')
+        if not ingredient_ids:
+            return None
+        return [int(ingredient_id) for ingredient_id in ingredient_ids.split(',')]
+    
+    @action(detail=False, methods=['get'])
+    @use_replica
+    def stock_snapshot(self, request):
+        """Stock and inventory value at a past moment (?at=YYYY-MM-DD or ISO datetime, ?ingredient=1,2)"""
+        if not (request.user.is_admin or request.user.is_inventory_manager):
+            return Response(
+                {'error': 'Access denied. Inventory management privileges required.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        at = request.query_params.get('at')
+        try:
+            if not at:
+                moment = timezone.now()
+            elif len(at) == 10:
+                # A bare date means closing stock on that day
+                moment = end_of_day(datetime.strptime(at, '%Y-%m-%d').date())
+            else:
+                moment = parse_datetime(at)
+                if moment is None:
+                    raise ValueError(at)
+                if timezone.is_naive(moment):
+                    moment = timezone.make_aware(moment)
+            ingredient_ids = self._ingredient_ids_param(request)
+        except ValueError:
+            return Response({'error': 'Invalid at or ingredient parameter'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        states = stock_at(moment, ingredient_ids)
+        ingredients = [
+            {
+                'id': state['id'],
+                'name': state['name'],
+                'unit': state['unit'],
+                'stock': state['stock'],
+                'unit_cost': state['unit_cost'],
+                'value': state['value']
+            }
+            for state in states.values()
+        ]
         return Response({
-            'period': {
-                'type': period,
-                'start_date': start_date,
-                'end_date': end_date
-            },
-            'summary': {
-                'total_consumption': float(total_consumption),
-                'total_ingredients': len(ingredients_data),
-                'total_movements': movements.count()
-            },
-            'ingredients': ingredients_data,
-            'wastage': wastage_items,
-            'low_usage': low_usage_items
+            'at': moment,
+            'total_value': sum(item['value'] for item in ingredients),
+            'ingredients': ingredients
         })
+    
+    @action(detail=False, methods=['get'])
+    @use_replica
+    def stock_history(self, request):
+        """Daily closing stock per ingredient for charts (?start_date, ?end_date, ?ingredient=1,2)"""
+        if not (request.user.is_admin or request.user.is_inventory_manager):
+            return Response(
+                {'error': 'Access denied. Inventory management privileges required.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        try:
+            if not start_date or not end_date:
+                end_date = timezone.now().date()
+                start_date = end_date - timedelta(days=30)
+            else:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            ingredient_ids = self._ingredient_ids_param(request)
+        except ValueError:
+            return Response({'error': 'Invalid date or ingredient parameter'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if end_date < start_date:
+            return Response({'error': 'end_date must not be before start_date'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(stock_series(start_date, end_date, ingredient_ids))
 
 class StockMovementViewSet(viewsets.ModelViewSet):
     queryset = StockMovement.objects.all().order_by('-created_at')
@@ -409,50 +406,65 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         purchase_order = self.get_object()
         received_items = request.data.get('received_items', [])
         
-        for item_data in received_items:
-            item_id = item_data.get('item_id')
-            received_quantity = item_data.get('received_quantity')
-            
-            try:
-                po_item = PurchaseOrderItem.objects.get(
-                    id=item_id,
-                    purchase_order=purchase_order
-                )
-                po_item.received_quantity = received_quantity
-                po_item.save()
-                
-                # Create stock movement
-                if received_quantity > 0:
-                    StockMovement.objects.create(
-                        ingredient=po_item.ingredient,
-                        movement_type='in',
-                        quantity=received_quantity,
-                        unit_cost=po_item.unit_cost,
-                        reference=f"PO #{purchase_order.po_number}",
-                        notes=f"Received from purchase order",
-                        created_by=request.user
-                    )
-                
-            except PurchaseOrderItem.DoesNotExist:
-                continue
-        
-        # Check if all items are received
-        all_received = all(
-            item.received_quantity >= item.quantity
-            for item in purchase_order.items.all()
-        )
-        
-        if all_received:
-            purchase_order.status = 'received'
-            purchase_order.delivery_date = timezone.now().date()
-            purchase_order.save()
+        try:
+            receipt = receive_purchase_order(purchase_order.pk, received_items, received_by=request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({'message': 'Items received successfully'})
+        return Response({
+            'message': 'Items received successfully',
+            'status': receipt['purchase_order'].status,
+            'all_received': receipt['all_received'],
+            'movements': len(receipt['movements'])
+        })
+    
+    def _replenishment_plan(self, request):
+        policy = request.query_params.get('policy', request.data.get('policy', 'cover_days'))
+        cover_days = int(request.query_params.get('cover_days', request.data.get('cover_days', DEFAULT_COVER_DAYS)))
+        return replenishment_plan(policy, cover_days)
+    
+    @action(detail=False, methods=['get'])
+    def replenishment_preview(self, request):
+        """Dry run: the draft orders generate_drafts would create (?policy=cover_days|eoq, ?cover_days=14)"""
+        if not (request.user.is_admin or request.user.is_inventory_manager):
+            return Response(
+                {'error': 'Access denied. Inventory management privileges required.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            plan = self._replenishment_plan(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(plan)
+    
+    @action(detail=False, methods=['post'])
+    def generate_drafts(self, request):
+        """Create draft purchase orders, one per supplier, for everything at or below its reorder level"""
+        if not (request.user.is_admin or request.user.is_inventory_manager):
+            return Response(
+                {'error': 'Access denied. Inventory management privileges required.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            plan = self._replenishment_plan(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        purchase_orders = create_draft_orders(plan, created_by=request.user)
+        purchase_orders = PurchaseOrder.objects.filter(
+            id__in=[purchase_order.id for purchase_order in purchase_orders]
+        ).select_related('supplier', 'created_by').prefetch_related('items__ingredient__supplier')
+        return Response({
+            'purchase_orders': PurchaseOrderSerializer(purchase_orders, many=True).data,
+            'unassigned': plan['unassigned']
+        }, status=status.HTTP_201_CREATED)
     
     @action(detail=False, methods=['get'])
     def pending_orders(self, request):
         pending_orders = self.get_queryset().filter(
-            status__in=['draft', 'sent', 'confirmed']
+            status__in=PENDING_PO_STATUSES
         )
         serializer = self.get_serializer(pending_orders, many=True)
         return Response(serializer.data)
@@ -476,25 +488,71 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def check_availability(self, request, pk=None):
         recipe = self.get_object()
-        servings = request.data.get('servings', 1)
-        
-        unavailable_ingredients = []
-        
-        for recipe_ingredient in recipe.ingredients.all():
-            required_quantity = recipe_ingredient.quantity * servings
-            available_quantity = recipe_ingredient.ingredient.current_stock
-            
-            if available_quantity < required_quantity:
-                unavailable_ingredients.append({
-                    'ingredient': recipe_ingredient.ingredient.name,
-                    'required': required_quantity,
-                    'available': available_quantity,
-                    'shortage': required_quantity - available_quantity
-                })
+        serializer = ServingsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        servings = serializer.validated_data['servings']
+        
+        result = recipe_availability(servings=servings, recipe_ids=[recipe.id])[0]
         
         return Response({
             'recipe': recipe.name,
             'servings': servings,
-            'available': len(unavailable_ingredients) == 0,
-            'unavailable_ingredients': unavailable_ingredients
+            'available': result['available'],
+            'max_servings': result['max_servings'],
+            'unavailable_ingredients': result['unavailable_ingredients'],
+            'unit_errors': result['unit_errors']
+        })
+    
+    @action(detail=False, methods=['get'])
+    def production_plan(self, request):
+        """Ingredient requirements for open orders by delivery date, netted against stock and pending POs"""
+        if not (request.user.is_admin or request.user.is_inventory_manager):
+            return Response(
+                {'error': 'Access denied. Inventory management privileges required.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        
+        if not start_date or not end_date:
+            start_date = timezone.now().date()
+            end_date = start_date + timedelta(days=DEFAULT_PLAN_DAYS - 1)
+        else:
+            try:
+                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({'error': 'Invalid date, use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+            if end_date < start_date:
+                return Response({'error': 'end_date must not be before start_date'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(production_requirements(start_date, end_date))
+    
+    @action(detail=False, methods=['get'])
+    def costs(self, request):
+        """Ingredient cost per serving and per cake for every active recipe"""
+        if not (request.user.is_admin or request.user.is_inventory_manager):
+            return Response(
+                {'error': 'Access denied. Inventory management privileges required.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        costs = cached_recipe_costs(self.get_queryset().filter(is_active=True).values_list('id', flat=True))
+        return Response(sorted(costs.values(), key=lambda cost: cost['name']))
+    
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """Availability and max producible servings for every active recipe at once"""
+        serializer = ServingsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        servings = serializer.validated_data['servings']
+        
+        recipes = []
+        if request.user.is_admin or request.user.is_inventory_manager:
+            recipes = recipe_availability(servings=servings)
+        
+        return Response({
+            'servings': servings,
+            'recipes': recipes
         })
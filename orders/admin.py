@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem, OrderStatusHistory, ShippingAddress, Payment
+from .models import Order, OrderItem, OrderStatusHistory, ShippingAddress, Payment, ArchivedOrder, ArchivedDeliveryLocation
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -62,3 +62,17 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ['payment_status', 'payment_method', 'currency']
     search_fields = ['order__order_number', 'transaction_id']
     readonly_fields = ['created_at', 'updated_at']
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['order_number', 'customer', 'order_status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['order_status', 'payment_method', 'created_at']
+    search_fields = ['order_number', 'customer__username', 'customer__email']
+    readonly_fields = ['archived_at']
+    date_hierarchy = 'created_at'
+
+@admin.register(ArchivedDeliveryLocation)
+class ArchivedDeliveryLocationAdmin(admin.ModelAdmin):
+    list_display = ['order_id', 'latitude', 'longitude', 'timestamp']
+    search_fields = ['order_id']
+    date_hierarchy = 'timestamp'
@@ -2,18 +2,22 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Sum, Count, Q, F
+from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 
-from .models import Order
+from .models import Order, ArchivedOrder
+from .archive import combined_aggregate, combined_grouped
 from users.models import User
+from inventory.alerts import low_stock_ingredient_ids
 from inventory.models import Ingredient
 from feedback.models import Feedback
+from sweetbite_backend.db_router import use_replica
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
 def admin_dashboard_stats(request):
     """
     Comprehensive dashboard statistics for admin users
@@ -30,12 +34,14 @@ def admin_dashboard_stats(request):
     try:
         # Get all orders
         all_orders = Order.objects.all()
+        order_sources = [all_orders, ArchivedOrder.objects.all()]
         
-        # Calculate order statistics
-        total_orders = all_orders.count()
-        total_revenue = all_orders.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
+        # Calculate order statistics (archived orders included)
+        order_totals = combined_aggregate(
+            order_sources, count=Count('id'), total=Sum('total_amount')
+        )
+        total_orders = order_totals['count']
+        total_revenue = order_totals['total']
         
         # Pending orders (pending, confirmed, preparing)
         pending_orders = all_orders.filter(
@@ -55,12 +61,12 @@ def admin_dashboard_stats(request):
         # Inventory statistics
         total_ingredients = Ingredient.objects.count()
         low_stock_items = Ingredient.objects.filter(
-            current_stock__lte=F('minimum_stock')
+            id__in=low_stock_ingredient_ids()
         ).count()
         
         # Get low stock alerts
         low_stock_alerts = Ingredient.objects.filter(
-            current_stock__lte=F('minimum_stock')
+            id__in=low_stock_ingredient_ids()
         ).values('name', 'current_stock', 'minimum_stock', 'unit')[:10]
         
         # Recent orders (last 5)
@@ -73,15 +79,11 @@ def admin_dashboard_stats(request):
         )['avg_rating'] or 0
         
         # Order status breakdown
-        order_status_breakdown = {
-            'pending': all_orders.filter(order_status='pending').count(),
-            'confirmed': all_orders.filter(order_status='confirmed').count(),
-            'preparing': all_orders.filter(order_status='preparing').count(),
-            'ready': all_orders.filter(order_status='ready').count(),
-            'out_for_delivery': all_orders.filter(order_status='out_for_delivery').count(),
-            'delivered': all_orders.filter(order_status='delivered').count(),
-            'cancelled': all_orders.filter(order_status='cancelled').count(),
-        }
+        order_status_breakdown = dict.fromkeys(
+            ['pending', 'confirmed', 'preparing', 'ready', 'out_for_delivery', 'delivered', 'cancelled'], 0
+        )
+        for row in combined_grouped(order_sources, ['order_status'], count=Count('id')):
+            order_status_breakdown[row['order_status']] = row['count']
         
         # Weekly sales trend (last 7 days)
         weekly_sales = []
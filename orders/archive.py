@@ -0,0 +1,193 @@
+"""
+Archival tier for closed orders and delivery GPS history.
+
+Rows are moved in chunks, one transaction per chunk, so an interrupted run
+can simply be started again and continues where it stopped. Reports read
+live and archived orders through ``combined_aggregate`` and
+``combined_grouped``, which run the same query on both tables and merge the
+results.
+
+An archived order rung up at the till keeps the id of its POS sale in
+``quick_sale_id``, so code that leaves such orders out (they already count
+as their sale) can do the same on the archive.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    Order, OrderItem, OrderStatusHistory, Payment,
+    DeliveryLocationHistory, ArchivedOrder, ArchivedDeliveryLocation
+)
+
+ARCHIVABLE_STATUSES = ['delivered', 'cancelled']
+DEFAULT_RETENTION_DAYS = 365
+
+LOCATION_FIELDS = ['id', 'order_id', 'latitude', 'longitude', 'accuracy', 'speed', 'heading', 'timestamp']
+
+
+def archive_cutoff(days=DEFAULT_RETENTION_DAYS):
+    return timezone.now() - timedelta(days=days)
+
+
+def _move_locations(rows):
+    ArchivedDeliveryLocation.objects.bulk_create(
+        [
+            ArchivedDeliveryLocation(
+                original_id=row['id'],
+                order_id=row['order_id'],
+                latitude=row['latitude'],
+                longitude=row['longitude'],
+                accuracy=row['accuracy'],
+                speed=row['speed'],
+                heading=row['heading'],
+                timestamp=row['timestamp'],
+            )
+            for row in rows
+        ],
+        ignore_conflicts=True
+    )
+    DeliveryLocationHistory.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+
+def archive_location_history(before, chunk_size=5000):
+    """Move GPS points recorded before `before` into the archive table. Returns rows moved."""
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                DeliveryLocationHistory.objects.filter(
+                    timestamp__lt=before
+                ).order_by('id').values(*LOCATION_FIELDS)[:chunk_size]
+            )
+            if not rows:
+                break
+            _move_locations(rows)
+        moved += len(rows)
+    return moved
+
+
+def _group_by_order(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.pop('order_id'), []).append(row)
+    return grouped
+
+
+def _archive_order_chunk(orders):
+    order_ids = [order.id for order in orders]
+
+    items = _group_by_order(list(OrderItem.objects.filter(order_id__in=order_ids).values(
+        'order_id', 'cake_id', 'cake__name', 'quantity', 'unit_price',
+        'total_price', 'customization_notes'
+    )))
+    history = _group_by_order(list(OrderStatusHistory.objects.filter(order_id__in=order_ids).values(
+        'order_id', 'status', 'notes', 'updated_by_id', 'created_at'
+    ).order_by('created_at')))
+    payments = {
+        row.pop('order_id'): row
+        for row in Payment.objects.filter(order_id__in=order_ids).values(
+            'order_id', 'payment_method', 'payment_status', 'transaction_id',
+            'amount', 'currency', 'payment_date'
+        )
+    }
+    # Deleting the order clears QuickSale.order, so the link to a till sale is kept here
+    quick_sales = dict(
+        Order.objects.filter(id__in=order_ids, quick_sale__isnull=False).values_list('id', 'quick_sale__id')
+    )
+
+    ArchivedOrder.objects.bulk_create(
+        [
+            ArchivedOrder(
+                original_id=order.id,
+                order_number=order.order_number,
+                customer_id=order.customer_id,
+                assigned_staff_id=order.assigned_staff_id,
+                order_type=order.order_type,
+                order_status=order.order_status,
+                payment_status=order.payment_status,
+                payment_method=order.payment_method,
+                delivery_date=order.delivery_date,
+                quick_sale_id=quick_sales.get(order.id),
+                subtotal=order.subtotal,
+                tax=order.tax,
+                delivery_fee=order.delivery_fee,
+                total_amount=order.total_amount,
+                created_at=order.created_at,
+                confirmed_at=order.confirmed_at,
+                delivered_at=order.delivered_at,
+                items=items.get(order.id, []),
+                status_history=history.get(order.id, []),
+                payment=payments.get(order.id),
+            )
+            for order in orders
+        ],
+        ignore_conflicts=True
+    )
+
+    # GPS history goes with its order regardless of age
+    locations = list(
+        DeliveryLocationHistory.objects.filter(order_id__in=order_ids).values(*LOCATION_FIELDS)
+    )
+    if locations:
+        _move_locations(locations)
+
+    # Cascades to items, status history and payment
+    Order.objects.filter(id__in=order_ids).delete()
+
+
+def archive_orders(before, chunk_size=500):
+    """Move delivered/cancelled orders created before `before` into the archive. Returns orders moved."""
+    moved = 0
+    while True:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.filter(
+                    order_status__in=ARCHIVABLE_STATUSES,
+                    created_at__lt=before
+                ).order_by('id')[:chunk_size]
+            )
+            if not orders:
+                break
+            _archive_order_chunk(orders)
+        moved += len(orders)
+    return moved
+
+
+def archived_orders_for(user):
+    """ArchivedOrder queryset with the same role scoping the report views apply to Order"""
+    if user.user_type == 'admin' or user.is_superuser:
+        return ArchivedOrder.objects.all()
+    if user.user_type in ['admin', 'staff'] or user.is_staff:
+        return ArchivedOrder.objects.filter(
+            Q(assigned_staff=user) | Q(assigned_staff__isnull=True)
+        )
+    return ArchivedOrder.objects.none()
+
+
+def combined_aggregate(querysets, **aggregates):
+    """
+    Run the same additive aggregate (Sum/Count) over live and archived
+    querysets and add up the results.
+    """
+    totals = dict.fromkeys(aggregates, 0)
+    for queryset in querysets:
+        for key, value in queryset.aggregate(**aggregates).items():
+            totals[key] += value or 0
+    return totals
+
+
+def combined_grouped(querysets, group_by, **aggregates):
+    """Grouped additive aggregate over live and archived querysets, merged by group key"""
+    merged = {}
+    for queryset in querysets:
+        for row in queryset.values(*group_by).annotate(**aggregates).order_by():
+            key = tuple(row[field] for field in group_by)
+            if key not in merged:
+                merged[key] = {field: row[field] for field in group_by}
+                merged[key].update(dict.fromkeys(aggregates, 0))
+            for name in aggregates:
+                merged[key][name] += row[name] or 0
+    return list(merged.values())
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from orders.archive import (
+    archive_cutoff, archive_location_history, archive_orders, DEFAULT_RETENTION_DAYS
+)
+
+
+class Command(BaseCommand):
+    help = 'Move old delivery GPS history (and optionally closed orders) into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=DEFAULT_RETENTION_DAYS,
+            help=f'Archive rows older than this many days (default: {DEFAULT_RETENTION_DAYS})'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows moved per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--include-orders',
+            action='store_true',
+            help='Also archive delivered/cancelled orders with their items and history'
+        )
+
+    def handle(self, *args, **options):
+        before = archive_cutoff(options['days'])
+        chunk_size = options['chunk_size']
+
+        self.stdout.write(f'Archiving rows older than {before:%Y-%m-%d %H:%M}')
+
+        # Orders first so their GPS history moves with them
+        if options['include_orders']:
+            orders_moved = archive_orders(before, chunk_size=chunk_size)
+            self.stdout.write(self.style.SUCCESS(f'Archived {orders_moved} orders'))
+
+        locations_moved = archive_location_history(before, chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f'Archived {locations_moved} location history rows'))
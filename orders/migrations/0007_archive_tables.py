@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:55
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0006_auto_20250920_2105'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDeliveryLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('order_id', models.BigIntegerField(db_index=True)),
+                ('latitude', models.DecimalField(decimal_places=8, max_digits=10)),
+                ('longitude', models.DecimalField(decimal_places=8, max_digits=11)),
+                ('accuracy', models.FloatField(blank=True, null=True)),
+                ('speed', models.FloatField(blank=True, null=True)),
+                ('heading', models.FloatField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'delivery_location_history_archive',
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('order_number', models.CharField(max_length=20, unique=True)),
+                ('order_type', models.CharField(choices=[('online', 'Online Order'), ('walk_in', 'Walk-in Order')], max_length=10)),
+                ('order_status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('preparing', 'Preparing'), ('ready', 'Ready for Pickup/Delivery'), ('out_for_delivery', 'Out for Delivery'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed'), ('refunded', 'Refunded')], max_length=20)),
+                ('payment_method', models.CharField(choices=[('cash', 'Cash'), ('card', 'Card'), ('online', 'Online Payment')], max_length=10)),
+                ('delivery_date', models.DateField(blank=True, null=True)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('delivery_fee', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('confirmed_at', models.DateTimeField(blank=True, null=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('items', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('status_history', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('payment', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('assigned_staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_assigned_orders', to=settings.AUTH_USER_MODEL)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'orders_archive',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
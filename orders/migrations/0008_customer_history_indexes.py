@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['customer', 'created_at', 'id'], name='order_archive_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'created_at', 'id'], name='order_customer_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_customer_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='quick_sale_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from cakes.models import Cake
 
 User = get_user_model()
@@ -137,6 +138,9 @@ class Order(models.Model):
     class Meta:
         db_table = 'orders'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', 'created_at', 'id'], name='order_customer_time_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.order_number} - {self.customer.username}"
@@ -204,3 +208,63 @@ class DeliveryLocationHistory(models.Model):
     
     def __str__(self):
         return f"Order #{self.order.order_number} - {self.latitude}, {self.longitude}"
+
+
+class ArchivedOrder(models.Model):
+    """Closed order moved out of the hot `orders` table, with items and history inlined"""
+    original_id = models.BigIntegerField(unique=True)
+    order_number = models.CharField(max_length=20, unique=True)
+    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_orders')
+    assigned_staff = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_assigned_orders')
+    order_type = models.CharField(max_length=10, choices=Order.ORDER_TYPE)
+    order_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS)
+    payment_status = models.CharField(max_length=20, choices=Order.PAYMENT_STATUS)
+    payment_method = models.CharField(max_length=10, choices=Order.PAYMENT_METHOD)
+    delivery_date = models.DateField(blank=True, null=True)
+    # POS sale the order was rung up as (QuickSale.order is cleared when the order is archived)
+    quick_sale_id = models.BigIntegerField(blank=True, null=True)
+    
+    # Financial (same column names as Order so report aggregates work on both)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    delivery_fee = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    # Timestamps copied from the live order
+    created_at = models.DateTimeField(db_index=True)
+    confirmed_at = models.DateTimeField(blank=True, null=True)
+    delivered_at = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    # Child rows as JSON snapshots
+    items = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    status_history = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    payment = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    
+    class Meta:
+        db_table = 'orders_archive'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', 'created_at', 'id'], name='order_archive_customer_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Archived Order #{self.order_number}"
+
+class ArchivedDeliveryLocation(models.Model):
+    """GPS point moved out of `delivery_location_history`"""
+    original_id = models.BigIntegerField(unique=True)
+    order_id = models.BigIntegerField(db_index=True)  # Live or archived order's original id
+    latitude = models.DecimalField(max_digits=10, decimal_places=8)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8)
+    accuracy = models.FloatField(blank=True, null=True)
+    speed = models.FloatField(blank=True, null=True)
+    heading = models.FloatField(blank=True, null=True)
+    timestamp = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'delivery_location_history_archive'
+        ordering = ['-timestamp']
+    
+    def __str__(self):
+        return f"Archived location for order {self.order_id} - {self.latitude}, {self.longitude}"
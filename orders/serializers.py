@@ -3,6 +3,9 @@ from .models import Order, OrderItem, OrderStatusHistory, ShippingAddress, Payme
 from cakes.serializers import CakeSerializer
 from users.serializers import UserSerializer
 from cakes.models import Cake
+from inventory.consumption import deduct_for_cakes
+from django.db import transaction
+from django.db.models import Sum
 from django.utils import timezone
 
 class ShippingAddressSerializer(serializers.ModelSerializer):
@@ -218,10 +221,15 @@ class OrderStatusUpdateSerializer(serializers.ModelSerializer):
         model = OrderStatusHistory
         fields = ['status', 'notes']
     
+    @transaction.atomic
     def create(self, validated_data):
-        order = self.context['order']
+        # Locked and re-read, so of two concurrent confirmations only the first sees confirmed_at unset
+        order = Order.objects.select_for_update().get(pk=self.context['order'].pk)
         user = self.context['request'].user
         
+        # Ingredients are deducted the first time an order is confirmed
+        first_confirmation = validated_data['status'] == 'confirmed' and order.confirmed_at is None
+        
         # Update order status
         order.order_status = validated_data['status']
         if validated_data['status'] == 'confirmed':
@@ -230,6 +238,18 @@ class OrderStatusUpdateSerializer(serializers.ModelSerializer):
             order.delivered_at = timezone.now()
         order.save()
         
+        if first_confirmation:
+            cake_quantities = {
+                row['cake_id']: row['quantity']
+                for row in order.items.values('cake_id').annotate(quantity=Sum('quantity')).order_by()
+            }
+            deduct_for_cakes(
+                cake_quantities,
+                reference=f"Order #{order.order_number}",
+                notes='Deducted on order confirmation',
+                created_by=user
+            )
+        
         # Create status history
         return OrderStatusHistory.objects.create(
             order=order,
@@ -1,3 +1,42 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from cakes.models import Cake
+from inventory.models import Ingredient, Recipe, RecipeIngredient
+
+from .models import Order, OrderItem
+from .serializers import OrderStatusUpdateSerializer
+
+User = get_user_model()
+
+
+class OrderConfirmationTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='secret', user_type='staff')
+        customer = User.objects.create_user(username='customer', password='secret')
+        cake = Cake.objects.create(name='Sponge', price=Decimal('20.00'))
+        self.flour = Ingredient.objects.create(name='Flour', unit='g', current_stock=Decimal('1000'))
+        recipe = Recipe.objects.create(name='Sponge', cake=cake, servings=1)
+        RecipeIngredient.objects.create(recipe=recipe, ingredient=self.flour, quantity=Decimal('100'), unit='g')
+        self.order = Order.objects.create(customer=customer, subtotal=Decimal('40.00'), total_amount=Decimal('40.00'))
+        OrderItem.objects.create(order=self.order, cake=cake, quantity=2, unit_price=Decimal('20.00'))
+
+    def _confirm(self, order):
+        serializer = OrderStatusUpdateSerializer(
+            data={'status': 'confirmed'},
+            context={'order': order, 'request': SimpleNamespace(user=self.staff)}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def test_ingredients_are_deducted_once(self):
+        # Both requests loaded the order before either confirmed it
+        first, second = Order.objects.get(pk=self.order.pk), Order.objects.get(pk=self.order.pk)
+        self._confirm(first)
+        self._confirm(second)
+
+        self.flour.refresh_from_db()
+        self.assertEqual(self.flour.current_stock, Decimal('800'))
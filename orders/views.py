@@ -6,13 +6,18 @@ from django.db.models import Q, Sum, Count, Avg, F
 from django.utils import timezone
 from datetime import datetime, timedelta
 
-from .models import Order, OrderItem, OrderStatusHistory, ShippingAddress, Payment, DeliveryLocationHistory
+from .models import Order, OrderItem, OrderStatusHistory, ShippingAddress, Payment, DeliveryLocationHistory, ArchivedOrder
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, OrderUpdateSerializer,
     OrderStatusUpdateSerializer, OrderStatusHistorySerializer,
     ShippingAddressSerializer, PaymentSerializer
 )
 from users.models import User
+from .archive import archived_orders_for, combined_aggregate, combined_grouped
+from sweetbite_backend.db_router import use_replica
+from inventory.costing import cake_costs
+
+DEFAULT_PROFIT_MARGIN = 30  # Percent, used for cakes without a costed recipe
 
 class OrderFilter(filters.FilterSet):
     status = filters.CharFilter(field_name='order_status')
@@ -198,6 +203,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         return Response(stats)
     
     @action(detail=False, methods=['get'])
+    @use_replica
     def sales_report(self, request):
         user = request.user
         start_date = request.query_params.get('start_date')
@@ -220,26 +226,30 @@ class OrderViewSet(viewsets.ModelViewSet):
         else:
             orders = Order.objects.none()
         
-        # Filter by date range
+        # Filter by date range (archived orders are included transparently)
         orders = orders.filter(
             created_at__date__range=[start_date, end_date]
         )
+        archived_orders = archived_orders_for(user).filter(
+            created_at__date__range=[start_date, end_date]
+        )
+        sources = [orders, archived_orders]
         
         # Calculate stats
-        total_sales = orders.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        
-        total_orders = orders.count()
+        totals = combined_aggregate(sources, total=Sum('total_amount'), count=Count('id'))
+        total_sales = totals['total']
+        total_orders = totals['count']
         
         # Sales by status
-        sales_by_status = orders.values('order_status').annotate(
+        sales_by_status = combined_grouped(
+            sources, ['order_status'],
             count=Count('id'),
             total=Sum('total_amount')
         )
         
         # Sales by payment method
-        sales_by_payment = orders.values('payment_method').annotate(
+        sales_by_payment = combined_grouped(
+            sources, ['payment_method'],
             count=Count('id'),
             total=Sum('total_amount')
         )
@@ -427,11 +437,19 @@ class OrderViewSet(viewsets.ModelViewSet):
             order_count=Count('order', distinct=True)
         ).order_by('-total_quantity')[:limit]
         
-        # Calculate profit margin (assuming 30% average profit margin)
+        # Profit from recipe ingredient costs; cakes without a recipe fall back to the default margin
+        top_cakes = list(top_cakes)
+        unit_costs = cake_costs([cake_data['cake__id'] for cake_data in top_cakes])
         result = []
         for cake_data in top_cakes:
-            profit_margin = 30  # Default profit margin percentage
-            profit_amount = float(cake_data['total_revenue']) * (profit_margin / 100)
+            revenue = float(cake_data['total_revenue'])
+            unit_cost = unit_costs.get(cake_data['cake__id'])
+            if unit_cost is None:
+                profit_margin = DEFAULT_PROFIT_MARGIN
+                profit_amount = revenue * (profit_margin / 100)
+            else:
+                profit_amount = revenue - unit_cost * cake_data['total_quantity']
+                profit_margin = round(profit_amount / revenue * 100, 1) if revenue else 0
             
             result.append({
                 'id': cake_data['cake__id'],
@@ -439,7 +457,9 @@ class OrderViewSet(viewsets.ModelViewSet):
                 'sales': cake_data['total_quantity'],
                 'revenue': float(cake_data['total_revenue']),
                 'profit_margin': profit_margin,
-                'profit_amount': profit_amount,
+                'profit_amount': round(profit_amount, 2),
+                'unit_cost': unit_cost,
+                'margin_estimated': unit_cost is None,
                 'order_count': cake_data['order_count'],
                 'unit_price': float(cake_data['cake__price']),
                 'image': cake_data['cake__image']
@@ -455,6 +475,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @use_replica
     def loyalty_insights(self, request):
         """Get customer loyalty insights and analytics"""
         user = request.user
@@ -467,24 +488,31 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Get all delivered orders
-            delivered_orders = Order.objects.filter(order_status='delivered')
+            # Get all delivered orders (live and archived)
+            delivered_orders = [
+                Order.objects.filter(order_status='delivered'),
+                ArchivedOrder.objects.filter(order_status='delivered', customer__isnull=False)
+            ]
             
             # Calculate customer metrics
-            customer_stats = delivered_orders.values('customer').annotate(
-                order_count=Count('id'),
-                total_spent=Sum('total_amount'),
-                avg_order_value=Avg('total_amount')
-            ).order_by('-order_count')
+            customer_stats = sorted(
+                combined_grouped(
+                    delivered_orders, ['customer'],
+                    order_count=Count('id'),
+                    total_spent=Sum('total_amount')
+                ),
+                key=lambda item: item['order_count'],
+                reverse=True
+            )
             
             # Repeat customers (more than 5 orders)
-            repeat_customers = customer_stats.filter(order_count__gt=5)
-            repeat_customers_count = repeat_customers.count()
+            repeat_customers = [item for item in customer_stats if item['order_count'] > 5]
+            repeat_customers_count = len(repeat_customers)
             
             # Top repeat customer
             top_customer_data = None
-            if repeat_customers.exists():
-                top_customer = repeat_customers.first()
+            if repeat_customers:
+                top_customer = repeat_customers[0]
                 top_customer_user = User.objects.get(id=top_customer['customer'])
                 top_customer_data = {
                     'name': f"{top_customer_user.first_name} {top_customer_user.last_name}".strip() or top_customer_user.username,
@@ -493,14 +521,14 @@ class OrderViewSet(viewsets.ModelViewSet):
                 }
             
             # Calculate retention rate (customers who ordered more than once)
-            total_customers = customer_stats.count()
-            returning_customers = customer_stats.filter(order_count__gt=1).count()
+            total_customers = len(customer_stats)
+            returning_customers = sum(1 for item in customer_stats if item['order_count'] > 1)
             retention_rate = (returning_customers / total_customers * 100) if total_customers > 0 else 0
             
             # Average order value
-            avg_order_value = delivered_orders.aggregate(
-                avg_value=Avg('total_amount')
-            )['avg_value'] or 0
+            total_delivered = sum(item['order_count'] for item in customer_stats)
+            total_revenue = sum(item['total_spent'] for item in customer_stats)
+            avg_order_value = total_revenue / total_delivered if total_delivered > 0 else 0
             
             # Repeat purchase rate (percentage of customers who made more than one order)
             repeat_purchase_rate = (returning_customers / total_customers * 100) if total_customers > 0 else 0
@@ -511,14 +539,14 @@ class OrderViewSet(viewsets.ModelViewSet):
             avg_orders_per_customer = 0
             customer_satisfaction = 0
             
-            if repeat_customers.exists():
-                avg_lifetime_value = repeat_customers.aggregate(
-                    avg_lifetime=Avg('total_spent')
-                )['avg_lifetime'] or 0
+            if repeat_customers:
+                avg_lifetime_value = sum(
+                    item['total_spent'] for item in repeat_customers
+                ) / repeat_customers_count
                 
-                avg_orders_per_customer = repeat_customers.aggregate(
-                    avg_orders=Avg('order_count')
-                )['avg_orders'] or 0
+                avg_orders_per_customer = sum(
+                    item['order_count'] for item in repeat_customers
+                ) / repeat_customers_count
             
             # Calculate customer satisfaction from feedback (if feedback app exists)
             try:
@@ -641,6 +669,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @use_replica
     def seasonal_analysis(self, request):
         """Get seasonal sales analysis and trends"""
         user = request.user
@@ -656,49 +685,61 @@ class OrderViewSet(viewsets.ModelViewSet):
             year = int(request.query_params.get('year', timezone.now().year))
             month = int(request.query_params.get('month', timezone.now().month))
             
-            # Get orders for the specified month and year
-            month_orders = Order.objects.filter(
-                created_at__year=year,
-                created_at__month=month,
-                order_status='delivered'
-            )
+            # Get orders for the specified month and year (live and archived)
+            month_filter = {
+                'created_at__year': year,
+                'created_at__month': month,
+                'order_status': 'delivered'
+            }
+            month_orders = [
+                Order.objects.filter(**month_filter),
+                ArchivedOrder.objects.filter(**month_filter)
+            ]
             
             # Calculate monthly metrics
-            total_sales = month_orders.aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
-            
-            total_orders = month_orders.count()
+            month_totals = combined_aggregate(
+                month_orders, total=Sum('total_amount'), count=Count('id')
+            )
+            total_sales = month_totals['total']
+            total_orders = month_totals['count']
             avg_order_value = total_sales / total_orders if total_orders > 0 else 0
             
             # Calculate growth rate compared to previous month
             prev_month = month - 1 if month > 1 else 12
             prev_year = year if month > 1 else year - 1
             
-            prev_month_orders = Order.objects.filter(
-                created_at__year=prev_year,
-                created_at__month=prev_month,
-                order_status='delivered'
-            )
-            
-            prev_month_sales = prev_month_orders.aggregate(
+            prev_month_filter = {
+                'created_at__year': prev_year,
+                'created_at__month': prev_month,
+                'order_status': 'delivered'
+            }
+            prev_month_sales = combined_aggregate(
+                [
+                    Order.objects.filter(**prev_month_filter),
+                    ArchivedOrder.objects.filter(**prev_month_filter)
+                ],
                 total=Sum('total_amount')
-            )['total'] or 0
+            )['total']
             
             growth_rate = 0
             if prev_month_sales > 0:
                 growth_rate = ((float(total_sales) - float(prev_month_sales)) / float(prev_month_sales)) * 100
             
             # Get daily sales breakdown for the month
-            daily_sales = month_orders.extra(
-                select={'day': 'EXTRACT(day FROM created_at)'}
-            ).values('day').annotate(
-                daily_total=Sum('total_amount'),
-                daily_orders=Count('id')
-            ).order_by('day')
+            daily_sales_list = sorted(
+                combined_grouped(
+                    [
+                        orders.extra(select={'day': 'EXTRACT(day FROM created_at)'})
+                        for orders in month_orders
+                    ],
+                    ['day'],
+                    daily_total=Sum('total_amount'),
+                    daily_orders=Count('id')
+                ),
+                key=lambda item: item['day']
+            )
             
             # Identify key sales events (days with high sales)
-            daily_sales_list = list(daily_sales)
             if daily_sales_list:
                 avg_daily_sales = sum(item['daily_total'] for item in daily_sales_list) / len(daily_sales_list)
                 key_events = [
@@ -715,24 +756,23 @@ class OrderViewSet(viewsets.ModelViewSet):
                 key_events = []
             
             # Get yearly summary for comparison
-            yearly_orders = Order.objects.filter(
-                created_at__year=year,
-                order_status='delivered'
-            )
-            
-            yearly_sales = yearly_orders.aggregate(
-                total=Sum('total_amount')
-            )['total'] or 0
+            yearly_orders = [
+                Order.objects.filter(created_at__year=year, order_status='delivered'),
+                ArchivedOrder.objects.filter(created_at__year=year, order_status='delivered')
+            ]
             
-            yearly_orders_count = yearly_orders.count()
-            
-            # Monthly breakdown for the year
-            monthly_breakdown = yearly_orders.extra(
-                select={'month': 'EXTRACT(month FROM created_at)'}
-            ).values('month').annotate(
+            # Monthly breakdown for the year; yearly totals are summed from it
+            monthly_breakdown = combined_grouped(
+                [
+                    orders.extra(select={'month': 'EXTRACT(month FROM created_at)'})
+                    for orders in yearly_orders
+                ],
+                ['month'],
                 monthly_total=Sum('total_amount'),
                 monthly_orders=Count('id')
-            ).order_by('month')
+            )
+            yearly_sales = sum(item['monthly_total'] for item in monthly_breakdown)
+            yearly_orders_count = sum(item['monthly_orders'] for item in monthly_breakdown)
             
             monthly_data = {}
             for item in monthly_breakdown:
@@ -794,19 +834,25 @@ class OrderViewSet(viewsets.ModelViewSet):
         try:
             year = int(request.query_params.get('year', timezone.now().year))
             
-            # Get all orders for the year
-            yearly_orders = Order.objects.filter(
-                created_at__year=year,
-                order_status='delivered'
-            )
+            # Get all orders for the year (live and archived)
+            yearly_orders = [
+                Order.objects.filter(created_at__year=year, order_status='delivered'),
+                ArchivedOrder.objects.filter(created_at__year=year, order_status='delivered')
+            ]
             
             # Monthly breakdown
-            monthly_data = yearly_orders.extra(
-                select={'month': 'EXTRACT(month FROM created_at)'}
-            ).values('month').annotate(
-                monthly_total=Sum('total_amount'),
-                monthly_orders=Count('id')
-            ).order_by('month')
+            monthly_data = sorted(
+                combined_grouped(
+                    [
+                        orders.extra(select={'month': 'EXTRACT(month FROM created_at)'})
+                        for orders in yearly_orders
+                    ],
+                    ['month'],
+                    monthly_total=Sum('total_amount'),
+                    monthly_orders=Count('id')
+                ),
+                key=lambda item: item['month']
+            )
             
             # Calculate growth rates
             monthly_summary = []
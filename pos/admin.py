@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import POSSession, QuickSale, QuickSaleItem, Customer, DailySales
+from .models import POSSession, QuickSale, QuickSaleItem, Customer, DailySales, ZReport
 
 @admin.register(POSSession)
 class POSSessionAdmin(admin.ModelAdmin):
@@ -33,7 +33,7 @@ class QuickSaleAdmin(admin.ModelAdmin):
     ]
     list_filter = ['payment_method', 'created_at', 'session__cashier']
     search_fields = ['customer_name', 'customer_phone', 'session__cashier__username']
-    readonly_fields = ['subtotal', 'tax', 'total_amount', 'change_amount', 'created_at']
+    readonly_fields = ['subtotal', 'tax', 'total_amount', 'change_amount', 'client_id', 'synced_at', 'created_at']
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
     
@@ -48,7 +48,7 @@ class QuickSaleAdmin(admin.ModelAdmin):
             'fields': ('payment_method', 'order')
         }),
         ('Timestamps', {
-            'fields': ('created_at',),
+            'fields': ('created_at', 'client_id', 'synced_at'),
             'classes': ('collapse',)
         })
     )
@@ -68,12 +68,12 @@ class CustomerAdmin(admin.ModelAdmin):
     ]
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'phone', 'email']
-    readonly_fields = ['total_orders', 'total_spent', 'created_at', 'updated_at']
+    readonly_fields = ['user', 'total_orders', 'total_spent', 'created_at', 'updated_at']
     ordering = ['name']
     
     fieldsets = (
         ('Customer Information', {
-            'fields': ('name', 'phone', 'email', 'address')
+            'fields': ('name', 'phone', 'email', 'address', 'user')
         }),
         ('Statistics', {
             'fields': ('total_orders', 'total_spent'),
@@ -111,3 +111,40 @@ class DailySalesAdmin(admin.ModelAdmin):
             'fields': ('cash_sales', 'card_sales', 'mobile_sales')
         })
     )
+
+
+@admin.register(ZReport)
+class ZReportAdmin(admin.ModelAdmin):
+    list_display = [
+        'session', 'cashier', 'closed_at', 'total_transactions', 'net_sales',
+        'expected_cash', 'counted_cash', 'cash_variance'
+    ]
+    list_filter = ['closed_at', 'cashier']
+    search_fields = ['cashier__username']
+    date_hierarchy = 'closed_at'
+    ordering = ['-closed_at']
+    
+    fieldsets = (
+        ('Shift', {
+            'fields': ('session', 'cashier', 'opened_at', 'closed_at')
+        }),
+        ('Sales Summary', {
+            'fields': ('total_transactions', 'gross_sales', 'total_discounts', 'net_sales')
+        }),
+        ('Cash Drawer', {
+            'fields': ('opening_cash', 'cash_sales', 'expected_cash', 'counted_cash', 'cash_variance')
+        }),
+        ('Breakdown', {
+            'fields': ('payments', 'items')
+        })
+    )
+    
+    # Reports are written once on session close and never edited
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
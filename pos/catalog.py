@@ -0,0 +1,120 @@
+"""
+Versioned catalog snapshot for POS terminals and the storefront.
+
+The catalog (cakes with prices, categories and live offers) is served as
+one compact document stamped with a version. Every change to a cake,
+category or offer that a client can see appends a CatalogChange row after
+its transaction commits (see ``pos.signals``). The newest row id is the
+catalog version, so versions only ever increase.
+
+A client that already holds version N asks for ``since=N`` and gets only
+the rows changed after N, plus the ids of rows it should drop. New
+clients, clients too far behind (more than MAX_DELTA_CHANGES changes) and
+clients ahead of the server get the full snapshot. The full snapshot is
+built once per version and kept in the Django cache, so it is rebuilt
+only when something in the catalog actually changed.
+
+Offers are included while their status is active and they have not
+ended, with their validity window; an offer that ends simply because time
+passes is not a change, so clients check start_date/end_date themselves.
+"""
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from cakes.models import Cake, Category
+from offers.models import Offer
+
+from .models import CatalogChange
+
+SNAPSHOT_KEY = 'pos:catalog-snapshot:{version}'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+MAX_DELTA_CHANGES = 500
+
+CAKE_FIELDS = ['id', 'name', 'description', 'price', 'category_id', 'is_available', 'image']
+CATEGORY_FIELDS = ['id', 'name']
+OFFER_FIELDS = [
+    'id', 'title', 'description', 'offer_type', 'status', 'discount_percentage', 'discount_amount',
+    'minimum_order_amount', 'start_date', 'end_date', 'banner_image', 'background_color',
+    'text_color', 'is_homepage_featured', 'is_popup', 'target_user_types', 'max_usage',
+]
+
+MODELS = {
+    CatalogChange.CAKE: (Cake, CAKE_FIELDS),
+    CatalogChange.CATEGORY: (Category, CATEGORY_FIELDS),
+    CatalogChange.OFFER: (Offer, OFFER_FIELDS),
+}
+SECTIONS = {
+    CatalogChange.CAKE: 'cakes',
+    CatalogChange.CATEGORY: 'categories',
+    CatalogChange.OFFER: 'offers',
+}
+
+
+def record_change(kind, object_id):
+    """Log a catalog change; called once the changing transaction has committed"""
+    CatalogChange.objects.create(kind=kind, object_id=object_id)
+
+
+def catalog_version():
+    return CatalogChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def _rows(kind, ids=None):
+    model, fields = MODELS[kind]
+    queryset = model.objects.all()
+    if kind == CatalogChange.OFFER:
+        queryset = queryset.filter(status='active', end_date__gte=timezone.now())
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    return list(queryset.order_by('id').values(*fields))
+
+
+def _document(version, full, rows, removed=None):
+    return {
+        'version': version,
+        'full': full,
+        **{SECTIONS[kind]: rows.get(kind, []) for kind in MODELS},
+        'removed': {SECTIONS[kind]: sorted((removed or {}).get(kind, [])) for kind in MODELS},
+    }
+
+
+def full_snapshot(version=None):
+    """The whole catalog at `version` (the current one by default), built once per version"""
+    if version is None:
+        version = catalog_version()
+    key = SNAPSHOT_KEY.format(version=version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = _document(version, True, {kind: _rows(kind) for kind in MODELS})
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def catalog_since(since=None):
+    """
+    The catalog for a client holding version `since`: only what changed
+    after it, or the full snapshot when that is cheaper or required.
+    """
+    version = catalog_version()
+    if since is None or since > version:
+        return full_snapshot(version)
+    if since == version:
+        return _document(version, False, {})
+
+    changes = list(
+        CatalogChange.objects.filter(id__gt=since, id__lte=version).values_list('kind', 'object_id')[:MAX_DELTA_CHANGES + 1]
+    )
+    if len(changes) > MAX_DELTA_CHANGES:
+        return full_snapshot(version)
+
+    changed = {}
+    for kind, object_id in changes:
+        changed.setdefault(kind, set()).add(object_id)
+    rows = {}
+    removed = {}
+    for kind, ids in changed.items():
+        rows[kind] = _rows(kind, ids)
+        # Deleted rows and offers no longer live are dropped by the client
+        removed[kind] = ids - {row['id'] for row in rows[kind]}
+    return _document(version, False, rows, removed)
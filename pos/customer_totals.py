@@ -0,0 +1,112 @@
+"""
+Customer.total_orders and total_spent counters.
+
+A customer's totals cover their till sales (QuickSale rows with the
+customer's phone) and the completed orders of their linked account (see
+``pos.identity``): delivered and not refunded, live or archived. Orders
+rung up at the till are left out, since they already count as their sale.
+
+Counters move by F-expression increments in the same transaction as the
+change behind them. Sales add to them as they are recorded. An order adds
+to them when it completes and takes back what it added when it is
+cancelled or refunded (see ``pos.signals``). Taking back never goes below
+zero, as a counter may not include an order that completed before the
+counters were tracked (migration 0008 rebuilds them). ``recompute`` rebuilds the
+counters of any set of customers with one UPDATE of correlated
+subqueries; ``reconcile_customer_totals`` runs it over every customer in
+chunks, and relinking a customer recomputes it.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from orders.models import ArchivedOrder, Order
+
+from .models import Customer, QuickSale
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+COUNTED_ORDERS = Q(order_status='delivered') & ~Q(payment_status='refunded')
+
+# Order fields that decide whether and how much an order counts
+ORDER_FIELDS = ['customer_id', 'order_status', 'payment_status', 'total_amount']
+
+
+def order_counts(order_status, payment_status):
+    return order_status == 'delivered' and payment_status != 'refunded'
+
+
+def _moved(field, delta):
+    """`field` + `delta`, floored at zero"""
+    if delta < 0:
+        # Raised to -delta before adding, so an UNSIGNED column never sees a negative intermediate
+        return Greatest(F(field), Value(-delta)) + Value(delta)
+    return F(field) + Value(delta)
+
+
+def _increment(customers, deltas, key):
+    """Add {key value: (orders, amount)} to the customers matched on `key`, in one UPDATE"""
+    deltas = {value: delta for value, delta in deltas.items() if value is not None and any(delta)}
+    if not deltas:
+        return
+    customers.filter(**{f'{key}__in': list(deltas)}).update(
+        total_orders=Case(
+            *[When(**{key: value}, then=_moved('total_orders', orders)) for value, (orders, _) in deltas.items()],
+            default=F('total_orders'), output_field=IntegerField()
+        ),
+        total_spent=Case(
+            *[When(**{key: value}, then=_moved('total_spent', amount)) for value, (_, amount) in deltas.items()],
+            default=F('total_spent'), output_field=MONEY
+        )
+    )
+
+
+def record_customer_sales(sales):
+    """Count QuickSale-like objects (customer_phone, total_amount) towards their customers"""
+    deltas = defaultdict(lambda: (0, Decimal('0')))
+    for sale in sales:
+        orders, amount = deltas[sale.customer_phone]
+        deltas[sale.customer_phone] = (orders + 1, amount + Decimal(sale.total_amount))
+    _increment(Customer.objects.all(), deltas, 'phone')
+
+
+def record_order_change(previous, order):
+    """
+    Move the counters of the customers linked to an order's account after
+    the order was saved. `previous` holds the ORDER_FIELDS values before
+    the save, or None for a new order.
+    """
+    deltas = defaultdict(lambda: (0, Decimal('0')))
+    if previous and order_counts(previous['order_status'], previous['payment_status']):
+        orders, amount = deltas[previous['customer_id']]
+        deltas[previous['customer_id']] = (orders - 1, amount - Decimal(previous['total_amount']))
+    if order_counts(order.order_status, order.payment_status):
+        orders, amount = deltas[order.customer_id]
+        deltas[order.customer_id] = (orders + 1, amount + Decimal(order.total_amount))
+
+    if not any(any(delta) for delta in deltas.values()):
+        return
+    if QuickSale.objects.filter(order_id=order.pk).exists():
+        return
+    _increment(Customer.objects.all(), deltas, 'user_id')
+
+
+def _subtotals(queryset, owner, outer):
+    rows = queryset.filter(**{owner: OuterRef(outer)}).order_by().values(owner)
+    count = Subquery(rows.annotate(orders=Count('id')).values('orders'), output_field=IntegerField())
+    spent = Subquery(rows.annotate(spent=Sum('total_amount')).values('spent'), output_field=MONEY)
+    return Coalesce(count, 0), Coalesce(spent, Value(Decimal('0')), output_field=MONEY)
+
+
+def recompute(customers):
+    """Rebuild the counters of a Customer queryset from sales and orders in one UPDATE"""
+    sources = [
+        _subtotals(QuickSale.objects.all(), 'customer_phone', 'phone'),
+        _subtotals(Order.objects.filter(COUNTED_ORDERS, quick_sale__isnull=True), 'customer_id', 'user_id'),
+        _subtotals(ArchivedOrder.objects.filter(COUNTED_ORDERS, quick_sale_id__isnull=True), 'customer_id', 'user_id'),
+    ]
+    return customers.update(
+        total_orders=sum((count for count, _ in sources[1:]), sources[0][0]),
+        total_spent=sum((spent for _, spent in sources[1:]), sources[0][1]),
+    )
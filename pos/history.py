@@ -0,0 +1,133 @@
+"""
+Unified purchase history of a POS customer.
+
+A customer's purchases live in three tables: till sales (QuickSale, by
+phone number), online orders of the linked account (Order, see
+``pos.identity``) and orders moved to the archive (ArchivedOrder). The
+feed merges them newest first with keyset pagination: the cursor is the
+(created_at, source, id) of the last entry returned, and each source is
+read with a range condition on its (owner, created_at, id) index for at
+most limit + 1 rows. A page costs one short index range read per source
+however many visits the customer has had, where an offset would re-read
+every earlier page.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from orders.models import ArchivedOrder, Order
+
+from .models import QuickSale
+
+HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+
+POS_SALE = 'pos_sale'
+ORDER = 'order'
+ARCHIVED_ORDER = 'archived_order'
+
+# Tie-break between sources for entries with the same created_at
+SOURCE_RANK = {ARCHIVED_ORDER: 0, ORDER: 1, POS_SALE: 2}
+
+
+def encode_cursor(entry):
+    position = [entry['created_at'].isoformat(), entry['source'], entry['id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(created_at, source rank, id) of a cursor; ValueError if malformed"""
+    try:
+        created_at, source, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = parse_datetime(created_at)
+        rank = SOURCE_RANK[source]
+        entry_id = int(entry_id)
+    except (TypeError, KeyError, ValueError):
+        raise ValueError('Invalid cursor')
+    if created_at is None:
+        raise ValueError('Invalid cursor')
+    return created_at, rank, entry_id
+
+
+def _after(position, source):
+    """Condition for rows of `source` that come after `position` in the feed"""
+    created_at, rank, entry_id = position
+    if SOURCE_RANK[source] > rank:
+        return Q(created_at__lt=created_at)
+    if SOURCE_RANK[source] < rank:
+        return Q(created_at__lte=created_at)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=entry_id)
+
+
+def _page(queryset, source, position, limit):
+    if position is not None:
+        queryset = queryset.filter(_after(position, source))
+    return queryset.order_by('-created_at', '-id')[:limit + 1]
+
+
+def _sales(customer, position, limit):
+    rows = _page(QuickSale.objects.filter(customer_phone=customer.phone), POS_SALE, position, limit)
+    return [
+        {
+            'source': POS_SALE,
+            'id': row['id'],
+            'reference': None,
+            'created_at': row['created_at'],
+            'total_amount': row['total_amount'],
+            'payment_method': row['payment_method'],
+            'status': 'completed',
+        }
+        for row in rows.values('id', 'created_at', 'total_amount', 'payment_method')
+    ]
+
+
+def _orders(model, source, user_id, position, limit):
+    queryset = model.objects.filter(customer_id=user_id)
+    # Orders rung up at the till already appear as their POS sale
+    if model is Order:
+        queryset = queryset.filter(quick_sale__isnull=True)
+    else:
+        queryset = queryset.filter(quick_sale_id__isnull=True)
+    rows = _page(queryset, source, position, limit)
+    return [
+        {
+            'source': source,
+            'id': row['id'],
+            'reference': row['order_number'],
+            'created_at': row['created_at'],
+            'total_amount': row['total_amount'],
+            'payment_method': row['payment_method'],
+            'status': row['order_status'],
+        }
+        for row in rows.values('id', 'order_number', 'created_at', 'total_amount', 'payment_method', 'order_status')
+    ]
+
+
+def purchase_history(customer, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of `customer`'s purchases, newest first.
+
+    Returns {results, next_cursor}; next_cursor is None on the last page.
+    Raises ValueError for a malformed cursor or limit.
+    """
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid limit')
+    if not 1 <= limit <= MAX_HISTORY_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}')
+    position = decode_cursor(cursor) if cursor else None
+
+    entries = _sales(customer, position, limit)
+    if customer.user_id:
+        entries += _orders(Order, ORDER, customer.user_id, position, limit)
+        entries += _orders(ArchivedOrder, ARCHIVED_ORDER, customer.user_id, position, limit)
+
+    entries.sort(key=lambda entry: (entry['created_at'], SOURCE_RANK[entry['source']], entry['id']), reverse=True)
+    page = entries[:limit]
+    return {
+        'results': page,
+        'next_cursor': encode_cursor(page[-1]) if len(entries) > limit else None,
+    }
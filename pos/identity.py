@@ -0,0 +1,139 @@
+"""
+Phone/email identity index linking POS customers to online accounts.
+
+Walk-in customers (pos.Customer) and registered users (users.User) are
+matched on a normalized phone number - the last PHONE_MATCH_DIGITS digits,
+so "+94 77 123 4567" and "077-123-4567" agree - or a lower-cased email.
+The identities of both sides are stored in IdentityKey with an index on
+(kind, value), so linking a customer or a user is one indexed lookup
+instead of a scan of the other table stripping formatting on the fly.
+
+A customer is linked to the user with the same phone or, failing that,
+the same email. An identity shared by several users is ambiguous and
+never used. Customer.user is recomputed whenever a customer's or a user's
+phone or email changes (see ``pos.signals``).
+"""
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from .customer_totals import recompute
+from .models import Customer, IdentityKey
+
+PHONE_MATCH_DIGITS = 9
+MIN_PHONE_DIGITS = 7
+
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) < MIN_PHONE_DIGITS:
+        return None
+    return digits[-PHONE_MATCH_DIGITS:]
+
+
+def normalize_email(email):
+    return (email or '').strip().lower() or None
+
+
+def identity_keys(phone, email):
+    """[(kind, value)] of a phone/email pair, phone first"""
+    keys = []
+    phone = normalize_phone(phone)
+    if phone:
+        keys.append((IdentityKey.PHONE, phone))
+    email = normalize_email(email)
+    if email:
+        keys.append((IdentityKey.EMAIL, email))
+    return keys
+
+
+def match_user(keys, users_by_key):
+    """The user id the first unambiguous key points to, or None"""
+    for key in keys:
+        user_ids = users_by_key.get(key, ())
+        if len(user_ids) == 1:
+            return next(iter(user_ids))
+    return None
+
+
+def _matching(keys):
+    condition = Q()
+    for kind in (IdentityKey.PHONE, IdentityKey.EMAIL):
+        values = {value for key_kind, value in keys if key_kind == kind}
+        if values:
+            condition |= Q(kind=kind, value__in=values)
+    return IdentityKey.objects.filter(condition)
+
+
+def link_customers(customers):
+    """
+    Set Customer.user for `customers` (with id, phone, email and user
+    loaded) from the identity index, recomputing the totals of relinked
+    customers. Returns the number of links changed.
+    """
+    customers = list(customers)
+    keys = {customer.id: identity_keys(customer.phone, customer.email) for customer in customers}
+    wanted = {key for customer_keys in keys.values() for key in customer_keys}
+
+    users_by_key = defaultdict(set)
+    if wanted:
+        for kind, value, user_id in _matching(wanted).filter(user__isnull=False).values_list('kind', 'value', 'user_id'):
+            users_by_key[(kind, value)].add(user_id)
+
+    changed = []
+    for customer in customers:
+        user_id = match_user(keys[customer.id], users_by_key)
+        if customer.user_id != user_id:
+            customer.user_id = user_id
+            changed.append(customer)
+    if changed:
+        Customer.objects.bulk_update(changed, ['user'], batch_size=1000)
+        recompute(Customer.objects.filter(id__in=[customer.id for customer in changed]))
+    return len(changed)
+
+
+def index_customer_identities(customers):
+    """Replace the identity keys of `customers` and relink them"""
+    customers = list(customers)
+    with transaction.atomic():
+        IdentityKey.objects.filter(customer_id__in=[customer.id for customer in customers]).delete()
+        IdentityKey.objects.bulk_create(
+            [
+                IdentityKey(customer_id=customer.id, kind=kind, value=value)
+                for customer in customers
+                for kind, value in identity_keys(customer.phone, customer.email)
+            ],
+            batch_size=1000
+        )
+        return link_customers(customers)
+
+
+def index_user_identities(users, relink=True):
+    """
+    Replace the identity keys of `users`. With `relink`, customers that
+    were linked to them or share one of their new identities are relinked.
+    """
+    users = list(users)
+    user_ids = [user.id for user in users]
+    keys = set()
+    with transaction.atomic():
+        IdentityKey.objects.filter(user_id__in=user_ids).delete()
+        rows = []
+        for user in users:
+            for kind, value in identity_keys(user.phone_number, user.email):
+                keys.add((kind, value))
+                rows.append(IdentityKey(user_id=user.id, kind=kind, value=value))
+        IdentityKey.objects.bulk_create(rows, batch_size=1000)
+
+        if not relink:
+            return 0
+        customer_ids = set(Customer.objects.filter(user_id__in=user_ids).values_list('id', flat=True))
+        if keys:
+            customer_ids.update(
+                _matching(keys).filter(customer__isnull=False).values_list('customer_id', flat=True)
+            )
+        if not customer_ids:
+            return 0
+        return link_customers(Customer.objects.filter(id__in=customer_ids).only('id', 'phone', 'email', 'user'))
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pos.rollup import BACKFILL_CHUNK_DAYS, backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DailySales rollups from quick sales, one chunk of days per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='First day to rebuild, YYYY-MM-DD (default: day of the first sale). Use to resume.'
+        )
+        parser.add_argument(
+            '--end',
+            help='Last day to rebuild, YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=BACKFILL_CHUNK_DAYS,
+            help=f'Days rebuilt per transaction (default: {BACKFILL_CHUNK_DAYS})'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+
+        total_days = 0
+        # Chunks commit one by one; after an interruption, resume with --start after the last line printed
+        for chunk_end, days in backfill(start_date, end_date, options['chunk_days']):
+            total_days += days
+            self.stdout.write(f'  Rebuilt through {chunk_end} ({days} days written)')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total_days} days of sales'))
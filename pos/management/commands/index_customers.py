@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from pos.identity import index_customer_identities, index_user_identities
+from pos.models import Customer
+from pos.search import index_customers
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the customer search and identity indexes (after bulk changes that bypass save())'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Customers reindexed per transaction (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        # User identities first so customers link against a complete index
+        last_id = 0
+        users = 0
+        while True:
+            chunk = list(
+                User.objects.filter(id__gt=last_id).order_by('id').only('id', 'phone_number', 'email')[:chunk_size]
+            )
+            if not chunk:
+                break
+            index_user_identities(chunk, relink=False)
+            last_id = chunk[-1].id
+            users += len(chunk)
+
+        last_id = 0
+        total = 0
+        linked = 0
+        while True:
+            customers = list(
+                Customer.objects.filter(id__gt=last_id).order_by('id').only(
+                    'id', 'name', 'phone', 'email', 'user'
+                )[:chunk_size]
+            )
+            if not customers:
+                break
+            index_customers(customers)
+            linked += index_customer_identities(customers)
+            last_id = customers[-1].id
+            total += len(customers)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {total} customers and {users} users ({linked} customer links changed)'
+        ))
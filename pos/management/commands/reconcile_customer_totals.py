@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from pos.customer_totals import recompute
+from pos.models import Customer
+
+
+class Command(BaseCommand):
+    help = 'Recompute customer order counts and spend from sales and orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Customers recomputed per UPDATE (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(
+                Customer.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            # Each chunk commits on its own, so a long run holds no lock for long
+            recompute(Customer.objects.filter(id__gte=ids[0], id__lte=ids[-1]))
+            last_id = ids[-1]
+            total += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled totals of {total} customers'))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quicksale',
+            name='client_id',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='quicksale',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='quicksale',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
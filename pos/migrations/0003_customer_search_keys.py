@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_existing_customers(apps, schema_editor):
+    from pos.search import customer_keys
+
+    Customer = apps.get_model('pos', 'Customer')
+    CustomerSearchKey = apps.get_model('pos', 'CustomerSearchKey')
+    batch = []
+    for customer in Customer.objects.values('id', 'name', 'phone').iterator(chunk_size=2000):
+        batch.extend(
+            CustomerSearchKey(customer_id=customer['id'], key=key)
+            for key in customer_keys(customer['name'], customer['phone'])
+        )
+        if len(batch) >= 5000:
+            CustomerSearchKey.objects.bulk_create(batch)
+            batch = []
+    CustomerSearchKey.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0002_offline_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSearchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=20)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_keys', to='pos.customer')),
+            ],
+            options={
+                'db_table': 'pos_customer_search_keys',
+                'indexes': [models.Index(fields=['key', 'customer'], name='pos_customer_search_key_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_customers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_existing_identities(apps, schema_editor):
+    from collections import defaultdict
+
+    from pos.identity import identity_keys, match_user
+
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Customer = apps.get_model('pos', 'Customer')
+    IdentityKey = apps.get_model('pos', 'IdentityKey')
+
+    users_by_key = defaultdict(set)
+    batch = []
+    for user in User.objects.values('id', 'phone_number', 'email').iterator(chunk_size=2000):
+        for kind, value in identity_keys(user['phone_number'], user['email']):
+            users_by_key[(kind, value)].add(user['id'])
+            batch.append(IdentityKey(user_id=user['id'], kind=kind, value=value))
+        if len(batch) >= 5000:
+            IdentityKey.objects.bulk_create(batch)
+            batch = []
+
+    links = []
+    for customer in Customer.objects.values('id', 'phone', 'email').iterator(chunk_size=2000):
+        keys = identity_keys(customer['phone'], customer['email'])
+        batch.extend(IdentityKey(customer_id=customer['id'], kind=kind, value=value) for kind, value in keys)
+        user_id = match_user(keys, users_by_key)
+        if user_id:
+            links.append(Customer(id=customer['id'], user_id=user_id))
+        if len(batch) >= 5000:
+            IdentityKey.objects.bulk_create(batch)
+            batch = []
+    IdentityKey.objects.bulk_create(batch)
+    Customer.objects.bulk_update(links, ['user'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pos', '0003_customer_search_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentityKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('phone', 'Phone'), ('email', 'Email')], max_length=5)),
+                ('value', models.CharField(max_length=254)),
+            ],
+            options={
+                'db_table': 'pos_identity_keys',
+            },
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pos_customers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='quicksale',
+            index=models.Index(fields=['customer_phone', 'created_at', 'id'], name='quick_sale_phone_time_idx'),
+        ),
+        migrations.AddField(
+            model_name='identitykey',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='identity_keys', to='pos.customer'),
+        ),
+        migrations.AddField(
+            model_name='identitykey',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pos_identity_keys', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='identitykey',
+            index=models.Index(fields=['kind', 'value'], name='pos_identity_key_idx'),
+        ),
+        migrations.RunPython(index_existing_identities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0004_customer_identity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['total_spent'], name='pos_customer_spent_idx'),
+        ),
+    ]
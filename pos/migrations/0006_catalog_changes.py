@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0005_customer_spent_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('cake', 'Cake'), ('category', 'Category'), ('offer', 'Offer')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'pos_catalog_changes',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:45
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pos', '0006_catalog_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('opened_at', models.DateTimeField()),
+                ('closed_at', models.DateTimeField()),
+                ('total_transactions', models.PositiveIntegerField(default=0)),
+                ('gross_sales', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total_discounts', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('net_sales', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('opening_cash', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('cash_sales', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('expected_cash', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('counted_cash', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('cash_variance', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('payments', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('items', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cashier', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='z_reports', to=settings.AUTH_USER_MODEL)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='z_report', to='pos.possession')),
+            ],
+            options={
+                'db_table': 'pos_z_reports',
+                'ordering': ['-closed_at'],
+            },
+        ),
+    ]
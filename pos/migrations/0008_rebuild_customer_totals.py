@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+COUNTED_ORDERS = Q(order_status='delivered') & ~Q(payment_status='refunded')
+
+
+def _subtotals(queryset, owner, outer):
+    rows = queryset.filter(**{owner: OuterRef(outer)}).order_by().values(owner)
+    count = Subquery(rows.annotate(orders=Count('id')).values('orders'), output_field=IntegerField())
+    spent = Subquery(rows.annotate(spent=Sum('total_amount')).values('spent'), output_field=MONEY)
+    return Coalesce(count, 0), Coalesce(spent, Value(Decimal('0')), output_field=MONEY)
+
+
+def rebuild_customer_totals(apps, schema_editor):
+    # Same rebuild as pos.customer_totals.recompute, on the historical models
+    Customer = apps.get_model('pos', 'Customer')
+    QuickSale = apps.get_model('pos', 'QuickSale')
+    Order = apps.get_model('orders', 'Order')
+    ArchivedOrder = apps.get_model('orders', 'ArchivedOrder')
+
+    sources = [
+        _subtotals(QuickSale.objects.all(), 'customer_phone', 'phone'),
+        _subtotals(Order.objects.filter(COUNTED_ORDERS, quick_sale__isnull=True), 'customer_id', 'user_id'),
+        _subtotals(ArchivedOrder.objects.filter(COUNTED_ORDERS, quick_sale_id__isnull=True), 'customer_id', 'user_id'),
+    ]
+    last_id = 0
+    while True:
+        ids = list(Customer.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:1000])
+        if not ids:
+            break
+        Customer.objects.filter(id__gte=ids[0], id__lte=ids[-1]).update(
+            total_orders=sum((count for count, _ in sources[1:]), sources[0][0]),
+            total_spent=sum((spent for _, spent in sources[1:]), sources[0][1]),
+        )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_archived_order_quick_sale'),
+        ('pos', '0007_z_reports'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_customer_totals, migrations.RunPython.noop),
+    ]
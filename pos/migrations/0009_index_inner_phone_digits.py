@@ -0,0 +1,39 @@
+import re
+
+from django.db import migrations
+
+MIN_PHONE_DIGITS = 3
+
+
+def reindex_phone_keys(apps, schema_editor):
+    # Same phone keys as pos.search.customer_keys: every run of 3+ digits
+    # instead of only prefixes and suffixes
+    Customer = apps.get_model('pos', 'Customer')
+    CustomerSearchKey = apps.get_model('pos', 'CustomerSearchKey')
+    CustomerSearchKey.objects.filter(key__startswith='d:').delete()
+    batch = []
+    for customer in Customer.objects.values('id', 'phone').iterator(chunk_size=2000):
+        digits = re.sub(r'\D', '', customer['phone'] or '')
+        batch.extend(
+            CustomerSearchKey(customer_id=customer['id'], key=key)
+            for key in {
+                f"d:{digits[start:end]}"
+                for start in range(len(digits) - MIN_PHONE_DIGITS + 1)
+                for end in range(start + MIN_PHONE_DIGITS, len(digits) + 1)
+            }
+        )
+        if len(batch) >= 5000:
+            CustomerSearchKey.objects.bulk_create(batch)
+            batch = []
+    CustomerSearchKey.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0008_rebuild_customer_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_phone_keys, migrations.RunPython.noop),
+    ]
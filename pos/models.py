@@ -1,5 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from cakes.models import Cake
 from orders.models import Order
 
@@ -28,6 +30,43 @@ class POSSession(models.Model):
     def __str__(self):
         return f"POS Session #{self.id} - {self.cashier.username} ({self.start_time.date()})"
 
+class ZReport(models.Model):
+    """End-of-shift report computed when a session closes (see pos.zreport); never changed afterwards"""
+    session = models.OneToOneField(POSSession, on_delete=models.PROTECT, related_name='z_report')
+    cashier = models.ForeignKey(User, on_delete=models.PROTECT, related_name='z_reports')
+    opened_at = models.DateTimeField()
+    closed_at = models.DateTimeField()
+    
+    # Sales
+    total_transactions = models.PositiveIntegerField(default=0)
+    gross_sales = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_discounts = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    net_sales = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    
+    # Cash drawer
+    opening_cash = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    cash_sales = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    expected_cash = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    counted_cash = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    cash_variance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    
+    # Breakdowns as JSON snapshots: {method: totals} and [{cake_id, name, quantity, revenue}]
+    payments = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    items = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'pos_z_reports'
+        ordering = ['-closed_at']
+    
+    def __str__(self):
+        return f"Z-Report for Session #{self.session_id} ({self.closed_at.date()})"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Z-reports are immutable once saved')
+        super().save(*args, **kwargs)
+
 class QuickSale(models.Model):
     PAYMENT_METHOD = [
         ('cash', 'Cash'),
@@ -46,11 +85,17 @@ class QuickSale(models.Model):
     change_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     payment_method = models.CharField(max_length=10, choices=PAYMENT_METHOD, default='cash')
     order = models.OneToOneField(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='quick_sale')
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Sales captured offline keep the terminal's id and time of sale
+    client_id = models.UUIDField(unique=True, blank=True, null=True)
+    synced_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         db_table = 'quick_sales'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer_phone', 'created_at', 'id'], name='quick_sale_phone_time_idx'),
+        ]
     
     def __str__(self):
         return f"Quick Sale #{self.id} - {self.total_amount}"
@@ -86,6 +131,8 @@ class Customer(models.Model):
     phone = models.CharField(max_length=15, unique=True)
     email = models.EmailField(blank=True, null=True)
     address = models.TextField(blank=True, null=True)
+    # Online account with the same phone or email, linked by pos.identity
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='pos_customers')
     total_orders = models.PositiveIntegerField(default=0)
     total_spent = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_active = models.BooleanField(default=True)
@@ -94,10 +141,72 @@ class Customer(models.Model):
     
     class Meta:
         db_table = 'pos_customers'
+        indexes = [
+            models.Index(fields=['total_spent'], name='pos_customer_spent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.phone})"
 
+class CustomerSearchKey(models.Model):
+    """Search keys of a customer (phone digit runs, name trigrams), maintained by pos.search"""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='search_keys')
+    key = models.CharField(max_length=20)
+    
+    class Meta:
+        db_table = 'pos_customer_search_keys'
+        indexes = [
+            models.Index(fields=['key', 'customer'], name='pos_customer_search_key_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} -> {self.customer_id}"
+
+class IdentityKey(models.Model):
+    """Normalized phone or email of a POS customer or a user account, maintained by pos.identity"""
+    PHONE = 'phone'
+    EMAIL = 'email'
+    KIND_CHOICES = [
+        (PHONE, 'Phone'),
+        (EMAIL, 'Email'),
+    ]
+    
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    value = models.CharField(max_length=254)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, null=True, blank=True, related_name='identity_keys')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='pos_identity_keys')
+    
+    class Meta:
+        db_table = 'pos_identity_keys'
+        indexes = [
+            models.Index(fields=['kind', 'value'], name='pos_identity_key_idx'),
+        ]
+    
+    def __str__(self):
+        owner = f"customer {self.customer_id}" if self.customer_id else f"user {self.user_id}"
+        return f"{self.kind}:{self.value} -> {owner}"
+
+class CatalogChange(models.Model):
+    """A cake, category or offer that changed; the highest id is the POS catalog version (see pos.catalog)"""
+    CAKE = 'cake'
+    CATEGORY = 'category'
+    OFFER = 'offer'
+    KIND_CHOICES = [
+        (CAKE, 'Cake'),
+        (CATEGORY, 'Category'),
+        (OFFER, 'Offer'),
+    ]
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'pos_catalog_changes'
+    
+    def __str__(self):
+        return f"v{self.id}: {self.kind} {self.object_id}"
+
 class DailySales(models.Model):
     date = models.DateField(unique=True)
     total_sales = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -0,0 +1,61 @@
+"""
+In-process cake price cache for the POS checkout.
+
+Each worker process keeps cake prices in a plain dict, so pricing a sale
+usually costs no query at all. Every lookup compares a shared version
+number in the Django cache with the one the dict was filled under and
+drops the dict when it has moved; ``pos.signals`` bumps the version when a
+cake's price changes or a cake is deleted, so all workers pick up the new
+price on their next sale.
+
+That needs the version in the shared cache (Redis, see ``CACHES``). On a
+per-process cache a worker never sees another's bump, so there the dict
+is also dropped once it is LOCAL_CACHE_SECONDS old.
+
+Code that changes prices with queryset.update() must call
+``bump_price_version`` itself.
+"""
+import time
+
+from django.core.cache import cache
+
+from cakes.models import Cake
+from sweetbite_backend.caching import LOCAL_CACHE_SECONDS, cache_is_shared
+
+PRICE_VERSION_KEY = 'pos:cake-price-version'
+
+_prices = {}
+_loaded_version = None
+_loaded_at = 0.0
+
+
+def price_version():
+    version = cache.get(PRICE_VERSION_KEY)
+    if version is None:
+        cache.add(PRICE_VERSION_KEY, 1, None)
+        version = cache.get(PRICE_VERSION_KEY, 1)
+    return version
+
+
+def bump_price_version():
+    _prices.clear()
+    try:
+        cache.incr(PRICE_VERSION_KEY)
+    except ValueError:
+        cache.set(PRICE_VERSION_KEY, 2, None)
+
+
+def cake_prices(cake_ids):
+    """{cake id: price} for the given cakes; unknown ids are left out"""
+    global _loaded_version, _loaded_at
+    version = price_version()
+    expired = not cache_is_shared() and time.monotonic() - _loaded_at > LOCAL_CACHE_SECONDS
+    if version != _loaded_version or expired:
+        _prices.clear()
+        _loaded_version = version
+        _loaded_at = time.monotonic()
+
+    missing = {cake_id for cake_id in cake_ids if cake_id not in _prices}
+    if missing:
+        _prices.update(Cake.objects.filter(id__in=missing).values_list('id', 'price'))
+    return {cake_id: _prices[cake_id] for cake_id in cake_ids if cake_id in _prices}
@@ -0,0 +1,148 @@
+"""
+DailySales rollup.
+
+Every sale is added to its day's DailySales row as it is recorded: the
+row is created if missing (an INSERT that ignores conflicts) and then
+incremented with F expressions in a single UPDATE per day, so concurrent
+sales never lose each other's totals. Average order value is recomputed
+afterwards from the stored totals by a second UPDATE in the same
+transaction: MySQL applies SET assignments left to right, so deriving it
+from the increment expressions in the first UPDATE would count the
+increment twice.
+
+``backfill`` rebuilds days from QuickSale in chunks of days, one
+transaction per chunk. Each chunk overwrites its days with freshly
+aggregated totals while holding their rows locked, so it is idempotent
+and can be re-run or resumed from any date while sales keep coming in.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, TruncDate
+from django.utils import timezone
+
+from .models import DailySales, QuickSale
+
+PAYMENT_COLUMNS = {
+    'cash': 'cash_sales',
+    'card': 'card_sales',
+    'mobile': 'mobile_sales',
+}
+ROLLUP_FIELDS = ['total_sales', 'total_transactions', 'cash_sales', 'card_sales', 'mobile_sales', 'average_order_value']
+BACKFILL_CHUNK_DAYS = 31
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+# Float division so SQLite does not truncate to an integer
+AVERAGE_ORDER_VALUE = Coalesce(
+    ExpressionWrapper(
+        Cast(F('total_sales'), FloatField()) / NullIf(F('total_transactions'), 0), output_field=MONEY
+    ),
+    Value(Decimal('0')),
+    output_field=MONEY
+)
+
+
+def record_sales(sales):
+    """
+    Add sales to their days' rollups. `sales` are QuickSale-like objects
+    with created_at, payment_method and total_amount.
+    """
+    days = {}
+    for sale in sales:
+        day = days.setdefault(timezone.localtime(sale.created_at).date(), {
+            'total_sales': Decimal('0'),
+            'total_transactions': 0,
+            'cash_sales': Decimal('0'),
+            'card_sales': Decimal('0'),
+            'mobile_sales': Decimal('0'),
+        })
+        day['total_sales'] += Decimal(sale.total_amount)
+        day['total_transactions'] += 1
+        column = PAYMENT_COLUMNS.get(sale.payment_method)
+        if column:
+            day[column] += Decimal(sale.total_amount)
+
+    if not days:
+        return
+    with transaction.atomic():
+        DailySales.objects.bulk_create([DailySales(date=date) for date in days], ignore_conflicts=True)
+        for date, totals in days.items():
+            DailySales.objects.filter(date=date).update(
+                total_sales=F('total_sales') + totals['total_sales'],
+                total_transactions=F('total_transactions') + totals['total_transactions'],
+                cash_sales=F('cash_sales') + totals['cash_sales'],
+                card_sales=F('card_sales') + totals['card_sales'],
+                mobile_sales=F('mobile_sales') + totals['mobile_sales'],
+            )
+        DailySales.objects.filter(date__in=list(days)).update(average_order_value=AVERAGE_ORDER_VALUE)
+
+
+def _upsert(rows):
+    options = {'update_conflicts': True, 'update_fields': ROLLUP_FIELDS}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['date']
+    DailySales.objects.bulk_create(rows, **options)
+
+
+def backfill_days(start_date, end_date):
+    """Rebuild the rollups of start_date..end_date from QuickSale in one transaction"""
+    with transaction.atomic():
+        existing = set(
+            DailySales.objects.select_for_update().filter(
+                date__range=[start_date, end_date]
+            ).values_list('date', flat=True)
+        )
+        totals = {
+            row['day']: row
+            for row in QuickSale.objects.filter(
+                created_at__date__range=[start_date, end_date]
+            ).annotate(day=TruncDate('created_at')).values('day').annotate(
+                total_sales=Sum('total_amount'),
+                total_transactions=Count('id'),
+                cash_sales=Sum('total_amount', filter=Q(payment_method='cash')),
+                card_sales=Sum('total_amount', filter=Q(payment_method='card')),
+                mobile_sales=Sum('total_amount', filter=Q(payment_method='mobile')),
+            ).order_by()
+        }
+
+        rows = []
+        # Days that lost all their sales are zeroed rather than left stale
+        for date in sorted(existing | set(totals)):
+            row = totals.get(date, {})
+            total_sales = row.get('total_sales') or Decimal('0')
+            total_transactions = row.get('total_transactions') or 0
+            rows.append(DailySales(
+                date=date,
+                total_sales=total_sales,
+                total_transactions=total_transactions,
+                cash_sales=row.get('cash_sales') or Decimal('0'),
+                card_sales=row.get('card_sales') or Decimal('0'),
+                mobile_sales=row.get('mobile_sales') or Decimal('0'),
+                average_order_value=(
+                    (total_sales / total_transactions).quantize(Decimal('0.01')) if total_transactions else Decimal('0')
+                ),
+            ))
+        if rows:
+            _upsert(rows)
+    return len(rows)
+
+
+def backfill(start_date=None, end_date=None, chunk_days=BACKFILL_CHUNK_DAYS):
+    """
+    Rebuild rollups from the first sale (or `start_date`) to today (or
+    `end_date`), one chunk of days per transaction. Yields (chunk end
+    date, days written) after each chunk commits.
+    """
+    if start_date is None:
+        first_sale = QuickSale.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if first_sale is None:
+            return
+        start_date = timezone.localtime(first_sale).date()
+    end_date = end_date or timezone.now().date()
+
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        yield chunk_end, backfill_days(chunk_start, chunk_end)
+        chunk_start = chunk_end + timedelta(days=1)
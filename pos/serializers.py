@@ -1,7 +1,19 @@
 from rest_framework import serializers
-from .models import POSSession, QuickSale, QuickSaleItem, Customer, DailySales
+from django.db import transaction
+from django.db.models import F, prefetch_related_objects
+from django.utils import timezone
+from datetime import timedelta
+from .models import POSSession, QuickSale, QuickSaleItem, Customer, DailySales, ZReport
 from cakes.serializers import CakeSerializer
 from users.serializers import UserSerializer
+from inventory.consumption import deduct_for_cakes
+from .pricing import cake_prices
+from .customer_totals import record_customer_sales
+from .rollup import record_sales
+from .zreport import lock_open_session
+
+# Allowed drift of a terminal's clock ahead of the server
+MAX_CLOCK_SKEW = timedelta(minutes=5)
 
 class POSSessionSerializer(serializers.ModelSerializer):
     cashier = UserSerializer(read_only=True)
@@ -23,6 +35,20 @@ class POSSessionCreateSerializer(serializers.ModelSerializer):
         validated_data['cashier'] = self.context['request'].user
         return super().create(validated_data)
 
+class SessionCloseSerializer(serializers.Serializer):
+    # Cash counted in the drawer at the end of the shift
+    closing_amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, default=0)
+
+class ZReportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ZReport
+        fields = [
+            'id', 'session', 'cashier', 'opened_at', 'closed_at', 'total_transactions',
+            'gross_sales', 'total_discounts', 'net_sales', 'opening_cash', 'cash_sales',
+            'expected_cash', 'counted_cash', 'cash_variance', 'payments', 'items', 'created_at'
+        ]
+        read_only_fields = fields
+
 class QuickSaleItemSerializer(serializers.ModelSerializer):
     cake = CakeSerializer(read_only=True)
     cake_id = serializers.IntegerField(write_only=True)
@@ -55,23 +81,42 @@ class QuickSaleCreateSerializer(serializers.ModelSerializer):
             'payment_method', 'items'
         ]
     
+    def validate_items(self, items):
+        # Prices come from the in-process cache, so this usually costs no query
+        cake_ids = [item['cake_id'] for item in items]
+        unknown = sorted(set(cake_ids) - set(cake_prices(cake_ids)))
+        if unknown:
+            raise serializers.ValidationError(f"Unknown cakes: {unknown}")
+        return items
+    
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
-        session = self.context['session']
+        session = validated_data.pop('session', None) or self.context['session']
+        try:
+            session = lock_open_session(session.pk)
+        except ValueError as e:
+            raise serializers.ValidationError({'session': str(e)})
+        prices = cake_prices([item_data['cake_id'] for item_data in items_data])
         
         # Calculate totals
         subtotal = 0
+        cake_quantities = {}
+        items = []
         for item_data in items_data:
-            from cakes.models import Cake
             cake_id = item_data.pop('cake_id')
-            cake = Cake.objects.get(id=cake_id)
-            unit_price = cake.price
+            unit_price = prices[cake_id]
             quantity = item_data.get('quantity', 1)
             total_price = unit_price * quantity
             subtotal += total_price
             
-            item_data['unit_price'] = unit_price
-            item_data['total_price'] = total_price
+            items.append(QuickSaleItem(
+                cake_id=cake_id,
+                unit_price=unit_price,
+                total_price=total_price,
+                **item_data
+            ))
+            cake_quantities[cake_id] = cake_quantities.get(cake_id, 0) + quantity
         
         # Calculate order totals
         discount = validated_data.get('discount', 0)
@@ -86,30 +131,64 @@ class QuickSaleCreateSerializer(serializers.ModelSerializer):
         )
         
         # Create order items
-        for item_data in items_data:
-            cake_id = item_data.pop('cake_id')
-            cake = Cake.objects.get(id=cake_id)
-            QuickSaleItem.objects.create(
-                sale=quick_sale,
-                cake=cake,
-                **item_data
-            )
+        for item in items:
+            item.sale = quick_sale
+        QuickSaleItem.objects.bulk_create(items)
+        
+        # A quick sale is complete at once, so its ingredients leave stock now
+        deduct_for_cakes(
+            cake_quantities,
+            reference=f"POS Sale #{quick_sale.id}",
+            notes='Deducted on POS sale',
+            created_by=self.context['request'].user if self.context.get('request') else session.cashier
+        )
         
-        # Update session totals
-        session.total_sales += total_amount
-        session.total_transactions += 1
-        session.save()
+        # Update session totals in the database, safe against concurrent sales
+        POSSession.objects.filter(pk=session.pk).update(
+            total_sales=F('total_sales') + total_amount,
+            total_transactions=F('total_transactions') + 1
+        )
+        record_sales([quick_sale])
+        record_customer_sales([quick_sale])
         
         return quick_sale
+    
+    def to_representation(self, instance):
+        prefetch_related_objects([instance], 'items__cake')
+        return super().to_representation(instance)
+
+class SyncedSaleSerializer(serializers.ModelSerializer):
+    """A sale captured offline by a terminal, validated without touching the database"""
+    # Declared explicitly so the unique check is done in bulk by pos.sync
+    client_id = serializers.UUIDField()
+    created_at = serializers.DateTimeField()
+    items = QuickSaleItemSerializer(many=True)
+    
+    class Meta:
+        model = QuickSale
+        fields = [
+            'client_id', 'created_at', 'customer_name', 'customer_phone', 'discount',
+            'amount_paid', 'payment_method', 'items'
+        ]
+    
+    def validate_created_at(self, value):
+        if value > timezone.now() + MAX_CLOCK_SKEW:
+            raise serializers.ValidationError("Sale time is in the future.")
+        return value
+    
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("A sale needs at least one item.")
+        return items
 
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
         fields = [
-            'id', 'name', 'phone', 'email', 'address', 'total_orders',
+            'id', 'name', 'phone', 'email', 'address', 'user', 'total_orders',
             'total_spent', 'is_active', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['total_orders', 'total_spent', 'created_at', 'updated_at']
+        read_only_fields = ['user', 'total_orders', 'total_spent', 'created_at', 'updated_at']
 
 class CustomerCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,139 @@
+"""Keep the POS price cache, catalog version, customer search keys, identity links and totals in step with their sources"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .catalog import CAKE_FIELDS, OFFER_FIELDS, record_change
+from .customer_totals import ORDER_FIELDS, record_order_change, recompute
+from .models import CatalogChange, Customer
+from .identity import index_customer_identities, index_user_identities
+from .pricing import bump_price_version
+from .search import index_customers
+
+
+def _catalog_differs(sender, previous, instance, fields):
+    """Whether `instance` differs from the stored `previous` values in any of `fields`"""
+    if previous is None:
+        return True
+    for name in fields:
+        # Compare as stored, so an empty FieldFile equals '' and 10 equals Decimal('10.00')
+        field = sender._meta.get_field(name)
+        if field.get_prep_value(previous[name]) != field.get_prep_value(field.value_from_object(instance)):
+            return True
+    return False
+
+
+def _record_catalog_change(kind, object_id):
+    transaction.on_commit(lambda: record_change(kind, object_id))
+
+
+@receiver(pre_save, sender='cakes.Cake')
+def track_price_change(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._price_changed = False
+        instance._catalog_changed = True
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*CAKE_FIELDS).first()
+    instance._price_changed = previous is not None and previous['price'] != instance.price
+    instance._catalog_changed = _catalog_differs(sender, previous, instance, CAKE_FIELDS)
+
+
+@receiver(post_save, sender='cakes.Cake')
+def invalidate_on_price_change(sender, instance, **kwargs):
+    if getattr(instance, '_price_changed', False):
+        transaction.on_commit(bump_price_version)
+    if getattr(instance, '_catalog_changed', False):
+        _record_catalog_change(CatalogChange.CAKE, instance.pk)
+
+
+@receiver(post_delete, sender='cakes.Cake')
+def invalidate_on_cake_delete(sender, instance, **kwargs):
+    transaction.on_commit(bump_price_version)
+    _record_catalog_change(CatalogChange.CAKE, instance.pk)
+
+
+@receiver(post_save, sender='cakes.Category')
+@receiver(post_delete, sender='cakes.Category')
+def record_category_change(sender, instance, **kwargs):
+    _record_catalog_change(CatalogChange.CATEGORY, instance.pk)
+
+
+@receiver(pre_save, sender='offers.Offer')
+def track_offer_change(sender, instance, **kwargs):
+    # Redeeming an offer only bumps usage_count, which the catalog leaves out
+    if instance.pk is None:
+        instance._catalog_changed = True
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*OFFER_FIELDS).first()
+    instance._catalog_changed = _catalog_differs(sender, previous, instance, OFFER_FIELDS)
+
+
+@receiver(post_save, sender='offers.Offer')
+def record_offer_change(sender, instance, **kwargs):
+    if getattr(instance, '_catalog_changed', False):
+        _record_catalog_change(CatalogChange.OFFER, instance.pk)
+
+
+@receiver(post_delete, sender='offers.Offer')
+def record_offer_delete(sender, instance, **kwargs):
+    _record_catalog_change(CatalogChange.OFFER, instance.pk)
+
+
+@receiver(pre_save, sender=Customer)
+def track_search_fields(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._search_changed = instance._identity_changed = True
+        return
+    previous = Customer.objects.filter(pk=instance.pk).values('name', 'phone', 'email').first()
+    instance._search_changed = previous is None or (previous['name'], previous['phone']) != (instance.name, instance.phone)
+    instance._identity_changed = previous is None or (previous['phone'], previous['email']) != (instance.phone, instance.email)
+
+
+@receiver(post_save, sender=Customer)
+def reindex_customer(sender, instance, **kwargs):
+    if getattr(instance, '_search_changed', False):
+        index_customers([instance])
+    if getattr(instance, '_identity_changed', False):
+        # Relinking recomputes the totals; otherwise a new phone brings other sales
+        if not index_customer_identities([instance]):
+            recompute(Customer.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def track_user_identity(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login only; skip the lookup for such partial saves
+    if update_fields is not None and not {'phone_number', 'email'} & set(update_fields):
+        instance._identity_changed = False
+        return
+    if instance.pk is None:
+        instance._identity_changed = True
+        return
+    previous = sender.objects.filter(pk=instance.pk).values('phone_number', 'email').first()
+    instance._identity_changed = previous is None or (
+        (previous['phone_number'], previous['email']) != (instance.phone_number, instance.email)
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def relink_user_customers(sender, instance, **kwargs):
+    if getattr(instance, '_identity_changed', False):
+        index_user_identities([instance])
+
+
+@receiver(pre_save, sender='orders.Order')
+def track_order_totals(sender, instance, update_fields=None, **kwargs):
+    instance._counted_state = None
+    # Partial saves of other fields (e.g. last location) cannot change the totals
+    if update_fields is not None and not {'customer', 'order_status', 'payment_status', 'total_amount'} & set(update_fields):
+        instance._totals_unchanged = True
+        return
+    instance._totals_unchanged = False
+    if instance.pk is not None:
+        instance._counted_state = sender.objects.filter(pk=instance.pk).values(*ORDER_FIELDS).first()
+
+
+@receiver(post_save, sender='orders.Order')
+def update_customer_totals(sender, instance, **kwargs):
+    if not getattr(instance, '_totals_unchanged', True):
+        record_order_change(instance._counted_state, instance)
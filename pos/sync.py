@@ -0,0 +1,169 @@
+"""
+Batch sync of sales captured offline by POS terminals.
+
+Terminals give every sale a UUID (``client_id``) and the time it was rung
+up, queue sales while offline, and send them in batches when the network
+is back. A batch is applied in one transaction at a fixed number of
+queries: one lookup of already synced ids, prices from the in-process
+cache, one lock of the session (a closed session takes no more sales,
+see ``pos.zreport``), one INSERT for the sales, one read back of their
+ids (bulk_create does not return ids on MySQL), one INSERT for all items,
+one ledger deduction for the batch, one session total update, one
+customer total update and one DailySales upsert per day covered.
+
+Replays are expected. Sales whose client_id is already stored, or repeated
+within the batch, are acknowledged as duplicates and not applied again,
+so a terminal can safely resend a batch it never got the answer for.
+Invalid sales, such as unknown cakes or cash sales paid short of their
+total, are rejected one by one without holding up the rest.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from inventory.consumption import deduct_for_cakes
+
+from .customer_totals import record_customer_sales
+from .models import POSSession, QuickSale, QuickSaleItem
+from .pricing import cake_prices
+from .rollup import record_sales
+from .serializers import SyncedSaleSerializer
+from .zreport import lock_open_session
+
+MAX_SYNC_BATCH = 500
+
+
+def sync_sales(payload, session, user=None):
+    """
+    Apply a batch of offline sales to `session`.
+
+    Returns {accepted, duplicates, rejected}: the client ids applied now,
+    the client ids that were already synced, and [{client_id, errors}] for
+    sales that failed validation. Raises ValueError if `session` has been
+    closed; nothing is applied then.
+    """
+    rejected = []
+    valid = []
+    for sale in payload:
+        serializer = SyncedSaleSerializer(data=sale)
+        if serializer.is_valid():
+            valid.append(serializer.validated_data)
+        else:
+            client_id = sale.get('client_id') if isinstance(sale, dict) else None
+            rejected.append({'client_id': client_id, 'errors': serializer.errors})
+
+    # Replays: repeated within the batch or already stored
+    client_ids = [sale['client_id'] for sale in valid]
+    synced = set(QuickSale.objects.filter(client_id__in=client_ids).values_list('client_id', flat=True))
+    duplicates = []
+    fresh = []
+    for sale in valid:
+        if sale['client_id'] in synced:
+            duplicates.append(sale['client_id'])
+        else:
+            synced.add(sale['client_id'])
+            fresh.append(sale)
+
+    prices = cake_prices([item['cake_id'] for sale in fresh for item in sale['items']])
+    accepted = []
+    for sale in fresh:
+        errors = _sale_errors(sale, prices)
+        if errors:
+            rejected.append({'client_id': sale['client_id'], 'errors': errors})
+        else:
+            accepted.append(sale)
+
+    if accepted:
+        _apply(accepted, prices, session, user)
+
+    return {
+        'accepted': [sale['client_id'] for sale in accepted],
+        'duplicates': duplicates,
+        'rejected': rejected,
+    }
+
+
+def _sale_errors(sale, prices):
+    """Errors of a validated sale that depend on current prices, or None"""
+    unknown = sorted({item['cake_id'] for item in sale['items']} - set(prices))
+    if unknown:
+        return {'items': [f"Unknown cakes: {unknown}"]}
+    subtotal = sum(prices[item['cake_id']] * item.get('quantity', 1) for item in sale['items'])
+    total_amount = subtotal - sale.get('discount', 0)
+    if total_amount < 0:
+        return {'discount': ["Discount exceeds the sale subtotal."]}
+    if sale.get('payment_method', 'cash') == 'cash' and sale.get('amount_paid', 0) < total_amount:
+        return {'amount_paid': [f"Cash paid is less than the sale total of {total_amount}."]}
+    return None
+
+
+def _apply(sales, prices, session, user):
+    now = timezone.now()
+    quick_sales = []
+    lines = {}
+    cake_quantities = {}
+    batch_total = 0
+    for sale in sales:
+        items = []
+        subtotal = 0
+        for item in sale['items']:
+            quantity = item.get('quantity', 1)
+            unit_price = prices[item['cake_id']]
+            items.append(QuickSaleItem(
+                cake_id=item['cake_id'],
+                quantity=quantity,
+                unit_price=unit_price,
+                total_price=unit_price * quantity,
+                customization_notes=item.get('customization_notes'),
+            ))
+            subtotal += unit_price * quantity
+            cake_quantities[item['cake_id']] = cake_quantities.get(item['cake_id'], 0) + quantity
+
+        discount = sale.get('discount', 0)
+        amount_paid = sale.get('amount_paid', 0)
+        total_amount = subtotal - discount
+        batch_total += total_amount
+        quick_sales.append(QuickSale(
+            session=session,
+            client_id=sale['client_id'],
+            customer_name=sale.get('customer_name'),
+            customer_phone=sale.get('customer_phone'),
+            subtotal=subtotal,
+            tax=0,  # No tax
+            discount=discount,
+            total_amount=total_amount,
+            amount_paid=amount_paid,
+            change_amount=amount_paid - total_amount,
+            payment_method=sale.get('payment_method', 'cash'),
+            created_at=sale['created_at'],
+            synced_at=now,
+        ))
+        lines[sale['client_id']] = items
+
+    with transaction.atomic():
+        session = lock_open_session(session.pk)
+        QuickSale.objects.bulk_create(quick_sales)
+        sale_ids = dict(
+            QuickSale.objects.filter(client_id__in=list(lines)).values_list('client_id', 'id')
+        )
+        items = []
+        for client_id, sale_items in lines.items():
+            for item in sale_items:
+                item.sale_id = sale_ids[client_id]
+                items.append(item)
+        QuickSaleItem.objects.bulk_create(items)
+
+        deduct_for_cakes(
+            cake_quantities,
+            reference=f"POS Sync ({len(sales)} sales)",
+            notes='Deducted on POS batch sync',
+            created_by=user or session.cashier
+        )
+
+        POSSession.objects.filter(pk=session.pk).update(
+            total_sales=F('total_sales') + batch_total,
+            total_transactions=F('total_transactions') + len(sales)
+        )
+        # Each sale counts towards the day it was rung up on
+        record_sales(quick_sales)
+        record_customer_sales(quick_sales)
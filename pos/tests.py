@@ -1,3 +1,202 @@
+from datetime import datetime, timedelta
+from importlib import import_module
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cakes.models import Cake
+from orders.archive import archive_orders
+from orders.models import ArchivedOrder, Order
+
+from .customer_totals import recompute
+from .history import purchase_history
+from .models import Customer, DailySales, POSSession, QuickSale
+from .rollup import record_sales
+from .search import search_customers
+from .serializers import QuickSaleCreateSerializer
+from .sync import sync_sales
+from .zreport import close_session
+
+
+def _sale(amount, payment_method='cash', created_at=None):
+    return QuickSale(
+        total_amount=Decimal(amount),
+        payment_method=payment_method,
+        created_at=created_at or timezone.make_aware(datetime(2026, 3, 2, 12, 0))
+    )
+
+
+def _set_clause(sql):
+    return sql.split(' SET ', 1)[1].split(' WHERE ', 1)[0]
+
+
+class DailySalesRollupTests(TestCase):
+    def test_average_counts_each_sale_once(self):
+        record_sales([_sale('10.00'), _sale('20.00', 'card')])
+        record_sales([_sale('30.00')])
+        
+        day = DailySales.objects.get()
+        self.assertEqual(day.total_transactions, 3)
+        self.assertEqual(day.total_sales, Decimal('60.00'))
+        self.assertEqual(day.cash_sales, Decimal('40.00'))
+        self.assertEqual(day.average_order_value, Decimal('20.00'))
+    
+    def test_average_is_set_from_stored_totals(self):
+        # MySQL applies SET assignments left to right, so an UPDATE that both
+        # increments the counters and derives the average from them adds the
+        # increment twice. The average must come from a separate UPDATE.
+        with CaptureQueriesContext(connection) as queries:
+            record_sales([_sale('10.00'), _sale('15.00')])
+        
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertNotIn('average_order_value', _set_clause(updates[0]))
+        average_clause = _set_clause(updates[1])
+        self.assertIn('average_order_value', average_clause)
+        self.assertNotIn('+', average_clause)
+        self.assertEqual(DailySales.objects.get().average_order_value, Decimal('12.50'))
+
+
+class CustomerTotalsTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='ann', password='secret', phone_number='0771234567')
+        self.customer = Customer.objects.create(name='Ann', phone='+94 77 123 4567')
+        self.order = Order.objects.create(
+            customer=user, order_status='delivered', payment_status='paid',
+            subtotal=Decimal('40.00'), total_amount=Decimal('40.00')
+        )
+
+    def test_completed_order_counts(self):
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.total_orders, self.customer.total_spent), (1, Decimal('40.00')))
+
+    def test_refund_does_not_go_below_zero(self):
+        # Totals of customers whose orders completed before they were tracked
+        Customer.objects.filter(pk=self.customer.pk).update(total_orders=0, total_spent=Decimal('0'))
+
+        self.order.payment_status = 'refunded'
+        self.order.save()
+
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.total_orders, self.customer.total_spent), (0, Decimal('0.00')))
+
+
+class ZReportTests(TestCase):
+    def setUp(self):
+        cashier = get_user_model().objects.create_user(username='cashier', password='secret', user_type='staff')
+        self.session = POSSession.objects.create(cashier=cashier, opening_amount=Decimal('50.00'))
+        for amount, paid, method in [('30.00', '40.00', 'cash'), ('20.00', '20.00', 'card')]:
+            QuickSale.objects.create(
+                session=self.session, subtotal=Decimal(amount), total_amount=Decimal(amount),
+                amount_paid=Decimal(paid), change_amount=Decimal(paid) - Decimal(amount), payment_method=method
+            )
+
+    def test_variance_is_counted_minus_expected_cash(self):
+        report = close_session(self.session.id, Decimal('75.00'))
+
+        self.assertEqual(report.cash_sales, Decimal('30.00'))
+        self.assertEqual(report.expected_cash, Decimal('80.00'))
+        self.assertEqual(report.cash_variance, Decimal('-5.00'))
+        self.assertEqual((report.total_transactions, report.net_sales), (2, Decimal('50.00')))
+
+    def test_session_closes_once(self):
+        close_session(self.session.id, Decimal('80.00'))
+
+        with self.assertRaises(ValueError):
+            close_session(self.session.id, Decimal('80.00'))
+
+
+    def test_closed_session_takes_no_more_sales(self):
+        cake = Cake.objects.create(name='Sponge', price=Decimal('20.00'))
+        close_session(self.session.id, Decimal('80.00'))
+
+        # The caller still holds the session as it was before the close
+        serializer = QuickSaleCreateSerializer(
+            data={'amount_paid': '20.00', 'items': [{'cake_id': cake.id, 'quantity': 1}]},
+            context={'session': self.session}
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        with self.assertRaises(ValueError):
+            sync_sales([{
+                'client_id': '3f2b6a4e-52a1-4c1e-9a4e-0c1b2d3e4f50', 'created_at': timezone.now().isoformat(),
+                'amount_paid': '20.00', 'items': [{'cake_id': cake.id, 'quantity': 1}],
+            }], self.session)
+
+        self.assertEqual(QuickSale.objects.filter(session=self.session).count(), 2)
+
+
+class ArchivedTillOrderTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='ann', password='secret', phone_number='0771234567')
+        self.customer = Customer.objects.create(name='Ann', phone='+94 77 123 4567')
+        order = Order.objects.create(
+            customer=user, order_type='walk_in', order_status='delivered', payment_status='paid',
+            subtotal=Decimal('25.00'), total_amount=Decimal('25.00')
+        )
+        session = POSSession.objects.create(cashier=user)
+        self.sale = QuickSale.objects.create(
+            session=session, customer_phone=self.customer.phone, order=order,
+            subtotal=Decimal('25.00'), total_amount=Decimal('25.00'), amount_paid=Decimal('25.00')
+        )
+
+    def test_archived_till_order_keeps_its_sale(self):
+        archive_orders(timezone.now() + timedelta(days=1))
+
+        self.assertEqual(ArchivedOrder.objects.get().quick_sale_id, self.sale.id)
+        history = purchase_history(Customer.objects.get(pk=self.customer.pk))
+        self.assertEqual([(entry['source'], entry['id']) for entry in history['results']], [('pos_sale', self.sale.id)])
+
+
+    def test_archived_till_order_counts_once(self):
+        archive_orders(timezone.now() + timedelta(days=1))
+        rebuild = import_module('pos.migrations.0008_rebuild_customer_totals').rebuild_customer_totals
+
+        for rebuild_totals in [lambda: recompute(Customer.objects.all()), lambda: rebuild(apps, None)]:
+            Customer.objects.update(total_orders=0, total_spent=Decimal('0'))
+            rebuild_totals()
+            self.customer.refresh_from_db()
+            self.assertEqual((self.customer.total_orders, self.customer.total_spent), (1, Decimal('25.00')))
+
+
+class SyncValidationTests(TestCase):
+    def setUp(self):
+        cashier = get_user_model().objects.create_user(username='cashier', password='secret', user_type='staff')
+        self.session = POSSession.objects.create(cashier=cashier)
+        self.cake = Cake.objects.create(name='Sponge', price=Decimal('20.00'))
+
+    def _sale(self, client_id, amount_paid, payment_method='cash', discount='0'):
+        return {
+            'client_id': client_id, 'created_at': timezone.now().isoformat(), 'payment_method': payment_method,
+            'amount_paid': amount_paid, 'discount': discount, 'items': [{'cake_id': self.cake.id, 'quantity': 2}],
+        }
+
+    def test_short_cash_sales_are_rejected(self):
+        short = '3f2b6a4e-52a1-4c1e-9a4e-0c1b2d3e4f51'
+        result = sync_sales([
+            self._sale(short, '30.00'),
+            self._sale('3f2b6a4e-52a1-4c1e-9a4e-0c1b2d3e4f52', '50.00'),
+            self._sale('3f2b6a4e-52a1-4c1e-9a4e-0c1b2d3e4f53', '0', payment_method='card'),
+        ], self.session)
+
+        self.assertEqual([str(rejected['client_id']) for rejected in result['rejected']], [short])
+        self.assertIn('amount_paid', result['rejected'][0]['errors'])
+        self.assertEqual(len(result['accepted']), 2)
+        self.assertEqual(QuickSale.objects.get(payment_method='cash').change_amount, Decimal('10.00'))
+
+
+class CustomerSearchTests(TestCase):
+    def test_phone_matches_on_any_run_of_digits(self):
+        customer = Customer.objects.create(name='Nimal Perera', phone='077-123-4567')
+        Customer.objects.create(name='Kamal Silva', phone='071-999-8888')
 
-# Create your tests here.
+        for query in ['0771', '1234', '234', '4567', '077 123 4567']:
+            self.assertEqual(search_customers(query), [customer], query)
+        self.assertEqual(search_customers('1235'), [])
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     POSSessionViewSet, QuickSaleViewSet, CustomerViewSet, 
-    DailySalesViewSet, POSDashboardViewSet
+    DailySalesViewSet, POSDashboardViewSet, CatalogViewSet
 )
 
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'sales', QuickSaleViewSet, basename='quick-sale')
 router.register(r'customers', CustomerViewSet, basename='customer')
 router.register(r'daily-sales', DailySalesViewSet, basename='daily-sales')
 router.register(r'dashboard', POSDashboardViewSet, basename='pos-dashboard')
+router.register(r'catalog', CatalogViewSet, basename='pos-catalog')
 
 urlpatterns = [
     path('', include(router.urls)),
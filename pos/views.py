@@ -2,16 +2,23 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters import rest_framework as filters
-from django.db.models import Q, Sum, Count
+from django.db import IntegrityError
+from django.db.models import Sum, Count
 from django.utils import timezone
 from datetime import datetime, timedelta
 
-from .models import POSSession, QuickSale, QuickSaleItem, Customer, DailySales
+from .models import POSSession, QuickSale, QuickSaleItem, Customer, DailySales, ZReport
 from .serializers import (
     POSSessionSerializer, POSSessionCreateSerializer, QuickSaleSerializer,
     QuickSaleCreateSerializer, CustomerSerializer, CustomerCreateSerializer,
-    DailySalesSerializer, POSDashboardSerializer
+    DailySalesSerializer, POSDashboardSerializer, SessionCloseSerializer, ZReportSerializer
 )
+from .catalog import catalog_since
+from .history import HISTORY_PAGE_SIZE, purchase_history
+from .search import search_customers
+from .sync import MAX_SYNC_BATCH, sync_sales
+from .zreport import close_session
+from sweetbite_backend.db_router import use_replica
 
 class POSSessionViewSet(viewsets.ModelViewSet):
     queryset = POSSession.objects.all().order_by('-start_time')
@@ -32,20 +39,30 @@ class POSSessionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def close_session(self, request, pk=None):
         session = self.get_object()
-        closing_amount = request.data.get('closing_amount', 0)
+        serializer = SessionCloseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        if session.status == 'closed':
+        # Reconciles the drawer against the session's sales and stores the Z-report
+        try:
+            report = close_session(session.pk, serializer.validated_data['closing_amount'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': 'Session closed successfully',
+            'z_report': ZReportSerializer(report).data
+        })
+    
+    @action(detail=True, methods=['get'])
+    def z_report(self, request, pk=None):
+        session = self.get_object()
+        report = ZReport.objects.filter(session=session).first()
+        if report is None:
             return Response(
-                {'error': 'Session is already closed'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': 'Session has not been closed yet'},
+                status=status.HTTP_404_NOT_FOUND
             )
-        
-        session.status = 'closed'
-        session.end_time = timezone.now()
-        session.closing_amount = closing_amount
-        session.save()
-        
-        return Response({'message': 'Session closed successfully'})
+        return Response(ZReportSerializer(report).data)
     
     @action(detail=False, methods=['get'])
     def active_session(self, request):
@@ -76,23 +93,51 @@ class QuickSaleViewSet(viewsets.ModelViewSet):
             return QuickSaleCreateSerializer
         return QuickSaleSerializer
     
-    def perform_create(self, serializer):
-        session = self.context.get('session')
+    def _active_session(self):
+        # Get active session or create new one
+        session = POSSession.objects.filter(
+            cashier=self.request.user,
+            status='open'
+        ).first()
+        
         if not session:
-            # Get active session or create new one
-            session = POSSession.objects.filter(
+            session = POSSession.objects.create(
                 cashier=self.request.user,
-                status='open'
-            ).first()
-            
-            if not session:
-                session = POSSession.objects.create(
-                    cashier=self.request.user,
-                    opening_amount=0
-                )
-        
+                opening_amount=0
+            )
+        return session
+    
+    def perform_create(self, serializer):
+        session = serializer.context.get('session') or self._active_session()
         serializer.save(session=session)
     
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """Apply a batch of sales captured offline: {"sales": [{client_id, created_at, ..., items}]}"""
+        sales = request.data.get('sales')
+        if not isinstance(sales, list) or not sales:
+            return Response(
+                {'error': 'sales must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(sales) > MAX_SYNC_BATCH:
+            return Response(
+                {'error': f'At most {MAX_SYNC_BATCH} sales per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            result = sync_sales(sales, self._active_session(), request.user)
+        except IntegrityError:
+            # Another request synced some of these sales at the same time; a retry sees them as duplicates
+            return Response(
+                {'error': 'Batch conflicted with a concurrent sync, please retry'},
+                status=status.HTTP_409_CONFLICT
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+    
     @action(detail=False, methods=['get'])
     def today_sales(self, request):
         today = timezone.now().date()
@@ -121,6 +166,8 @@ class CustomerViewSet(viewsets.ModelViewSet):
     queryset = Customer.objects.all().order_by('name')
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Totals are maintained counters, so sorting by spend needs no aggregation
+    ordering_fields = ['name', 'total_orders', 'total_spent', 'created_at']
     
     def get_queryset(self):
         user = self.request.user
@@ -135,13 +182,13 @@ class CustomerViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def search(self, request):
+        # Type-ahead over the customer search index, best matches first
         query = request.query_params.get('q', '')
-        if query:
-            customers = self.get_queryset().filter(
-                Q(name__icontains=query) | Q(phone__icontains=query)
-            )
+        customers = self.get_queryset()
+        if query and not customers.query.is_empty():
+            customers = search_customers(query)
         else:
-            customers = self.get_queryset()[:10]
+            customers = customers[:10]
         
         serializer = self.get_serializer(customers, many=True)
         return Response(serializer.data)
@@ -150,23 +197,19 @@ class CustomerViewSet(viewsets.ModelViewSet):
     def purchase_history(self, request, pk=None):
         customer = self.get_object()
         
-        # Get quick sales for this customer
-        quick_sales = QuickSale.objects.filter(
-            customer_phone=customer.phone
-        ).order_by('-created_at')
-        
-        # Get online orders for this customer (if they have a user account)
-        online_orders = []
-        if hasattr(customer, 'user') and customer.user:
-            from orders.models import Order
-            online_orders = Order.objects.filter(
-                customer=customer.user
-            ).order_by('-created_at')
+        # POS sales and online orders, newest first; pass next_cursor back as ?cursor=
+        try:
+            page = purchase_history(
+                customer,
+                cursor=request.query_params.get('cursor'),
+                limit=request.query_params.get('limit', HISTORY_PAGE_SIZE)
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'customer': CustomerSerializer(customer).data,
-            'quick_sales': QuickSaleSerializer(quick_sales, many=True).data,
-            'online_orders': online_orders  # You might want to serialize this too
+            **page
         })
 
 class DailySalesViewSet(viewsets.ReadOnlyModelViewSet):
@@ -181,6 +224,7 @@ class DailySalesViewSet(viewsets.ReadOnlyModelViewSet):
         return DailySales.objects.none()
     
     @action(detail=False, methods=['get'])
+    @use_replica
     def sales_report(self, request):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
@@ -196,30 +240,23 @@ class DailySalesViewSet(viewsets.ReadOnlyModelViewSet):
             date__range=[start_date, end_date]
         )
         
-        # Calculate totals
-        total_sales = daily_sales.aggregate(
-            total=Sum('total_sales')
-        )['total'] or 0
-        
-        total_transactions = daily_sales.aggregate(
-            total=Sum('total_transactions')
-        )['total'] or 0
-        
-        # Payment method breakdown
-        cash_sales = daily_sales.aggregate(
-            total=Sum('cash_sales')
-        )['total'] or 0
-        
-        card_sales = daily_sales.aggregate(
-            total=Sum('card_sales')
-        )['total'] or 0
-        
-        mobile_sales = daily_sales.aggregate(
-            total=Sum('mobile_sales')
-        )['total'] or 0
+        # Totals and payment method breakdown in one query
+        totals = daily_sales.aggregate(
+            total_sales=Sum('total_sales'),
+            total_transactions=Sum('total_transactions'),
+            cash_sales=Sum('cash_sales'),
+            card_sales=Sum('card_sales'),
+            mobile_sales=Sum('mobile_sales'),
+            days=Count('id')
+        )
+        total_sales = totals['total_sales'] or 0
+        total_transactions = totals['total_transactions'] or 0
+        cash_sales = totals['cash_sales'] or 0
+        card_sales = totals['card_sales'] or 0
+        mobile_sales = totals['mobile_sales'] or 0
         
         # Average daily sales
-        avg_daily_sales = total_sales / daily_sales.count() if daily_sales.count() > 0 else 0
+        avg_daily_sales = total_sales / totals['days'] if totals['days'] > 0 else 0
         
         report = {
             'period': {
@@ -270,9 +307,10 @@ class POSDashboardViewSet(viewsets.ViewSet):
         # Low stock items (from inventory)
         low_stock_items = []
         if user.user_type in ['admin', 'inventory_manager'] or user.is_superuser:
+            from inventory.alerts import low_stock_ingredient_ids
             from inventory.models import Ingredient
             low_stock_items = Ingredient.objects.filter(
-                current_stock__lte=models.F('minimum_stock')
+                id__in=low_stock_ingredient_ids()
             ).values('name', 'current_stock', 'minimum_stock')[:5]
         
         # Recent sales
@@ -289,3 +327,21 @@ class POSDashboardViewSet(viewsets.ViewSet):
         }
         
         return Response(dashboard_data)
+
+class CatalogViewSet(viewsets.ViewSet):
+    # The catalog is public: terminals and the storefront cache it by version
+    permission_classes = [permissions.AllowAny]
+    
+    def list(self, request):
+        # ?since=<version> returns only what changed after it
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response(
+                    {'error': 'since must be a catalog version number'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(catalog_since(since))
@@ -0,0 +1,123 @@
+"""
+End-of-shift Z-report.
+
+Closing a POS session reconciles the drawer against the session's sales
+and stores the result as a ZReport. Sale totals come from one grouped
+query over the session's sales (by payment method) and item counts from
+one grouped query over their items (by cake), so the cost does not grow
+with the number of sales beyond the aggregation itself.
+
+Cash expected in the drawer is the opening float plus net cash sales
+(what a cash customer pays minus their change is the sale total). The
+variance is counted minus expected: negative means the drawer is short.
+
+Sale creation and offline sync take the same row lock through
+``lock_open_session`` and refuse closed sessions, so a sale racing the
+close either lands before the report is computed or is rejected.
+
+The report is a snapshot. Cake names are copied into it and the row
+refuses updates, so historical shift reports read the same forever and
+never need recomputing.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import POSSession, QuickSale, QuickSaleItem, ZReport
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+
+def _money(value):
+    return (value or ZERO).quantize(CENT)
+
+
+def _payment_totals(session):
+    payments = {}
+    rows = QuickSale.objects.filter(session=session).values('payment_method').annotate(
+        transactions=Count('id'),
+        gross=Sum('subtotal'),
+        discounts=Sum('discount'),
+        net=Sum('total_amount'),
+    ).order_by('payment_method')
+    for row in rows:
+        payments[row['payment_method']] = {
+            'transactions': row['transactions'],
+            'gross': _money(row['gross']),
+            'discounts': _money(row['discounts']),
+            'net': _money(row['net']),
+        }
+    return payments
+
+
+def _item_counts(session):
+    return [
+        {
+            'cake_id': row['cake_id'],
+            'name': row['cake__name'],
+            'quantity': row['quantity'],
+            'revenue': _money(row['revenue']),
+        }
+        for row in QuickSaleItem.objects.filter(sale__session=session).values('cake_id', 'cake__name').annotate(
+            quantity=Sum('quantity'),
+            revenue=Sum('total_price'),
+        ).order_by('-quantity', 'cake__name')
+    ]
+
+
+def lock_open_session(session_id):
+    """
+    Lock a session row for the current transaction and return it.
+
+    Raises ValueError if the session is not open. Everything that adds
+    sales to a session goes through here, so no sale gets in after the
+    Z-report.
+    """
+    session = POSSession.objects.select_for_update().get(pk=session_id)
+    if session.status != 'open':
+        raise ValueError('Session is already closed')
+    return session
+
+
+def close_session(session_id, counted_cash, closed_at=None):
+    """
+    Close an open session and persist its Z-report.
+
+    Raises ValueError if the session was already closed. The session
+    row is locked while the report is computed, so sales being recorded
+    against it finish first and later ones are refused.
+    """
+    closed_at = closed_at or timezone.now()
+    with transaction.atomic():
+        session = lock_open_session(session_id)
+
+        payments = _payment_totals(session)
+        cash_sales = payments.get('cash', {}).get('net', ZERO)
+        expected_cash = session.opening_amount + cash_sales
+
+        report = ZReport.objects.create(
+            session=session,
+            cashier_id=session.cashier_id,
+            opened_at=session.start_time,
+            closed_at=closed_at,
+            total_transactions=sum(method['transactions'] for method in payments.values()),
+            gross_sales=sum((method['gross'] for method in payments.values()), ZERO),
+            total_discounts=sum((method['discounts'] for method in payments.values()), ZERO),
+            net_sales=sum((method['net'] for method in payments.values()), ZERO),
+            opening_cash=session.opening_amount,
+            cash_sales=cash_sales,
+            expected_cash=expected_cash,
+            counted_cash=counted_cash,
+            cash_variance=counted_cash - expected_cash,
+            payments=payments,
+            items=_item_counts(session),
+        )
+
+        session.status = 'closed'
+        session.end_time = closed_at
+        session.closing_amount = counted_cash
+        session.save(update_fields=['status', 'end_time', 'closing_amount'])
+    return report
@@ -0,0 +1,28 @@
+"""
+Cache timeouts that stay safe on a per-process cache.
+
+Cache versions (stock, prices) are bumped in the worker that made the
+change. With the shared Redis cache every worker sees the bump at once,
+so cached entries can live as long as their version does. A per-process
+cache (LocMem, e.g. a test or a misconfigured deployment) never sees
+another worker's bump, so entries there are kept for at most
+LOCAL_CACHE_SECONDS to bound how stale they can get.
+"""
+from django.conf import settings
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+LOCAL_CACHE_SECONDS = 60
+
+
+def cache_is_shared(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def cache_timeout(seconds, alias='default'):
+    """`seconds`, capped at LOCAL_CACHE_SECONDS unless the cache is shared between processes"""
+    if cache_is_shared(alias):
+        return seconds
+    return min(seconds, LOCAL_CACHE_SECONDS)
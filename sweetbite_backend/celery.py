@@ -0,0 +1,13 @@
+"""
+Celery application for background work, configured from the CELERY_*
+settings. Start a worker with ``celery -A sweetbite_backend.celery worker``.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sweetbite_backend.settings')
+
+app = Celery('sweetbite_backend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -0,0 +1,103 @@
+"""
+Database routing for the read replica.
+
+Heavy report and dashboard views are marked with ``@use_replica`` so their
+reads go to the ``replica`` database while order writes stay on ``default``.
+A user who has just written something is pinned to the primary for
+``REPLICA_PIN_SECONDS`` so they always read their own writes. The pin is
+kept in the default cache, which must be shared by all worker processes
+(Redis, see ``CACHES``) for a pin set by one worker to hold in the others.
+
+When no ``replica`` alias is configured every query goes to ``default``.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+REPLICA_DB = 'replica'
+PRIMARY_DB = 'default'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+def _pin_key(user):
+    return f'db-router:pin-primary:{user.pk}'
+
+
+def pin_to_primary(user):
+    """Route this user's replica-eligible reads to the primary for a while"""
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user), True, getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+
+
+def is_pinned(user):
+    if user is None or not user.is_authenticated:
+        return False
+    return bool(cache.get(_pin_key(user)))
+
+
+def _materialize(data):
+    # Responses are rendered after the view returns, so lazy querysets left in
+    # the payload would otherwise be evaluated against the primary.
+    if isinstance(data, QuerySet):
+        return list(data)
+    if isinstance(data, dict):
+        for key, value in data.items():
+            data[key] = _materialize(value)
+    elif isinstance(data, list):
+        data[:] = [_materialize(value) for value in data]
+    return data
+
+
+def use_replica(view_func):
+    """
+    Send the reads of a view (function view or viewset action) to the replica,
+    unless the requesting user recently wrote and is pinned to the primary.
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        request = next(
+            (arg for arg in args if isinstance(arg, (Request, HttpRequest))), None
+        )
+        user = getattr(request, 'user', None)
+        if not replica_configured() or is_pinned(user):
+            return view_func(*args, **kwargs)
+
+        token = _replica_reads.set(True)
+        try:
+            response = view_func(*args, **kwargs)
+            if hasattr(response, 'data'):
+                response.data = _materialize(response.data)
+            return response
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads go to the replica only inside ``@use_replica`` views, writes always to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA_DB
+        return PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data, so relations across them are fine
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication
+        return db == PRIMARY_DB
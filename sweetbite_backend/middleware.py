@@ -9,3 +9,19 @@ class CSRFExemptAPI:
         return self.get_response(request)
 
 
+
+
+class ReplicaPinningMiddleware:
+    """Pin a user to the primary database after a successful write (read-your-writes)"""
+    UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # DRF copies the authenticated user back onto the Django request
+        if request.method in self.UNSAFE_METHODS and response.status_code < 400:
+            from .db_router import pin_to_primary
+            pin_to_primary(getattr(request, 'user', None))
+        return response
@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'sweetbite_backend.middleware.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'sweetbite_backend.urls'
@@ -92,6 +93,53 @@ DATABASES = {
     }
 }
 
+# Read replica for report/dashboard views marked with @use_replica.
+# Without REPLICA_DB_HOST every query stays on the primary.
+if os.environ.get('REPLICA_DB_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['REPLICA_DB_HOST'],
+        'PORT': os.environ.get('REPLICA_DB_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Local stand-in: two SQLite connections to the same file act as primary/replica
+if os.environ.get('SWEETBITE_SQLITE'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        },
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        },
+    }
+
+DATABASE_ROUTERS = ['sweetbite_backend.db_router.ReplicaRouter']
+
+# Seconds a user reads from the primary after their own write
+REPLICA_PIN_SECONDS = 10
+
+# Shared cache: replica pins, price/stock versions and cached reports must be
+# seen by every worker process, so they live in Redis rather than per-process memory
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://localhost:6379/1'),
+        'KEY_PREFIX': 'sweetbite',
+    }
+}
+
+# The local stand-in runs as a single process, so process memory is shared enough
+if os.environ.get('SWEETBITE_SQLITE'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {